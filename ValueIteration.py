@@ -1,24 +1,55 @@
 import math
+import time
+import numpy as np
+import scipy.sparse as sparse
+from scipy.sparse.linalg import spsolve
+from compiledMDP import CompiledMDP, SetupCompiledMDP
+
+"""
+Boltzmann value iteration -
+    sweepCallback, maxIterations and timeBudget are optional, see SolverMonitor; the run report is kept as .runReport
+    collapseActions - if True, the actions of a state with the same successor distribution (e.g. walking into a wall and
+        not moving) are backed up as one group: with offset(s, a) = sum over s' of p(s'|s, a)*r(s, a, s'), the actions of
+        a group differ only in their offset, so V(s) = max over groups of (gamma*sum over s' of p*V(s') + largest offset
+        in the group); the policy is still computed over every action
+    .numberOfActionBackups counts the (state, action) or (state, group) expected values computed by the sweeps
+"""
 
 class BoltzmannValueIteration(object):
-    def __init__(self, transitionTable, rewardTable, valueTable, convergenceTolerance, discountingFactor, beta):
+    def __init__(self, transitionTable, rewardTable, valueTable, convergenceTolerance, discountingFactor, beta,
+            sweepCallback = None, maxIterations = None, timeBudget = None, collapseActions = False):
         self.transitionTable = transitionTable
         self.rewardTable  = rewardTable
         self.valueTable = valueTable
         self.convergenceTolerance = convergenceTolerance
         self.gamma = discountingFactor
         self.beta = beta
+        self.sweepCallback = sweepCallback
+        self.maxIterations = maxIterations
+        self.timeBudget = timeBudget
+        self.collapseActions = collapseActions
 
     def __call__(self):
-        
+        monitor = SolverMonitor(self.convergenceTolerance, self.gamma, self.sweepCallback, self.maxIterations, self.timeBudget)
+        if self.collapseActions:
+            actionGroups = self.getActionGroups()
+        self.numberOfActionBackups = 0
         delta = self.convergenceTolerance*100
         while(delta > self.convergenceTolerance):
             delta = 0
             for state, actionDict in self.transitionTable.items():
                 valueOfStateAtTimeT = self.valueTable[state]
-                qforAllActions = [self.getQValue(state, action) for action in actionDict.keys()]
+                if self.collapseActions:
+                    qforAllActions = [largestOffset + self.gamma*sum(prob*self.valueTable[nextState] for nextState, prob in successors)
+                        for successors, largestOffset in actionGroups[state]]
+                else:
+                    qforAllActions = [self.getQValue(state, action) for action in actionDict.keys()]
+                self.numberOfActionBackups += len(qforAllActions)
                 self.valueTable[state] = max(qforAllActions) 
                 delta = max(delta, abs(valueOfStateAtTimeT-self.valueTable[state]))
+            if not monitor.recordSweep(delta, len(self.transitionTable)):
+                break
+        self.runReport = monitor.getRunReport()
         policyTable = {state:self.getBoltzmannPolicy(state) for state in self.transitionTable.keys()}
 
         return([self.valueTable, policyTable])
@@ -27,17 +58,25 @@ class BoltzmannValueIteration(object):
         exponents = [self.beta*self.getQValue(state, action) for action in self.transitionTable[state].keys()]
         actions = [action for action in self.transitionTable[state].keys()]
 
-        # Scale to [0,700] if there are exponents larger than 700
-        if len([exponent for exponent in exponents if exponent>700])>0:
-            if printStatments:
-                print("scaling exponents to [0,700]... On State:")
-                print(state)
-            exponents = [700*(exponent/max(exponents)) for exponent in exponents]
-
-        statePolicy = {action: math.exp(exponent) for exponent, action in zip(exponents,actions)}
+        # subtracting the largest exponent leaves the normalized policy unchanged and keeps math.exp from overflowing
+        # (printStatments is kept for existing callers, there is no rescaling left to report)
+        largestExponent = max(exponents)
+        statePolicy = {action: math.exp(exponent - largestExponent) for exponent, action in zip(exponents,actions)}
         normalizedPolicy = self.normalizeDictionaryValues(statePolicy)
         return(normalizedPolicy)
 
+    def getActionGroups(self):
+        # {state: [(successor items, largest reward offset of the group's actions)]}, one entry per distinct distribution
+        actionGroups = {}
+        for state, actionDict in self.transitionTable.items():
+            largestOffsets = {}
+            for action, nextStateDict in actionDict.items():
+                successors = tuple(nextStateDict.items())
+                offset = sum(prob*self.rewardTable[state][action][nextState] for nextState, prob in successors)
+                largestOffsets[successors] = max(offset, largestOffsets.get(successors, offset))
+            actionGroups[state] = list(largestOffsets.items())
+        return(actionGroups)
+
     def getQValue(self, state, action):
         nextStatesQ = [prob*(self.rewardTable[state][action][nextState] \
                              + self.gamma*self.valueTable[nextState]) \
@@ -53,6 +92,472 @@ class BoltzmannValueIteration(object):
 
 
 
+"""
+Vectorized Boltzmann value iteration -
+    Takes the same inputs and returns the same [valueTable, policyTable] as BoltzmannValueIteration, but compiles the
+    nested dictionaries once into integer states/actions (compiledMDP.CompiledMDP) and does every sweep as a sparse
+    matrix product over all (state, action) pairs at the same time.
+    Sweeps are synchronous (every state is backed up from the previous sweep's values), so the converged values
+    agree with BoltzmannValueIteration to within the convergence tolerance rather than bit for bit.
+Inputs:
+    transitionTable - nested dictionary {state:{action:{nextState:probability}}}, every state with the same action set,
+        or a CompiledMDP with rewards attached (rewardTable is then ignored and may be None)
+    rewardTable - nested dictionary {state:{action:{nextState:reward}}}
+    valueTable - dictionary {state:initial value}, None starts every state at 0
+Output: [valueTable, policyTable] as dictionaries keyed like the transition table
+    the compiled MDP, the converged value array and the (numberOfStates, numberOfActions) Q-value array stay available
+    as .mdp, .values and .qValues; getBoltzmannPoliciesForBetas gives the policies of other betas from the cached Q-values
+    .numberOfSweeps and .numberOfBackups (sweeps x states) count the work done, .numberOfActionBackups the rows of
+    expected next values computed (sweeps x states x actions, or sweeps x action groups)
+    sweepCallback, maxIterations and timeBudget are optional, see SolverMonitor; the run report is kept as .runReport
+    collapseActions - if True, every sweep computes one expected next value per action group (CompiledMDP.getActionGroups,
+        attached by SetupDeterministicTransitionByStateSet2Agent.getCompiledTransitions(groupActions=True) or detected)
+        and adds the per action expected rewards; the values are the same and the product skips the duplicate rows, but
+        the next values are then gathered back per action, which costs more than the skipped rows unless a large share of
+        the rows are duplicates (small or walled boards; interior joint states have 25 distinct successors)
+    dtype - float type of the sweeps: np.float32 keeps the values, Q-values, probabilities and expected rewards of the
+        sweeps in single precision, halving the memory traffic of a sweep. Single precision rounding limits how small
+        the change of a sweep can get, so a sweep whose change is within a few units of float32 rounding of the largest
+        value (.convergenceFloor) also counts as converged. Either way the Bellman residual of the returned values is
+        measured in float64, epsilon = max over states of |max over a of Q(s, a) - V(s)| (.bellmanResidual). The final
+        Q-values (.qValues) and the policies are computed in float64 from the returned values, so the rounding of
+        single precision Q-values (about beta*|Q| float32 units) never reaches the policies, and
+            .valueErrorBound = epsilon/(1-gamma), the largest distance of the values to the optimal values
+            .policyErrorBound = min(2, beta*gamma*(epsilon + gamma*convergenceTolerance)/(1-gamma)), the largest L1
+                distance of a state's Boltzmann policy to that of a float64 solve to the same tolerance (whose residual
+                is at most gamma*convergenceTolerance; Q-values are at most gamma*(sum of residuals)/(1-gamma) apart,
+                and a softmax of beta*Q moves at most beta times the largest Q change in L1)
+        all three are also in .runReport
+"""
+
+class BoltzmannValueIterationVectorized(object):
+    def __init__(self, transitionTable, rewardTable, valueTable, convergenceTolerance, discountingFactor, beta,
+            sweepCallback = None, maxIterations = None, timeBudget = None, collapseActions = False, dtype = np.float64):
+        self.transitionTable = transitionTable
+        self.rewardTable  = rewardTable
+        self.valueTable = valueTable
+        self.convergenceTolerance = convergenceTolerance
+        self.gamma = discountingFactor
+        self.beta = beta
+        self.sweepCallback = sweepCallback
+        self.maxIterations = maxIterations
+        self.timeBudget = timeBudget
+        self.collapseActions = collapseActions
+        if np.dtype(dtype) not in (np.float32, np.float64):
+            raise ValueError("dtype must be np.float32 or np.float64, not {}".format(np.dtype(dtype)))
+        self.dtype = np.dtype(dtype)
+
+    def __call__(self):
+        self.mdp, values = getCompiledSolverInputs(self.transitionTable, self.rewardTable, self.valueTable)
+        values = values.astype(self.dtype)
+        if self.valueTable is None:
+            self.valueTable = {}
+        if self.collapseActions:
+            getQValues = self.mdp.getCollapsedQValues
+            rowsPerSweep = self.mdp.getActionGroups()[0].shape[0]
+        else:
+            getQValues = self.mdp.getQValues
+            rowsPerSweep = self.mdp.numberOfStates*self.mdp.numberOfActions
+
+        monitor = SolverMonitor(self.convergenceTolerance, self.gamma, self.sweepCallback, self.maxIterations, self.timeBudget)
+        self.numberOfSweeps = 0
+        self.convergenceFloor = 0.0
+        delta = self.convergenceTolerance*100
+        while(delta > self.convergenceTolerance):
+            newValues = getQValues(values, self.gamma).max(axis=1)
+            delta = float(np.abs(newValues - values).max())
+            values = newValues
+            self.numberOfSweeps += 1
+            if self.dtype != np.float64:
+                self.convergenceFloor = 8*float(np.finfo(self.dtype).eps)*max(1.0, float(np.abs(values).max()))
+            if not monitor.recordSweep(delta, self.mdp.numberOfStates, converged = delta <= max(self.convergenceTolerance, self.convergenceFloor)):
+                break
+        self.numberOfBackups = self.numberOfSweeps*self.mdp.numberOfStates
+        self.numberOfActionBackups = self.numberOfSweeps*rowsPerSweep
+
+        self.values = values
+        # the final Q-values, and so the policies, are float64 whatever the sweeps' type
+        self.qValues = getQValues(values.astype(np.float64), self.gamma)
+        self.runReport = monitor.getRunReport()
+        self.runReport.update(self.getErrorBounds())
+        policies = self.getBoltzmannPolicies(self.qValues)
+        self.valueTable.update(self.mdp.getValueTable(values))
+        policyTable = self.mdp.getPolicyTable(policies)
+        return([self.valueTable, policyTable])
+
+    def getBoltzmannPolicies(self, qValues):
+        return(getBoltzmannPolicies(qValues, self.beta))
+
+    def getErrorBounds(self):
+        # Bellman residual of the returned values in float64 and the value and policy bounds it gives (see above)
+        self.bellmanResidual = float(np.abs(self.qValues.max(axis=1) - self.values).max())
+        if self.gamma >= 1:
+            self.valueErrorBound, self.policyErrorBound = math.inf, 2.0
+        else:
+            self.valueErrorBound = self.bellmanResidual/(1 - self.gamma)
+            qValueErrorBound = self.gamma*(self.bellmanResidual + self.gamma*self.convergenceTolerance)/(1 - self.gamma)
+            self.policyErrorBound = min(2.0, self.beta*qValueErrorBound)
+        return({'bellmanResidual': self.bellmanResidual, 'valueErrorBound': self.valueErrorBound, 'policyErrorBound': self.policyErrorBound})
+
+    def getBoltzmannPoliciesForBetas(self, betas, returnTables = False):
+        # policies for many betas from the cached converged Q-values, without solving again
+        policies = getBoltzmannPolicies(self.qValues, np.asarray(betas, dtype=float))
+        if returnTables:
+            return([self.mdp.getPolicyTable(betaPolicies) for betaPolicies in policies])
+        return(policies)
+
+
+"""
+Prioritized sweeping Boltzmann value iteration -
+    Same inputs and [valueTable, policyTable] output as BoltzmannValueIterationVectorized, but instead of sweeping every
+    state it keeps a priority for every state, an upper bound on its Bellman residual, and only backs up the states at
+    the top of that priority order. Backing up a state whose value changes by delta raises the priority of each
+    predecessor by gamma*(largest probability of reaching the state from it)*delta, an upper bound on how much that
+    predecessor's residual grew, so states whose successors did not change are never backed up again.
+    The queue is served in bands rather than one state at a time: every state whose priority is at least
+    priorityFraction of the current largest priority is backed up together as one sparse product, which keeps the
+    number of backups close to one-at-a-time prioritized sweeping without paying python overhead per state.
+    It stops when no priority is above the convergence tolerance, i.e. every Bellman residual is at most the tolerance.
+    Incremental re-solve: given the valueTable of a previous solution and the seedStates whose rewards or transitions
+    changed since (getChangedStates finds them), only the seed states and their predecessors start with their exact
+    residual and every other state starts at priority 0, so the update spreads out from the change. The other states'
+    residuals were already within the previous solve's tolerance, which is the only error this adds to the bound.
+Inputs:
+    transitionTable, rewardTable, valueTable, convergenceTolerance, discountingFactor, beta - as for BoltzmannValueIterationVectorized
+    priorityFraction - in (0, 1], 1 backs up only the states tied for the largest priority, smaller values take wider bands
+    seedStates - None starts every state at its exact residual, otherwise the list of changed states to start from
+    sweepCallback, maxIterations, timeBudget - optional, see SolverMonitor; every band counts as one sweep
+Output: [valueTable, policyTable]; .numberOfBackups counts the single state backups performed, to compare against
+    the .numberOfBackups of a full sweep solver; the run report is kept as .runReport
+"""
+
+class BoltzmannPrioritizedSweeping(object):
+    def __init__(self, transitionTable, rewardTable, valueTable, convergenceTolerance, discountingFactor, beta, priorityFraction = .1,
+            seedStates = None, sweepCallback = None, maxIterations = None, timeBudget = None):
+        self.transitionTable = transitionTable
+        self.rewardTable  = rewardTable
+        self.valueTable = valueTable
+        self.convergenceTolerance = convergenceTolerance
+        self.gamma = discountingFactor
+        self.beta = beta
+        self.priorityFraction = priorityFraction
+        self.seedStates = seedStates
+        self.sweepCallback = sweepCallback
+        self.maxIterations = maxIterations
+        self.timeBudget = timeBudget
+
+    def __call__(self):
+        self.mdp, values = getCompiledSolverInputs(self.transitionTable, self.rewardTable, self.valueTable)
+        if self.valueTable is None:
+            self.valueTable = {}
+
+        predecessorMatrix = self.getPredecessorMatrix()
+        if self.seedStates is None:
+            # every state starts with its exact Bellman residual as priority
+            priorities = np.abs(self.mdp.getQValues(values, self.gamma).max(axis=1) - values)
+        else:
+            seeds = np.array([self.mdp.stateIndex[state] for state in self.seedStates], dtype=int)
+            affectedStates = np.union1d(seeds, predecessorMatrix[:, seeds].indices)
+            priorities = np.zeros(self.mdp.numberOfStates)
+            priorities[affectedStates] = np.abs(self.backUpStates(affectedStates, values) - values[affectedStates])
+        self.values = self.sweepByPriority(values, priorities, predecessorMatrix)
+
+        self.qValues = self.mdp.getQValues(self.values, self.gamma)
+        policies = getBoltzmannPolicies(self.qValues, self.beta)
+        self.valueTable.update(self.mdp.getValueTable(self.values))
+        return([self.valueTable, self.mdp.getPolicyTable(policies)])
+
+    def sweepByPriority(self, values, priorities, predecessorMatrix):
+        monitor = SolverMonitor(self.convergenceTolerance, self.gamma, self.sweepCallback, self.maxIterations, self.timeBudget)
+        values = values.copy()
+        self.numberOfBackups = 0
+        self.numberOfBands = 0
+
+        largestPriority = priorities.max()
+        while largestPriority > self.convergenceTolerance:
+            band = np.flatnonzero(priorities >= max(self.convergenceTolerance, self.priorityFraction*largestPriority))
+            newValues = self.backUpStates(band, values)
+            deltas = np.abs(newValues - values[band])
+            values[band] = newValues
+            # a backed up state's residual is 0 until one of its successors changes
+            priorities[band] = 0
+            changed = deltas > 0
+            priorities += predecessorMatrix[:, band[changed]] @ deltas[changed]
+            self.numberOfBackups += len(band)
+            self.numberOfBands += 1
+            largestPriority = priorities.max()
+            # the largest priority bounds the residual of the current values, not the change of a full sweep
+            if not monitor.recordSweep(largestPriority, len(band), residualOfBackedUpValues = False):
+                break
+        self.runReport = monitor.getRunReport()
+        return(values)
+
+    def backUpStates(self, states, values):
+        # new values of the given state indices only
+        numberOfActions = self.mdp.numberOfActions
+        rows = (states[:, None]*numberOfActions + np.arange(numberOfActions)[None, :]).ravel()
+        qValues = self.mdp.expectedRewards[states] + self.gamma*(self.mdp.transitionMatrix[rows] @ values).reshape(len(states), numberOfActions)
+        return(qValues.max(axis=1))
+
+    def getPredecessorMatrix(self):
+        # (predecessor, state) entry is gamma times the largest probability of any action of the predecessor reaching the state
+        stateOfEntries = self.mdp.getRowOfEntries() // self.mdp.numberOfActions
+        keys = stateOfEntries*self.mdp.numberOfStates + self.mdp.nextStateIndices
+        order = np.argsort(keys, kind='stable')
+        uniqueKeys, groupStarts = np.unique(keys[order], return_index=True)
+        largestProbabilities = np.maximum.reduceat(self.mdp.probabilities[order], groupStarts)
+        predecessors, successors = np.divmod(uniqueKeys, self.mdp.numberOfStates)
+        return(sparse.csc_matrix((self.gamma*largestProbabilities, (predecessors, successors)), 
+            shape=(self.mdp.numberOfStates, self.mdp.numberOfStates)))
+
+
+"""
+Boltzmann policy iteration -
+    Same inputs and [valueTable, policyTable] output as BoltzmannValueIterationVectorized. Alternates evaluating the
+    current greedy (deterministic) policy and improving it greedily from the evaluated Q-values; the Boltzmann policy
+    is only formed from the Q-values of the final values.
+    evaluationSteps None evaluates each policy exactly with one sparse linear solve of (I - gamma*P_policy) V = R_policy
+    and stops when the greedy policy no longer changes (ties keep the current action). An integer evaluationSteps is
+    modified policy iteration: each policy is evaluated with that many sparse backups under the fixed policy, starting
+    from the improvement backup, and it stops once the Bellman residual is at most the convergence tolerance.
+Inputs:
+    transitionTable, rewardTable, valueTable, convergenceTolerance, discountingFactor, beta - as for BoltzmannValueIterationVectorized
+    evaluationSteps - None for exact evaluation, or the number of partial evaluation backups per policy
+    sweepCallback, maxIterations, timeBudget - optional, see SolverMonitor; every improvement step counts as one sweep
+Output: [valueTable, policyTable]; .values, .qValues and .mdp as for BoltzmannValueIterationVectorized,
+    the greedy action index of each state as .greedyActions, the number of improvement steps as .numberOfIterations
+    and the run report as .runReport
+"""
+
+class BoltzmannPolicyIteration(object):
+    def __init__(self, transitionTable, rewardTable, valueTable, convergenceTolerance, discountingFactor, beta, evaluationSteps = None,
+            sweepCallback = None, maxIterations = None, timeBudget = None):
+        self.transitionTable = transitionTable
+        self.rewardTable  = rewardTable
+        self.valueTable = valueTable
+        self.convergenceTolerance = convergenceTolerance
+        self.gamma = discountingFactor
+        self.beta = beta
+        self.evaluationSteps = evaluationSteps
+        self.sweepCallback = sweepCallback
+        self.maxIterations = maxIterations
+        self.timeBudget = timeBudget
+
+    def __call__(self):
+        self.mdp, values = getCompiledSolverInputs(self.transitionTable, self.rewardTable, self.valueTable)
+        if self.valueTable is None:
+            self.valueTable = {}
+
+        qValues = self.mdp.getQValues(values, self.gamma)
+        greedyActions = qValues.argmax(axis=1)
+        values = qValues.max(axis=1)
+        monitor = SolverMonitor(self.convergenceTolerance, self.gamma, self.sweepCallback, self.maxIterations, self.timeBudget)
+        self.numberOfIterations = 0
+        while True:
+            values = self.evaluatePolicy(greedyActions, values)
+            qValues = self.mdp.getQValues(values, self.gamma)
+            newValues = qValues.max(axis=1)
+            residual = np.abs(newValues - values).max()
+            self.numberOfIterations += 1
+            if self.evaluationSteps is None:
+                newActions = self.getImprovedActions(qValues, newValues, greedyActions)
+                policyStable = np.array_equal(newActions, greedyActions)
+                greedyActions = newActions
+                keepGoing = monitor.recordSweep(residual, self.mdp.numberOfStates, residualOfBackedUpValues = False, converged = policyStable)
+            else:
+                greedyActions = qValues.argmax(axis=1)
+                values = newValues
+                keepGoing = monitor.recordSweep(residual, self.mdp.numberOfStates)
+            if not keepGoing:
+                break
+        self.runReport = monitor.getRunReport()
+
+        self.values = values
+        self.greedyActions = greedyActions
+        self.qValues = self.mdp.getQValues(values, self.gamma)
+        policies = getBoltzmannPolicies(self.qValues, self.beta)
+        self.valueTable.update(self.mdp.getValueTable(values))
+        return([self.valueTable, self.mdp.getPolicyTable(policies)])
+
+    def getImprovedActions(self, qValues, newValues, greedyActions):
+        # an action whose Q-value is within round off of the best is kept, so ties cannot make the policy cycle
+        states = np.arange(self.mdp.numberOfStates)
+        keepAction = qValues[states, greedyActions] >= newValues - 1e-10*np.maximum(1, np.abs(newValues))
+        return(np.where(keepAction, greedyActions, qValues.argmax(axis=1)))
+
+    def evaluatePolicy(self, greedyActions, values):
+        states = np.arange(self.mdp.numberOfStates)
+        policyTransitions = self.mdp.transitionMatrix[states*self.mdp.numberOfActions + greedyActions]
+        policyRewards = self.mdp.expectedRewards[states, greedyActions]
+        if self.evaluationSteps is None:
+            systemMatrix = sparse.identity(self.mdp.numberOfStates, format='csc') - self.gamma*policyTransitions.tocsc()
+            return(spsolve(systemMatrix, policyRewards))
+        for step in range(self.evaluationSteps):
+            values = policyRewards + self.gamma*(policyTransitions @ values)
+        return(values)
+
+
+"""
+Solver monitor - per sweep telemetry, budgets and stopping for the value/policy iteration solvers.
+    After every sweep the solver reports the largest Bellman residual and the number of states it backed up. The monitor
+    keeps the residual history, calls sweepCallback with a dictionary of
+        sweep, maxResidual, statesUpdated, elapsedTime (seconds since the solve started), valueErrorBound
+    and tells the solver to stop once it converged, maxIterations sweeps were run, timeBudget seconds passed or the
+    callback returned True. valueErrorBound bounds the largest distance of the values to the optimal values:
+        gamma*residual/(1-gamma) when the residual is the change of the sweep that produced the values,
+        residual/(1-gamma) when it is the Bellman residual of the values themselves
+Inputs:
+    convergenceTolerance, discountingFactor - of the solver
+    sweepCallback - None, or function of the sweep dictionary, returning True stops the solve
+    maxIterations - None, or the largest number of sweeps
+    timeBudget - None, or the largest number of seconds (checked after every sweep)
+Output: getRunReport gives a dictionary of stopReason ('converged', 'maxIterations', 'timeBudget' or 'callback'),
+    converged, sweeps, statesUpdated (total), elapsedTime, maxResidual, valueErrorBound and residuals (one per sweep)
+"""
+
+class SolverMonitor(object):
+    def __init__(self, convergenceTolerance, discountingFactor, sweepCallback = None, maxIterations = None, timeBudget = None):
+        self.convergenceTolerance = convergenceTolerance
+        self.gamma = discountingFactor
+        self.sweepCallback = sweepCallback
+        self.maxIterations = maxIterations
+        self.timeBudget = timeBudget
+        self.startTime = time.perf_counter()
+        self.residuals = []
+        self.statesUpdated = 0
+        self.valueErrorBound = math.inf
+        self.stopReason = None
+
+    def recordSweep(self, maxResidual, statesUpdated, residualOfBackedUpValues = True, converged = None):
+        # returns False once the solver should stop
+        maxResidual = float(maxResidual)
+        self.residuals.append(maxResidual)
+        self.statesUpdated += statesUpdated
+        self.valueErrorBound = self.getValueErrorBound(maxResidual, residualOfBackedUpValues)
+        elapsedTime = time.perf_counter() - self.startTime
+        if converged is None:
+            converged = maxResidual <= self.convergenceTolerance
+
+        callbackStop = False
+        if self.sweepCallback is not None:
+            callbackStop = self.sweepCallback({'sweep': len(self.residuals), 'maxResidual': maxResidual, 'statesUpdated': statesUpdated,
+                'elapsedTime': elapsedTime, 'valueErrorBound': self.valueErrorBound}) is True
+        if converged:
+            self.stopReason = 'converged'
+        elif callbackStop:
+            self.stopReason = 'callback'
+        elif self.maxIterations is not None and len(self.residuals) >= self.maxIterations:
+            self.stopReason = 'maxIterations'
+        elif self.timeBudget is not None and elapsedTime >= self.timeBudget:
+            self.stopReason = 'timeBudget'
+        return(self.stopReason is None)
+
+    def getValueErrorBound(self, maxResidual, residualOfBackedUpValues):
+        if self.gamma >= 1:
+            return(math.inf)
+        factor = self.gamma if residualOfBackedUpValues else 1
+        return(factor*maxResidual/(1 - self.gamma))
+
+    def getRunReport(self):
+        # a solve that needed no sweep at all (e.g. an incremental re-solve of an unchanged MDP) has converged
+        stopReason = self.stopReason or 'converged'
+        return({'stopReason': stopReason, 'converged': stopReason == 'converged', 'sweeps': len(self.residuals),
+            'statesUpdated': self.statesUpdated, 'elapsedTime': time.perf_counter() - self.startTime,
+            'maxResidual': self.residuals[-1] if self.residuals else None, 'valueErrorBound': self.valueErrorBound,
+            'residuals': list(self.residuals)})
+
+
+"""
+Changed states between two compiled MDPs over the same states and actions (e.g. before and after moving a trap or changing
+goalReward/trapCost), for the seedStates of an incremental BoltzmannPrioritizedSweeping re-solve
+Output: list of the states with an action whose expected reward or successor distribution differs
+"""
+
+def getChangedStates(previousMDP, mdp):
+    if previousMDP.states != mdp.states or previousMDP.actions != mdp.actions:
+        raise ValueError("both MDPs must have the same states and actions in the same order")
+    rewardChanged = (previousMDP.expectedRewards != mdp.expectedRewards).any(axis=1)
+    transitionDifference = abs(mdp.transitionMatrix - previousMDP.transitionMatrix).tocoo()
+    changedRows = transitionDifference.row[transitionDifference.data > 0]
+    transitionChanged = np.bincount(changedRows // mdp.numberOfActions, minlength=mdp.numberOfStates) > 0
+    return([mdp.states[state] for state in np.flatnonzero(rewardChanged | transitionChanged)])
+
+
+"""
+Compiles solver inputs - the transition/reward tables (or an already compiled MDP) and the initial value table
+Output: CompiledMDP, initial value array (zeros if valueTable is None)
+"""
+
+def getCompiledSolverInputs(transitionTable, rewardTable, valueTable):
+    if isinstance(transitionTable, CompiledMDP):
+        mdp = transitionTable
+    else:
+        mdp = SetupCompiledMDP(transitionTable, rewardTable)()
+    if valueTable is None:
+        return(mdp, np.zeros(mdp.numberOfStates))
+    return(mdp, mdp.getValueArray(valueTable))
+
+
+"""
+Boltzmann (softmax) policies for an array of Q-values -
+Inputs:
+    qValues - (numberOfStates, numberOfActions) array, or (numberOfStates, numberOfActions, k) for k value functions
+        solved side by side (actionAxis -2)
+    beta - rationality scalar, or a 1-d array of betas
+    actionAxis - negative axis of the actions in qValues
+Output: policy array shaped like qValues for a scalar beta, with a leading axis of the betas otherwise
+    the largest exponent of each state is subtracted before exponentiating, so large beta*Q cannot overflow
+"""
+
+def getBoltzmannPolicies(qValues, beta, actionAxis = -1):
+    exponents = np.multiply.outer(beta, qValues)
+    exponents -= exponents.max(axis=actionAxis, keepdims=True)
+    policies = np.exp(exponents, out=exponents)
+    policies /= policies.sum(axis=actionAxis, keepdims=True)
+    return(policies)
+
+
+"""
+Batched value iteration - sweeps k value functions of one compiled MDP side by side, one (numberOfStates, k) sparse
+    product per sweep, for the same transitions under k reward functions (agentAbilitySweep, goalInference). A value
+    function that has converged is dropped from the following sweeps, so the batch only narrows.
+Inputs:
+    mdp - CompiledMDP
+    expectedRewards - (numberOfStates, numberOfActions, k) array
+    values - (numberOfStates, k) initial values, updated in place
+    convergenceTolerance, discountingFactor - as for BoltzmannValueIteration
+    valueMask - optional (numberOfStates, k) array the new values are multiplied by every sweep, e.g. 0 for states that
+        move to 'terminal' whatever the action
+Output: converged values (the values array), number of sweeps run
+"""
+
+def getBatchedValues(mdp, expectedRewards, values, convergenceTolerance, discountingFactor, valueMask = None):
+    active = np.arange(values.shape[1])
+    activeValues = values
+    activeRewards = expectedRewards
+    activeMask = valueMask
+    numberOfSweeps = 0
+    while len(active) > 0:
+        qValues = mdp.getQValues(activeValues, discountingFactor, activeRewards)
+        # a running maximum over the action slices is faster than reducing over the middle axis
+        newValues = qValues[:, 0, :].copy()
+        for actionIndex in range(1, qValues.shape[1]):
+            np.maximum(newValues, qValues[:, actionIndex, :], out=newValues)
+        if activeMask is not None:
+            newValues *= activeMask
+        delta = np.abs(newValues - activeValues).max(axis=0)
+        values[:, active] = newValues
+        numberOfSweeps += 1
+
+        stillActive = delta > convergenceTolerance
+        if not stillActive.all():
+            active = active[stillActive]
+            activeRewards = expectedRewards[:, :, active]
+            activeMask = None if valueMask is None else valueMask[:, active]
+            newValues = values[:, active]
+        activeValues = newValues
+    return(values, numberOfSweeps)
+
 def main():
     pass
 
@@ -0,0 +1,140 @@
+import numpy as np
+from grosseJointPlanner import SetupDeterministicTransitionByStateSet2Agent, SetupRewardTable2AgentWeakStrong
+from ValueIteration import BoltzmannValueIterationVectorized
+
+"""
+Coarse to fine Boltzmann value iteration - warm starts the joint solve of a large board from the solution of a coarser board.
+    The single agent cells are grouped into blockSize x blockSize blocks, each block is one cell of the coarse board, and the
+    coarse joint MDP is built and rewarded with the existing setup classes (goal and trap blocks are the blocks of the goal and
+    trap cells). One coarse move stands for blockSize fine moves, so the coarse discount is gamma**blockSize and the coarse
+    move costs are the discounted sum of blockSize fine move costs (agent abilities and the cost of no movement scaled by
+    1 + gamma + ... + gamma**(blockSize-1)). The coarse board is itself solved coarse to fine while it has more than
+    minimumCells cells.
+    Every fine joint state starts from the coarse value of the blocks its agents are in; states whose agents share a block
+    (no coarse state) start from the mean coarse value with agent 2 in a block next to agent 1's, states with an agent in
+    the goal block from the goal reward, and states on the goal at 0 as in the fine MDP.
+    These block values are off by up to the cost of crossing a block, and overestimates are costly: where staying put is
+    optimal the values can only fall back geometrically (a factor gamma per sweep). So the warm start aims to underestimate:
+    it is the larger of the prolonged values less the cost of both agents crossing a block, a heuristic underestimate with
+    no guarantee (the coarse board ignores barriers and where within a block the agents are), and the value of both agents
+    staying put forever (costOfNoMovement/(1-gamma) per agent), a true lower bound that is exact wherever staying is
+    optimal. An overestimate only costs sweeps, never accuracy. Boards with at most minimumCells cells, the coarsest
+    level, start from the staying values alone (0 where the null action does not keep the state in place).
+    The fine solve is then an ordinary BoltzmannValueIterationVectorized solve, so the result is the same as a cold start
+    within the convergence tolerance; only the number of sweeps changes. Barriers are ignored on coarse boards.
+Inputs:
+    stateSet, actionSet, goalState, barrierList - as for SetupDeterministicTransitionByStateSet2Agent
+    trapStates, goalReward, trapCost, costOfNoMovement, agentAbilities - as for SetupRewardTable2AgentWeakStrong
+        (agentAbilities (1, 1) gives the SetupRewardTable2AgentDistanceCost rewards)
+    convergenceTolerance, discountingFactor, beta - as for BoltzmannValueIteration
+    blockSize - number of fine cells along each side of a block
+    minimumCells - boards with at most this many cells are solved directly
+Output: [valueTable, policyTable] of the fine board (None if returnTables is False); the fine compiled MDP, values,
+    Q-values and solver stay available as .mdp, .values, .qValues and .solver, the fine sweeps as .numberOfSweeps
+    and the sweeps of every level, coarsest first, as .sweepsPerLevel
+"""
+
+class CoarseToFineBoltzmannValueIteration(object):
+    def __init__(self, stateSet, actionSet, goalState, trapStates, convergenceTolerance, discountingFactor, beta, blockSize = 2,
+            minimumCells = 36, barrierList = [], goalReward = 10, trapCost = -100, costOfNoMovement = .1, agentAbilities = (1, 1)):
+        self.stateSet = stateSet
+        self.actionSet = actionSet
+        self.goalState = goalState
+        self.trapStates = trapStates
+        self.convergenceTolerance = convergenceTolerance
+        self.gamma = discountingFactor
+        self.beta = beta
+        self.blockSize = blockSize
+        self.minimumCells = minimumCells
+        self.barrierList = barrierList
+        self.goalReward = goalReward
+        self.trapCost = trapCost
+        self.costOfNoMovement = costOfNoMovement
+        self.agentAbilities = agentAbilities
+
+    def __call__(self, returnTables = True):
+        compiledTransitions = SetupDeterministicTransitionByStateSet2Agent(self.stateSet, self.actionSet, self.goalState,
+            self.barrierList).getCompiledTransitions()
+        self.mdp = SetupRewardTable2AgentWeakStrong(compiledTransitions, [self.goalState], self.trapStates, self.goalReward,
+            self.trapCost, self.costOfNoMovement).getCompiledRewards(self.agentAbilities)
+
+        self.sweepsPerLevel = []
+        stayingValues = self.getStayingValues()
+        initialValues = np.where(np.isinf(stayingValues), 0, stayingValues)
+        if len(self.stateSet) > self.minimumCells:
+            coarseSolver = self.solveCoarseBoard()
+            self.sweepsPerLevel = coarseSolver.sweepsPerLevel
+            initialValues = np.maximum(self.getWarmStartValues(coarseSolver), stayingValues)
+        initialValueTable = self.mdp.getValueTable(initialValues)
+
+        self.solver = BoltzmannValueIterationVectorized(self.mdp, None, initialValueTable, self.convergenceTolerance, self.gamma, self.beta)
+        valueTable, policyTable = self.solver()
+        self.values, self.qValues = self.solver.values, self.solver.qValues
+        self.numberOfSweeps = self.solver.numberOfSweeps
+        self.sweepsPerLevel = self.sweepsPerLevel + [self.numberOfSweeps]
+        if not returnTables:
+            return(None)
+        return([valueTable, policyTable])
+
+    def solveCoarseBoard(self):
+        coarseStateSet = sorted(set(self.getBlock(cell) for cell in self.stateSet))
+        coarseTrapStates = sorted(set(self.getBlock(trap) for trap in self.trapStates))
+        coarseGoalState = self.getBlock(self.goalState)
+
+        # blockSize fine steps: discount gamma**blockSize, costs discounted over the steps
+        costScale = sum(self.gamma**step for step in range(self.blockSize))
+        coarseSolver = CoarseToFineBoltzmannValueIteration(coarseStateSet, self.actionSet, coarseGoalState, coarseTrapStates,
+            self.convergenceTolerance, self.gamma**self.blockSize, self.beta, self.blockSize, self.minimumCells, [],
+            self.goalReward, self.trapCost, self.costOfNoMovement*costScale, tuple(costScale*ability for ability in self.agentAbilities))
+        coarseSolver(returnTables = False)
+        return(coarseSolver)
+
+    def getBlock(self, cell):
+        return(tuple(coordinate // self.blockSize for coordinate in cell))
+
+    def getWarmStartValues(self, coarseSolver):
+        coarseCells, coarseStateCells = coarseSolver.mdp.getStateCells()
+        numberOfBlocks = len(coarseCells)
+        # coarse value of every ordered pair of blocks
+        pairValues = np.full((numberOfBlocks, numberOfBlocks), np.nan)
+        isJointState = (coarseStateCells >= 0).all(axis=1)
+        pairValues[coarseStateCells[isJointState, 0], coarseStateCells[isJointState, 1]] = coarseSolver.values[isJointState]
+        # agents sharing a block are next to each other, so they start from the mean over agent 2 in a neighbouring block
+        blockCoordinates = np.array(coarseCells)
+        isNeighbour = np.abs(blockCoordinates[:, None, :] - blockCoordinates[None, :, :]).max(axis=2) == 1
+        neighbourValues = np.where(isNeighbour & ~np.isnan(pairValues), pairValues, 0)
+        sameBlockValues = neighbourValues.sum(axis=1)/np.maximum((isNeighbour & ~np.isnan(pairValues)).sum(axis=1), 1)
+
+        cells, stateCells = self.mdp.getStateCells()
+        coarseCellIndex = {block: index for index, block in enumerate(coarseCells)}
+        # block index of every fine cell, the extra last entry keeps 'terminal' (cell index -1) at -1
+        blockOfCell = np.array([coarseCellIndex[self.getBlock(cell)] for cell in cells] + [-1])
+        stateBlocks = blockOfCell[stateCells]
+        isFineJointState = (stateCells >= 0).all(axis=1)
+        values = np.zeros(self.mdp.numberOfStates)
+        firstBlocks, secondBlocks = stateBlocks[isFineJointState, 0], stateBlocks[isFineJointState, 1]
+        values[isFineJointState] = np.where(firstBlocks == secondBlocks, sameBlockValues[firstBlocks], pairValues[firstBlocks, secondBlocks])
+
+        # a coarse state in the goal block has already earned the goal reward, so its value (0) is far below that of a fine
+        # state next to the goal; those states start from the goal reward, and on the goal every action moves to 'terminal'
+        goalBlock = coarseCellIndex.get(self.getBlock(self.goalState), -2)
+        values[(stateBlocks == goalBlock).any(axis=1)] = abs(self.goalReward)
+        goalIndex = cells.index(self.goalState) if self.goalState in cells else -2
+        values[(stateCells == goalIndex).any(axis=1)] = 0
+
+        # less the cost of both agents crossing a block, usually but not always below the optimal values
+        blockCrossingCost = self.blockSize*np.abs(np.array(self.agentAbilities, dtype=float)).sum()
+        return(values - blockCrossingCost)
+
+    def getStayingValues(self):
+        # value of repeating the null joint action forever in states it keeps in place, -inf elsewhere (a lower bound of the optimum)
+        stayingValues = np.full(self.mdp.numberOfStates, -np.inf)
+        isNullAction = (self.mdp.getActionComponents() == 0).all(axis=(1, 2))
+        if not isNullAction.any():
+            return(stayingValues)
+        nullAction = np.flatnonzero(isNullAction)[0]
+        nullRows = np.arange(self.mdp.numberOfStates)*self.mdp.numberOfActions + nullAction
+        staysInPlace = np.diff(self.mdp.rowPointer)[nullRows] == 1
+        staysInPlace &= self.mdp.nextStateIndices[self.mdp.rowPointer[nullRows]] == np.arange(self.mdp.numberOfStates)
+        stayingValues[staysInPlace] = self.mdp.expectedRewards[staysInPlace, nullAction]/(1 - self.gamma)
+        return(stayingValues)
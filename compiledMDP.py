@@ -0,0 +1,432 @@
+import sys
+import numpy as np
+import scipy.sparse as sparse
+from collections.abc import Mapping
+
+"""
+Compiled MDP - integer indexed form of the nested transition/reward dictionaries shared by the builders and solvers.
+    states - list of state keys, position in the list is the state index (e.g. joint states and 'terminal')
+    actions - list of action keys shared by every state, position in the list is the action index
+    Row r = stateIndex*numberOfActions + actionIndex of the CSR structure holds the successors of that (state, action):
+        rowPointer - array of length numberOfStates*numberOfActions + 1, successors of row r are entries rowPointer[r]:rowPointer[r+1]
+        nextStateIndices - state index of each successor entry
+        probabilities - transition probability of each successor entry
+        rewards - reward of each successor entry (aligned with the entries), or None if no reward has been attached
+    cells, stateCells - optional list of single agent cells and (numberOfStates, numberOfAgents) array of the cell index of
+        each agent in every state (-1 for states that are not tuples of cells, e.g. 'terminal'), found from the keys if not given
+    actionGroups - optional (groupRows, rowGroups) from getActionGroupsOfKeys, the actions of every state collapsed to its
+        distinct successor distributions (see getActionGroups), found from the CSR arrays if not given
+
+    transitionTable and rewardTable give read only dictionary views {state:{action:{nextState:value}}} that are built
+    one state at a time on access, so code written against the nested dictionaries (e.g. visualizations.py) still works;
+    rewardTable is None while no rewards are attached.
+"""
+
+class CompiledMDP(object):
+    def __init__(self, states, actions, rowPointer, nextStateIndices, probabilities, rewards = None, cells = None, stateCells = None,
+            actionGroups = None):
+        self.states = states
+        self.actions = actions
+        self.stateIndex = {state: index for index, state in enumerate(states)}
+        self.actionIndex = {action: index for index, action in enumerate(actions)}
+        self.numberOfStates = len(states)
+        self.numberOfActions = len(actions)
+
+        self.rowPointer = np.asarray(rowPointer)
+        self.nextStateIndices = np.asarray(nextStateIndices)
+        self.probabilities = np.asarray(probabilities, dtype=float)
+        self.rewards = None if rewards is None else np.asarray(rewards, dtype=float)
+
+        self.transitionMatrix = sparse.csr_matrix((self.probabilities, self.nextStateIndices, self.rowPointer),
+            shape=(self.numberOfStates*self.numberOfActions, self.numberOfStates))
+        self.expectedRewards = None if rewards is None else self.getExpectedRewards(np.asarray(rewards, dtype=float))
+        self.cells = cells
+        self.stateCells = stateCells
+        self.actionGroups = actionGroups
+        self.actionGroupMatrix = None
+        self.typedArrays = {}
+
+    def getRowOfEntries(self):
+        # (state, action) row of every successor entry
+        return(np.repeat(np.arange(self.numberOfStates*self.numberOfActions), np.diff(self.rowPointer)))
+
+    def getStopStates(self, stopStates = None):
+        # (numberOfStates,) boolean mask of the given stop states, or of the absorbing states if stopStates is None
+        if stopStates is not None:
+            isStopState = np.zeros(self.numberOfStates, dtype=bool)
+            isStopState[[self.stateIndex[state] for state in stopStates]] = True
+            return(isStopState)
+        # absorbing: every entry of every action of the state leads back to it
+        stateOfEntries = self.getRowOfEntries() // self.numberOfActions
+        leavesState = self.nextStateIndices != stateOfEntries
+        return(np.bincount(stateOfEntries[leavesState], minlength=self.numberOfStates) == 0)
+
+    def getExpectedRewards(self, rewards):
+        # expected immediate reward of each (state, action): sum over next states of prob*reward
+        expectedRewards = np.bincount(self.getRowOfEntries(), weights=self.probabilities*rewards,
+            minlength=self.numberOfStates*self.numberOfActions)
+        return(expectedRewards.reshape(self.numberOfStates, self.numberOfActions))
+
+    def withRewards(self, rewards):
+        # same transition structure (arrays are shared, not copied) with a different reward per successor entry
+        return(CompiledMDP(self.states, self.actions, self.rowPointer, self.nextStateIndices, self.probabilities, rewards, 
+            self.cells, self.stateCells, self.actionGroups))
+
+    def getStateCells(self):
+        # per agent cell index of every state, found once from the state keys unless the builder supplied it
+        if self.stateCells is None:
+            jointStates = [state for state in self.states if isinstance(state, tuple)]
+            numberOfAgents = len(jointStates[0])
+            self.cells = sorted(set(cell for state in jointStates for cell in state))
+            cellIndex = {cell: index for index, cell in enumerate(self.cells)}
+            self.stateCells = np.array([[cellIndex[cell] for cell in state] if isinstance(state, tuple) else [-1]*numberOfAgents 
+                for state in self.states], dtype=int)
+        return(self.cells, self.stateCells)
+
+    def getActionGroups(self, statesPerBlock = 4096):
+        # the actions of a state often lead to the same successor distribution (walking into a wall and not moving, the
+        # collisions that leave the state unchanged, every action of a state on the goal), so their expected next values
+        # are the same; groupMatrix (numberOfGroups, numberOfStates) holds every distinct successor distribution of every
+        # state once, and rowGroups the group of every (state, action) row
+        if self.actionGroups is None:
+            rowLengths = np.diff(self.rowPointer)
+            distributionKeys = np.empty(self.numberOfStates*self.numberOfActions, dtype=np.int64)
+            # rows are compared padded to the longest row, a block of states at a time to bound the padded arrays;
+            # the keys only need to tell the rows of one state apart
+            for firstState in range(0, self.numberOfStates, statesPerBlock):
+                firstRow = firstState*self.numberOfActions
+                lastRow = min(firstState + statesPerBlock, self.numberOfStates)*self.numberOfActions
+                blockLengths = rowLengths[firstRow:lastRow]
+                entries = np.arange(self.rowPointer[firstRow], self.rowPointer[lastRow])
+                entryRows = np.repeat(np.arange(lastRow - firstRow), blockLengths)
+                entryColumns = entries - np.repeat(self.rowPointer[firstRow:lastRow], blockLengths)
+                width = max(blockLengths.max(initial=0), 1)
+                rowContents = np.full((lastRow - firstRow, 2*width), -1, dtype=np.int64)
+                rowContents[entryRows, entryColumns] = self.nextStateIndices[entries]
+                rowContents[entryRows, width + entryColumns] = self.probabilities[entries].view(np.int64)
+                distributionKeys[firstRow:lastRow] = getRowKeys(rowContents, self.numberOfActions)
+            self.actionGroups = getActionGroupsOfKeys(distributionKeys, self.numberOfActions)
+        if self.actionGroupMatrix is None:
+            self.actionGroupMatrix = self.transitionMatrix[self.actionGroups[0]]
+        return(self.actionGroupMatrix, self.actionGroups[1])
+
+    def getCollapsedQValues(self, values, gamma, expectedRewards = None):
+        # same result as getQValues, with one expected next value per action group; the actions of a group differ only
+        # in their expected reward, which is added per action
+        rowGroups = self.getActionGroups()[1]
+        values = getSweepValues(values)
+        transitionMatrix, typedRewards, groupMatrix = self.getTypedArrays(values.dtype)
+        nextValues = (groupMatrix @ values)[rowGroups]
+        qValues = nextValues.reshape((self.numberOfStates, self.numberOfActions) + values.shape[1:])
+        if expectedRewards is None:
+            expectedRewards = typedRewards.reshape(typedRewards.shape + (1,)*(values.ndim-1))
+        qValues *= gamma
+        qValues += expectedRewards
+        return(qValues)
+
+    def getActionComponents(self):
+        # (numberOfActions, numberOfAgents, dimensions) array of each agent's move in every joint action
+        return(np.array(self.actions, dtype=float))
+
+    def getTypedArrays(self, dtype):
+        # transition matrix, expected rewards and action group matrix (None until grouped) stored in another float
+        # type, e.g. float32 for reduced precision sweeps; the index arrays are shared with the float64 matrix
+        dtype = getSweepType(dtype)
+        if dtype == np.float64:
+            return(self.transitionMatrix, self.expectedRewards, self.actionGroupMatrix)
+        if dtype not in self.typedArrays or (self.typedArrays[dtype][2] is None and self.actionGroupMatrix is not None):
+            typedMatrices = [None if matrix is None else sparse.csr_matrix((matrix.data.astype(dtype), matrix.indices, matrix.indptr),
+                shape=matrix.shape, copy=False) for matrix in [self.transitionMatrix, self.actionGroupMatrix]]
+            typedRewards = None if self.expectedRewards is None else self.expectedRewards.astype(dtype)
+            self.typedArrays[dtype] = (typedMatrices[0], typedRewards, typedMatrices[1])
+        return(self.typedArrays[dtype])
+
+    def getQValues(self, values, gamma, expectedRewards = None):
+        # values is (numberOfStates,) or (numberOfStates, k) for k value functions solved side by side,
+        # expectedRewards defaults to the attached rewards or can be given per value function as (numberOfStates, numberOfActions, k);
+        # float32 values are backed up with float32 copies of the probabilities and rewards
+        values = getSweepValues(values)
+        transitionMatrix, typedRewards, groupMatrix = self.getTypedArrays(values.dtype)
+        qValues = (transitionMatrix @ values).reshape((self.numberOfStates, self.numberOfActions) + values.shape[1:])
+        if expectedRewards is None:
+            expectedRewards = typedRewards.reshape(typedRewards.shape + (1,)*(values.ndim-1))
+        # in place, so a sweep allocates one (state, action) array rather than three
+        qValues *= gamma
+        qValues += expectedRewards
+        return(qValues)
+
+    def getValueArray(self, valueTable):
+        return(np.array([valueTable[state] for state in self.states], dtype=float))
+
+    def getValueTable(self, values):
+        return(dict(zip(self.states, values.tolist())))
+
+    def getPolicyTable(self, policies):
+        return({state: dict(zip(self.actions, statePolicy)) for state, statePolicy in zip(self.states, policies.tolist())})
+
+    def getCompactMDP(self):
+        return(CompactCompiledMDP(self.states, self.actions, self.rowPointer, self.nextStateIndices, self.probabilities, self.rewards,
+            self.cells, self.stateCells, self.actionGroups))
+
+    def getMemoryFootprint(self):
+        # bytes held by each part (arrays shared between parts are counted once), state/action keys included, and the total
+        arrays = self.getStoredArrays()
+        footprint = {}
+        countedArrays = []
+        for name, array in arrays.items():
+            if array is None or not isinstance(array, np.ndarray):
+                continue
+            shared = any(np.shares_memory(array, counted) for counted in countedArrays)
+            footprint[name] = 0 if shared else array.nbytes
+            countedArrays.append(array)
+        footprint['keys'] = getNestedTableBytes([self.states, self.actions, self.stateIndex, self.actionIndex])
+        footprint['total'] = sum(footprint.values())
+        return(footprint)
+
+    def getStoredArrays(self):
+        return({'rowPointer': self.rowPointer, 'nextStateIndices': self.nextStateIndices, 'probabilities': self.probabilities,
+            'rewards': self.rewards, 'expectedRewards': self.expectedRewards, 'stateCells': self.stateCells,
+            'transitionMatrix.indptr': self.transitionMatrix.indptr, 'transitionMatrix.indices': self.transitionMatrix.indices,
+            'transitionMatrix.data': self.transitionMatrix.data})
+
+    @property
+    def transitionTable(self):
+        return(CompiledTableView(self, self.probabilities))
+
+    @property
+    def rewardTable(self):
+        # None like .rewards while no rewards are attached (e.g. getCompiledTransitions output)
+        rewards = self.rewards
+        if rewards is None:
+            return(None)
+        return(CompiledTableView(self, rewards))
+
+
+"""
+Compact compiled MDP - the same interface as CompiledMDP with a smaller footprint, made by CompiledMDP.getCompactMDP.
+    The index arrays use 32 bit integers when the table is small enough, and the state/successor/probability arrays are
+    the ones of the sparse transition matrix rather than a second copy.
+    Rewards are stored as the expected immediate reward of each (state, action) plus a sparse list of the successor entries
+    whose reward differs from it by more than rewardTolerance; for the joint tables only rows whose successors differ in
+    reward (e.g. a collision split or a slip where one outcome lands on a trap) need an exception. .rewards rebuilds the
+    per entry array when it is read, exact for the exceptions and within rewardTolerance for the other entries.
+"""
+
+class CompactCompiledMDP(CompiledMDP):
+    # relative and absolute tolerance of a reward to its row's expected reward before it is stored as an exception
+    rewardTolerance = 1e-12
+
+    def __init__(self, states, actions, rowPointer, nextStateIndices, probabilities, rewards = None, cells = None, stateCells = None,
+            actionGroups = None):
+        indexType = getIndexType(len(states), len(nextStateIndices))
+        super(CompactCompiledMDP, self).__init__(states, actions, np.asarray(rowPointer, dtype=indexType),
+            np.asarray(nextStateIndices, dtype=indexType), probabilities, rewards, cells, stateCells, actionGroups)
+        # keep one copy of the CSR arrays, the transition matrix's
+        self.rowPointer = self.transitionMatrix.indptr
+        self.nextStateIndices = self.transitionMatrix.indices
+        self.probabilities = self.transitionMatrix.data
+
+    @property
+    def rewards(self):
+        if self.rewardExceptionEntries is None:
+            return(None)
+        rewards = np.repeat(self.expectedRewards.ravel(), np.diff(self.rowPointer))
+        rewards[self.rewardExceptionEntries] = self.rewardExceptionValues
+        return(rewards)
+
+    @rewards.setter
+    def rewards(self, rewards):
+        if rewards is None:
+            self.rewardExceptionEntries = None
+            self.rewardExceptionValues = None
+            return
+        # a row whose successors all have the same reward has that reward as its expected reward, up to the rounding of
+        # summing probability*reward (the slippery tables' merged successors are off by a few ulps)
+        self.expectedRewards = self.getExpectedRewards(rewards)
+        rowRewards = np.repeat(self.expectedRewards.ravel(), np.diff(self.rowPointer))
+        isException = ~np.isclose(rewards, rowRewards, rtol=self.rewardTolerance, atol=self.rewardTolerance)
+        self.rewardExceptionEntries = np.flatnonzero(isException).astype(self.nextStateIndices.dtype)
+        self.rewardExceptionValues = rewards[self.rewardExceptionEntries]
+
+    def withRewards(self, rewards):
+        return(CompactCompiledMDP(self.states, self.actions, self.rowPointer, self.nextStateIndices, self.probabilities, rewards,
+            self.cells, self.stateCells, self.actionGroups))
+
+    def getCompactMDP(self):
+        return(self)
+
+    def getStoredArrays(self):
+        # the per entry rewards are rebuilt on access, only the exceptions are stored
+        arrays = super(CompactCompiledMDP, self).getStoredArrays()
+        del arrays['rewards']
+        arrays.update({'rewardExceptionEntries': self.rewardExceptionEntries, 'rewardExceptionValues': self.rewardExceptionValues})
+        return(arrays)
+
+
+class CompiledTableView(Mapping):
+    def __init__(self, compiledMDP, entryValues):
+        self.mdp = compiledMDP
+        self.entryValues = entryValues
+
+    def __getitem__(self, state):
+        firstRow = self.mdp.stateIndex[state]*self.mdp.numberOfActions
+        actionDict = {}
+        for actionIndex, action in enumerate(self.mdp.actions):
+            start, stop = self.mdp.rowPointer[firstRow + actionIndex], self.mdp.rowPointer[firstRow + actionIndex + 1]
+            actionDict[action] = {self.mdp.states[nextStateIndex]: value for nextStateIndex, value in
+                zip(self.mdp.nextStateIndices[start:stop].tolist(), self.entryValues[start:stop].tolist())}
+        return(actionDict)
+
+    def __iter__(self):
+        return(iter(self.mdp.states))
+
+    def __len__(self):
+        return(self.mdp.numberOfStates)
+
+
+"""
+Compiles the nested dictionaries made by SetupDeterministicTransitionByStateSet2Agent and the reward setup classes.
+Inputs:
+    transitionTable - nested dictionary {state:{action:{nextState:probability}}}, every state with the same action set
+    rewardTable - nested dictionary {state:{action:{nextState:reward}}} keyed like the transition table, optional
+Output: CompiledMDP
+"""
+
+class SetupCompiledMDP(object):
+    def __init__(self, transitionTable, rewardTable = None):
+        self.transitionTable = transitionTable
+        self.rewardTable = rewardTable
+
+    def __call__(self):
+        states = list(self.transitionTable.keys())
+        stateIndex = {state: index for index, state in enumerate(states)}
+        actions = list(self.transitionTable[states[0]].keys())
+
+        rowPointer = [0]
+        nextStateIndices = []
+        probabilities = []
+        rewards = []
+        for state in states:
+            actionDict = self.transitionTable[state]
+            if len(actionDict) != len(actions):
+                raise ValueError("every state must have the same action set, state {} does not".format(state))
+            for action in actions:
+                nextStateDict = actionDict[action]
+                nextStateIndices.extend([stateIndex[nextState] for nextState in nextStateDict.keys()])
+                probabilities.extend(nextStateDict.values())
+                if self.rewardTable is not None:
+                    rewardDict = self.rewardTable[state][action]
+                    rewards.extend([rewardDict[nextState] for nextState in nextStateDict.keys()])
+                rowPointer.append(len(nextStateIndices))
+
+        compiledRewards = rewards if self.rewardTable is not None else None
+        return(CompiledMDP(states, actions, rowPointer, nextStateIndices, probabilities, compiledRewards))
+
+
+"""
+Integer type of the CSR index arrays (row pointer and next state indices) - int32 when every index fits, int64 otherwise
+"""
+
+def getIndexType(numberOfStates, numberOfEntries):
+    return(np.dtype(np.int32) if max(numberOfStates, numberOfEntries) < np.iinfo(np.int32).max else np.dtype(np.int64))
+
+
+"""
+Float types of the sweeps - float32 values are backed up in single precision, every other type (e.g. integers) is
+    promoted to float64
+"""
+
+def getSweepType(dtype):
+    return(np.dtype(np.float32) if np.dtype(dtype) == np.float32 else np.dtype(np.float64))
+
+def getSweepValues(values):
+    values = np.asarray(values)
+    return(values.astype(getSweepType(values.dtype), copy=False))
+
+
+"""
+Integer key of every row of a (numberOfRows, width) integer array, equal keys for equal rows - rows are hashed and the
+    rows sharing a hash within a state (numberOfActions consecutive rows) are checked against each other, falling back to
+    exact numbering (np.unique) if two different rows of a state collide
+"""
+
+def getRowKeys(rowContents, numberOfActions):
+    with np.errstate(over='ignore'):
+        rowKeys = np.zeros(len(rowContents), dtype=np.uint64)
+        for column in rowContents.T.astype(np.uint64):
+            rowKeys = rowKeys*np.uint64(0x100000001b3) + column
+    rowKeys = rowKeys.view(np.int64)
+    # consecutive rows of a state in key order, pairs with the same key must hold the same contents
+    stateKeys = rowKeys.reshape(-1, numberOfActions)
+    sortedActions = np.argsort(stateKeys, axis=1, kind='stable')
+    sortedKeys = np.take_along_axis(stateKeys, sortedActions, axis=1)
+    sortedRows = np.arange(len(stateKeys))[:, None]*numberOfActions + sortedActions
+    sameKey = sortedKeys[:, 1:] == sortedKeys[:, :-1]
+    previousRows, nextRows = sortedRows[:, :-1][sameKey], sortedRows[:, 1:][sameKey]
+    if (rowContents[previousRows] != rowContents[nextRows]).any():
+        return(np.unique(rowContents, axis=0, return_inverse=True)[1].ravel())
+    return(rowKeys)
+
+
+"""
+Action groups from a key per (state, action) row - rows of one state with equal keys have the same successor distribution
+Inputs:
+    distributionKeys - integer array of length numberOfStates*numberOfActions, compared only within a state
+    numberOfActions - number of actions of every state
+Output: (groupRows, rowGroups) - the first row of every group, groups numbered in the order of their first rows, and
+    the group of every row
+"""
+
+def getActionGroupsOfKeys(distributionKeys, numberOfActions):
+    stateKeys = np.asarray(distributionKeys).reshape(-1, numberOfActions)
+    numberOfStates = len(stateKeys)
+    # sort the actions of every state by key, a new group starts where the key changes
+    sortedActions = np.argsort(stateKeys, axis=1, kind='stable')
+    sortedKeys = np.take_along_axis(stateKeys, sortedActions, axis=1)
+    startsGroup = np.ones(sortedKeys.shape, dtype=bool)
+    startsGroup[:, 1:] = sortedKeys[:, 1:] != sortedKeys[:, :-1]
+    sortedGroups = np.cumsum(startsGroup.ravel()).reshape(sortedKeys.shape) - 1
+    rowGroups = np.empty(sortedKeys.shape, dtype=np.int64)
+    np.put_along_axis(rowGroups, sortedActions, sortedGroups, axis=1)
+    # the stable sort puts the first action of a group at its start
+    firstRows = (np.arange(numberOfStates)[:, None]*numberOfActions + sortedActions)[startsGroup]
+    order = np.argsort(firstRows, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return(firstRows[order], rank[rowGroups.ravel()])
+
+
+"""
+Deep size in bytes of nested dictionaries/lists/tuples (e.g. the transition and reward tables), every object counted once
+"""
+
+def getNestedTableBytes(table):
+    countedObjects = set()
+    totalBytes = 0
+    objects = [table]
+    while objects:
+        item = objects.pop()
+        if id(item) in countedObjects:
+            continue
+        countedObjects.add(id(item))
+        totalBytes += sys.getsizeof(item)
+        if isinstance(item, dict):
+            objects.extend(item.keys())
+            objects.extend(item.values())
+        elif isinstance(item, (list, tuple, set)):
+            objects.extend(item)
+    return(totalBytes)
+
+
+"""
+Memory footprint report of the dictionary tables against their compiled and compact compiled forms
+Inputs:
+    transitionTable, rewardTable - nested dictionaries {state:{action:{nextState:value}}}
+Output: dictionary of total bytes for 'dictionaries' (both tables, shared keys counted once), 'compiled' and 'compact'
+"""
+
+def getMemoryReport(transitionTable, rewardTable):
+    compiledMDP = SetupCompiledMDP(transitionTable, rewardTable)()
+    return({'dictionaries': getNestedTableBytes([transitionTable, rewardTable]),
+        'compiled': compiledMDP.getMemoryFootprint()['total'],
+        'compact': compiledMDP.getCompactMDP().getMemoryFootprint()['total']})
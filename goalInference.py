@@ -0,0 +1,124 @@
+import numpy as np
+from grosseJointPlanner import SetupDeterministicTransitionByStateSet2Agent, getCompiledRewardArray
+from ValueIteration import getBatchedValues, getBoltzmannPolicies
+
+"""
+Candidate goal solver - Boltzmann value iteration of the joint MDP for every candidate goal at once, for inverse planning.
+    The goal only decides which joint states (an agent on the goal) jump to 'terminal' and which successors earn the goal
+    reward, so the movement/collision structure is built once without a goal and shared by every candidate:
+        per goal terminal mask - the rows of states with an agent on the goal are replaced by the move to 'terminal',
+            which has no reward and value 0, so those states simply keep value and Q-value 0
+        per goal rewards - goal free rewards (move costs, traps) + goalReward * probability that the successor has an agent on the goal
+    batchSize candidates are swept side by side with ValueIteration.getBatchedValues, on goal states held at 0.
+    Each candidate's result matches building SetupDeterministicTransitionByStateSet2Agent with that goal, the
+    SetupRewardTable2AgentWeakStrong rewards (agentAbilities (1, 1) are the SetupRewardTable2AgentDistanceCost rewards)
+    and BoltzmannValueIterationVectorized.
+Inputs:
+    Constructor
+    stateSet, actionSet, barrierList - as for SetupDeterministicTransitionByStateSet2Agent
+    candidateGoals - list of single agent goal cells
+    trapStates - list of single agent trap cells shared by every candidate
+    convergenceTolerance, discountingFactor, beta - as for BoltzmannValueIteration
+    goalReward, trapCost, costOfNoMovement, agentAbilities - as for SetupRewardTable2AgentWeakStrong
+    batchSize - number of candidate goals solved side by side
+
+    Callable
+    returnTables - False skips building the dictionaries
+Output: list of [valueTable, policyTable], one per candidate goal (None if returnTables is False)
+    the shared compiled transitions as .mdp, the (numberOfStates, number of goals) values as .values and the
+    (numberOfStates, numberOfActions, number of goals) Q-values and policies as .qValues and .policies, the sweeps run as .numberOfSweeps
+    getTrajectoryLogLikelihoods gives the log likelihood of observed trajectories under every candidate goal
+"""
+
+class SolveCandidateGoals(object):
+    def __init__(self, stateSet, actionSet, candidateGoals, trapStates, convergenceTolerance, discountingFactor, beta,
+            barrierList = [], goalReward = 10, trapCost = -100, costOfNoMovement = .1, agentAbilities = (1, 1), batchSize = 1):
+        self.stateSet = stateSet
+        self.actionSet = actionSet
+        self.candidateGoals = candidateGoals
+        self.trapStates = trapStates
+        self.convergenceTolerance = convergenceTolerance
+        self.gamma = discountingFactor
+        self.beta = beta
+        self.barrierList = barrierList
+        self.goalReward = goalReward
+        self.trapCost = trapCost
+        self.costOfNoMovement = costOfNoMovement
+        self.agentAbilities = agentAbilities
+        self.batchSize = batchSize
+
+    def __call__(self, returnTables = True):
+        # no goal: no joint state jumps to 'terminal' except 'terminal' itself
+        self.mdp = SetupDeterministicTransitionByStateSet2Agent(self.stateSet, self.actionSet, None, self.barrierList).getCompiledTransitions()
+        self.onGoal = self.getOnGoalMask()
+        expectedRewards = self.getExpectedRewards()
+
+        self.values = np.zeros((self.mdp.numberOfStates, len(self.candidateGoals)))
+        self.numberOfSweeps = 0
+        for batchStart in range(0, len(self.candidateGoals), self.batchSize):
+            batchGoals = slice(batchStart, batchStart + self.batchSize)
+            # on goal states move to 'terminal' with no reward whatever the action
+            batchValues, numberOfSweeps = getBatchedValues(self.mdp, np.ascontiguousarray(expectedRewards[:, :, batchGoals]),
+                self.values[:, batchGoals].copy(), self.convergenceTolerance, self.gamma, ~self.onGoal[:, batchGoals])
+            self.values[:, batchGoals] = batchValues
+            self.numberOfSweeps += numberOfSweeps
+
+        self.qValues = self.getQValues(self.values, expectedRewards)
+        self.policies = getBoltzmannPolicies(self.qValues, self.beta, actionAxis = -2)
+        if not returnTables:
+            return(None)
+        return([[self.mdp.getValueTable(self.values[:, goal]), self.mdp.getPolicyTable(self.policies[:, :, goal])]
+            for goal in range(len(self.candidateGoals))])
+
+    def getOnGoalMask(self):
+        # (numberOfStates, number of goals), True where an agent of the state is on that goal
+        cells, stateCells = self.mdp.getStateCells()
+        cellIndex = {cell: index for index, cell in enumerate(cells)}
+        goalIndices = np.array([cellIndex[goal] for goal in self.candidateGoals])
+        return((stateCells[:, :, None] == goalIndices[None, None, :]).any(axis=1))
+
+    def getExpectedRewards(self):
+        # (numberOfStates, numberOfActions, number of goals); rows of on goal states are never used, their Q-values are 0
+        actionComponents = self.mdp.getActionComponents()
+        isNullAction = (actionComponents == 0).all(axis=2)
+        agentActionCosts = np.where(isNullAction, -abs(self.costOfNoMovement),
+            -np.abs(actionComponents).sum(axis=2)*np.abs(np.array(self.agentAbilities, dtype=float))[None, :])
+        goalFreeRewards = self.mdp.getExpectedRewards(getCompiledRewardArray(self.mdp, [], self.trapStates, 0, self.trapCost, agentActionCosts))
+        goalProbabilities = (self.mdp.transitionMatrix @ self.onGoal.astype(float)).reshape(self.mdp.numberOfStates, self.mdp.numberOfActions, -1)
+        return(goalFreeRewards[:, :, None] + abs(self.goalReward)*goalProbabilities)
+
+    def getQValues(self, values, expectedRewards):
+        qValues = self.mdp.getQValues(values, self.gamma, expectedRewards)
+        # every action of an on goal state moves to 'terminal' with no reward
+        qValues *= ~self.onGoal[:, None, :]
+        return(qValues)
+
+    def getTrajectoryLogLikelihoods(self, trajectories, actionSequences = None):
+        # trajectories - lists of joint states (possibly ending in 'terminal'), actionSequences - optional lists of the
+        # joint actions taken between them; unobserved actions are summed out under each goal's Boltzmann policy
+        # Output: (number of trajectories, number of goals) log likelihood array, -inf if a step is impossible under a goal
+        stateIndex = self.mdp.stateIndex
+        states = np.array([stateIndex[state] for trajectory in trajectories for state in trajectory[:-1]], dtype=int)
+        nextStates = np.array([stateIndex[state] for trajectory in trajectories for state in trajectory[1:]], dtype=int)
+        trajectoryOfSteps = np.repeat(np.arange(len(trajectories)), [len(trajectory) - 1 for trajectory in trajectories])
+        numberOfActions = self.mdp.numberOfActions
+
+        if actionSequences is None:
+            actions = np.tile(np.arange(numberOfActions), len(states))
+            stepOfRows = np.repeat(np.arange(len(states)), numberOfActions)
+        else:
+            actions = np.array([self.mdp.actionIndex[action] for actionSequence in actionSequences for action in actionSequence], dtype=int)
+            stepOfRows = np.arange(len(states))
+
+        # transition probability of every observed step under every considered action, then the per goal terminal mask
+        stepStates = states[stepOfRows]
+        transitionProbabilities = np.asarray(self.mdp.transitionMatrix[stepStates*numberOfActions + actions, nextStates[stepOfRows]]).ravel()
+        reachesTerminal = (nextStates[stepOfRows] == stateIndex['terminal']).astype(float)
+        goalTransitionProbabilities = np.where(self.onGoal[stepStates], reachesTerminal[:, None], transitionProbabilities[:, None])
+        stepProbabilities = np.zeros((len(states), len(self.candidateGoals)))
+        np.add.at(stepProbabilities, stepOfRows, self.policies[stepStates, actions]*goalTransitionProbabilities)
+
+        logLikelihoods = np.zeros((len(trajectories), len(self.candidateGoals)))
+        with np.errstate(divide='ignore'):
+            np.add.at(logLikelihoods, trajectoryOfSteps, np.log(stepProbabilities))
+        return(logLikelihoods)
@@ -1,5 +1,7 @@
 import numpy as np
 import itertools
+import scipy.sparse as sparse
+from compiledMDP import CompiledMDP, SetupCompiledMDP, getActionGroupsOfKeys
 
 """
 Creates a determinsitic transition table for a set of states and actions. If the action takes the agent off the board, the action should result in the next state being the same 
@@ -8,23 +10,137 @@ as the current state. If agents collide, one at random will move and the other w
 Inputs:
     state set - list of states as tuple of tuples (single agent)
     action set - list of actions as tuple of tuples (single agent)
+    goal state - single agent state that ends the episode
+    barrier list - optional list of (state, nextState) single agent moves that are blocked; a blocked move is treated like a move off the board
+    start states - optional list of joint states; if given, only the joint states reachable from them (plus terminal) are in the table
 Output: nested dictionary {state:{action:nextState:probability}} where there is every state and action pair and only the next states that result in a non-zero probability
 Once one agent is on the goal state, the transition moves to the terminal state no matter what actions are taken
 Once the terminal state is reached, the next state will also always be the terminal state
 """
 
 class SetupDeterministicTransitionByStateSet2Agent(object):
-    def __init__(self, stateSet, actionSet, goalState):
+    def __init__(self, stateSet, actionSet, goalState, barrierList = [], startStates = None):
         self.stateSet = stateSet
-        # create a joint state set from a single agent state set, add terminal state to the set
-        self.jointStateSet = [(s1, s2) for s1, s2 in itertools.product(stateSet, stateSet) if s1 != s2] + ['terminal'] 
+        self.actionSet = actionSet
         self.jointActionSet = list(itertools.product(actionSet, actionSet))
         self.goalState = goalState
+        self.barrierList = barrierList
+        # hashed membership instead of scanning the state list
+        self.cellIndex = {cell: index for index, cell in enumerate(stateSet)}
+        self.blockedMoves = set(barrierList)
+        self.moveTable = self.getMoveTable()
+        # create a joint state set from a single agent state set, add terminal state to the set
+        if startStates is None:
+            self.jointStateSet = [(s1, s2) for s1, s2 in itertools.product(stateSet, stateSet) if s1 != s2] + ['terminal'] 
+        else:
+            self.jointStateSet = self.getReachableJointStates(startStates) + ['terminal']
 
     def __call__(self):
-        transitionTable = {state: self.getStateTransition(state) for state in self.jointStateSet}
+        compiledTransitions = self.getCompiledTransitions()
+        states = compiledTransitions.states
+        actions = compiledTransitions.actions
+        numberOfActions = len(actions)
+
+        # every (state, action) row has one successor, or two with probability .5 each for a collision split
+        successors = [states[nextStateIndex] for nextStateIndex in compiledTransitions.nextStateIndices.tolist()]
+        probabilities = compiledTransitions.probabilities.tolist()
+        rowStarts = compiledTransitions.rowPointer[:-1].tolist()
+        splitRows = set(np.flatnonzero(np.diff(compiledTransitions.rowPointer) == 2).tolist())
+        rowDistributions = [{successors[start]: probabilities[start], successors[start+1]: probabilities[start+1]} if row in splitRows 
+            else {successors[start]: probabilities[start]} for row, start in enumerate(rowStarts)]
+
+        transitionTable = {state: dict(zip(actions, rowDistributions[stateIndex*numberOfActions:(stateIndex+1)*numberOfActions])) 
+            for stateIndex, state in enumerate(states)}
         return(transitionTable) 
 
+    def getCompiledTransitions(self, groupActions = False):
+        # the same table as __call__, computed with array arithmetic over all joint states x joint actions at once;
+        # groupActions attaches the action groups of every state (CompiledMDP.getActionGroups), read off the successors
+        numberOfCells = len(self.stateSet)
+        jointCells = np.array([(self.cellIndex[s1], self.cellIndex[s2]) for s1, s2 in self.jointStateSet[:-1]], dtype=int).reshape(-1, 2)
+        terminalIndex = len(self.jointStateSet) - 1
+        # joint state index of every ordered pair of cells in the table, in the order of jointStateSet
+        pairIndex = np.full((numberOfCells, numberOfCells), -1)
+        pairIndex[jointCells[:, 0], jointCells[:, 1]] = np.arange(len(jointCells))
+
+        firstNextCells, secondNextCells, splitCollision, onGoal = self.getNextJointCells(jointCells)
+        firstNextState = np.where(onGoal, terminalIndex, pairIndex[firstNextCells[0], firstNextCells[1]])
+        secondNextState = pairIndex[secondNextCells[0], secondNextCells[1]]
+
+        # append the terminal state's rows, then lay the successors out as CSR rows
+        firstNextState = np.concatenate([firstNextState.ravel(), np.full(len(self.jointActionSet), terminalIndex)])
+        splitCollision = np.concatenate([splitCollision.ravel(), np.zeros(len(self.jointActionSet), dtype=bool)])
+        secondNextState = np.concatenate([secondNextState.ravel(), np.zeros(len(self.jointActionSet), dtype=int)])
+        rowPointer = np.concatenate([[0], np.cumsum(1 + splitCollision)])
+        nextStateIndices = np.empty(rowPointer[-1], dtype=int)
+        nextStateIndices[rowPointer[:-1]] = firstNextState
+        nextStateIndices[rowPointer[:-1][splitCollision] + 1] = secondNextState[splitCollision]
+        probabilities = np.where(np.repeat(splitCollision, 1 + splitCollision), .5, 1.0)
+        stateCells = np.concatenate([jointCells, [[-1, -1]]])
+        actionGroups = None
+        if groupActions:
+            # two rows of a state have the same distribution exactly when they have the same successor(s)
+            distributionKeys = firstNextState*(terminalIndex + 2) + np.where(splitCollision, secondNextState + 1, 0)
+            actionGroups = getActionGroupsOfKeys(distributionKeys, len(self.jointActionSet))
+        return(CompiledMDP(self.jointStateSet, self.jointActionSet, rowPointer, nextStateIndices, probabilities, 
+            cells = list(self.stateSet), stateCells = stateCells, actionGroups = actionGroups))
+
+    def getNextJointCells(self, jointCells):
+        # for (number of joint states, 2) cell indices, the successor cells of every joint action as (agent 1 cells, agent 2 cells) arrays
+        # of shape (number of joint states, number of joint actions): the first successor, the second successor of a .5/.5 collision
+        # split, which entries are split, and which joint states are on the goal (their successors are the terminal state instead)
+        numberOfSingleActions = len(self.actionSet)
+        moveTable = self.moveTable
+        isNullAction = np.array([action == (0,0) for action in self.actionSet])
+        agent1Actions = np.repeat(np.arange(numberOfSingleActions), numberOfSingleActions)[None, :]
+        agent2Actions = np.tile(np.arange(numberOfSingleActions), numberOfSingleActions)[None, :]
+
+        agent1State = jointCells[:, [0]]
+        agent2State = jointCells[:, [1]]
+        agent1NextState = moveTable[agent1State, agent1Actions]
+        agent2NextState = moveTable[agent2State, agent2Actions]
+        #if a move takes you off the board, you cannot take it and instead that agent remains stationary
+        agent1Fixed = agent1NextState < 0
+        agent2Fixed = agent2NextState < 0
+        agent1NextState = np.where(agent1Fixed, agent1State, agent1NextState)
+        agent2NextState = np.where(agent2Fixed, agent2State, agent2NextState)
+
+        # collisions 1 and 2 leave both agents in place, collision 3 splits .5/.5 between agent 1 moving and agent 2 moving
+        collision = agent1NextState == agent2NextState
+        stayInPlace = collision & (isNullAction[agent1Actions] | isNullAction[agent2Actions] | agent1Fixed | agent2Fixed)
+        splitCollision = collision & ~stayInPlace
+        firstNextCells = (np.where(stayInPlace, agent1State, agent1NextState), 
+            np.where(stayInPlace | splitCollision, agent2State, agent2NextState))
+        secondNextCells = (np.broadcast_to(agent1State, agent2NextState.shape), agent2NextState)
+
+        # once one agent is on the goal state, every action moves to the terminal state
+        goalIndex = self.cellIndex.get(self.goalState, -1)
+        onGoal = np.broadcast_to((agent1State == goalIndex) | (agent2State == goalIndex), splitCollision.shape)
+        return(firstNextCells, secondNextCells, splitCollision & ~onGoal, onGoal)
+
+    def getMoveTable(self):
+        # cell reached by each single agent action from each cell, -1 if the move leaves the board or crosses a barrier
+        moveTable = [[self.cellIndex.get(nextCell, -1) if (cell, nextCell) not in self.blockedMoves else -1 
+                for nextCell in [self.addTuples(cell, action) for action in self.actionSet]] 
+            for cell in self.stateSet]
+        return(np.array(moveTable, dtype=int).reshape(len(self.stateSet), len(self.actionSet)))
+
+    def getReachableJointStates(self, startStates):
+        # breadth first search over joint states, expanding a whole frontier of joint states x joint actions at a time
+        numberOfCells = len(self.stateSet)
+        reached = np.zeros((numberOfCells, numberOfCells), dtype=bool)
+        frontier = np.array([(self.cellIndex[s1], self.cellIndex[s2]) for s1, s2 in startStates], dtype=int).reshape(-1, 2)
+        reached[frontier[:, 0], frontier[:, 1]] = True
+        while len(frontier) > 0:
+            firstNextCells, secondNextCells, splitCollision, onGoal = self.getNextJointCells(frontier)
+            nextCells = np.concatenate([np.stack([firstNextCells[0][~onGoal], firstNextCells[1][~onGoal]], axis=1), 
+                np.stack([secondNextCells[0][splitCollision], secondNextCells[1][splitCollision]], axis=1)])
+            nextCells = np.unique(nextCells, axis=0)
+            frontier = nextCells[~reached[nextCells[:, 0], nextCells[:, 1]]]
+            reached[frontier[:, 0], frontier[:, 1]] = True
+        # keep the order of the full joint state set
+        return([(self.stateSet[s1], self.stateSet[s2]) for s1, s2 in np.argwhere(reached).tolist()])
+
     def getStateTransition(self, state):
         actionTransitionDistribution = {action: self.getStateActionTransition(state, action) for action in self.jointActionSet}
         return(actionTransitionDistribution)
@@ -44,19 +160,19 @@ class SetupDeterministicTransitionByStateSet2Agent(object):
 
         agent1Fixed = False
         agent2Fixed = False
-        #if a move takes you off the board, you cannot take it and instead that agent remains stationary, if fixed = true, that agent must remain stationary
-        if agent1NextState not in self.stateSet:
+        #if a move takes you off the board (or across a barrier), you cannot take it and instead that agent remains stationary, if fixed = true, that agent must remain stationary
+        if agent1NextState not in self.cellIndex or (state[0], agent1NextState) in self.blockedMoves:
             agent1NextState = state[0]
             agent1Fixed = True
-        if agent2NextState not in self.stateSet:
+        if agent2NextState not in self.cellIndex or (state[1], agent2NextState) in self.blockedMoves:
             agent2NextState = state[1]
             agent2Fixed = True
 
         # resulting joint state from taking into account moves off the board - is it a viable move
         onBoardPotentialNextState = (agent1NextState, agent2NextState)
 
-        #if it is viable, agents will not collide and it should be in the joint state set
-        if onBoardPotentialNextState in self.jointStateSet: 
+        #if it is viable, agents will not collide and it should be in the joint state set (every pair of distinct on board cells is)
+        if agent1NextState != agent2NextState: 
             return({onBoardPotentialNextState:1.0})
 
         # if it is not in the joint state set, there is a collision
@@ -80,6 +196,131 @@ class SetupDeterministicTransitionByStateSet2Agent(object):
         return(summedTuple)
         
 
+"""
+Creates a stochastic ("slippery") transition table - each agent's intended move succeeds with probability successProbability,
+otherwise the agent slips into one of the other moves of the action set (uniformly), and the moves the agents end up making
+follow the rules of SetupDeterministicTransitionByStateSet2Agent (off the board/barriers, collisions, goal and terminal).
+The null action (0,0) never slips. The per agent move kernels are composed with the deterministic outcome of every executed
+joint action in array form, a block of joint states at a time, and the successors every (state, action) row reaches through
+different slips or collision splits are merged into one entry, so the compiled table stays sparse.
+
+Inputs:
+    state set, action set, goal state, barrier list, start states - as for SetupDeterministicTransitionByStateSet2Agent
+    successProbability - probability that an agent's intended move succeeds, or a tuple with one probability per agent
+    slipKernels - optional (number of actions, number of actions) array per agent, row a holding the probabilities of the
+        moves actually made when intending action a (replaces successProbability)
+Output: nested dictionary {state:{action:{nextState:probability}}}; getCompiledTransitions gives the CompiledMDP directly
+    (the start states reachable set is the deterministic one: every slip outcome is the outcome of some joint action)
+"""
+
+class SetupSlipperyTransitionByStateSet2Agent(SetupDeterministicTransitionByStateSet2Agent):
+    def __init__(self, stateSet, actionSet, goalState, successProbability = .8, barrierList = [], startStates = None, 
+            slipKernels = None, statesPerBlock = 2048):
+        super(SetupSlipperyTransitionByStateSet2Agent, self).__init__(stateSet, actionSet, goalState, barrierList, startStates)
+        if slipKernels is None:
+            agentSuccessProbabilities = successProbability if isinstance(successProbability, tuple) else (successProbability,)*2
+            slipKernels = [self.getSlipKernel(agentSuccessProbability) for agentSuccessProbability in agentSuccessProbabilities]
+        self.slipKernels = [np.asarray(slipKernel, dtype=float) for slipKernel in slipKernels]
+        self.statesPerBlock = statesPerBlock
+
+    def __call__(self):
+        compiledTransitions = self.getCompiledTransitions()
+        states, actions = compiledTransitions.states, compiledTransitions.actions
+        numberOfActions = len(actions)
+        successors = [states[nextStateIndex] for nextStateIndex in compiledTransitions.nextStateIndices.tolist()]
+        probabilities = compiledTransitions.probabilities.tolist()
+        rowPointer = compiledTransitions.rowPointer.tolist()
+        rowDistributions = [dict(zip(successors[start:stop], probabilities[start:stop])) for start, stop in zip(rowPointer[:-1], rowPointer[1:])]
+        transitionTable = {state: dict(zip(actions, rowDistributions[stateIndex*numberOfActions:(stateIndex+1)*numberOfActions])) 
+            for stateIndex, state in enumerate(states)}
+        return(transitionTable)
+
+    def getSlipKernel(self, successProbability):
+        # intended move with successProbability, else uniformly one of the other moves; the null action always stays
+        isNullAction = np.array([action == (0,0) for action in self.actionSet])
+        otherMoves = (~isNullAction[None, :]) & ~np.eye(len(self.actionSet), dtype=bool)
+        slipKernel = (1 - successProbability)*otherMoves/np.maximum(otherMoves.sum(axis=1, keepdims=True), 1)
+        slipKernel[np.diag_indices(len(self.actionSet))] = successProbability
+        slipKernel[isNullAction] = np.eye(len(self.actionSet))[isNullAction]
+        return(slipKernel)
+
+    def getCompiledTransitions(self, groupActions = False):
+        numberOfCells = len(self.stateSet)
+        jointCells = np.array([(self.cellIndex[s1], self.cellIndex[s2]) for s1, s2 in self.jointStateSet[:-1]], dtype=int).reshape(-1, 2)
+        numberOfStates = len(self.jointStateSet)
+        terminalIndex = numberOfStates - 1
+        numberOfJointActions = len(self.jointActionSet)
+        pairIndex = np.full((numberOfCells, numberOfCells), -1)
+        pairIndex[jointCells[:, 0], jointCells[:, 1]] = np.arange(len(jointCells))
+
+        # probability of executing each joint action when intending each joint action, in the order of jointActionSet
+        jointSlipKernel = np.kron(self.slipKernels[0], self.slipKernels[1])
+        intendedActions, executedActions = np.nonzero(jointSlipKernel)
+        kernelWeights = jointSlipKernel[intendedActions, executedActions]
+
+        blocks = []
+        for blockStart in range(0, len(jointCells), self.statesPerBlock):
+            blockCells = jointCells[blockStart:blockStart + self.statesPerBlock]
+            firstNextCells, secondNextCells, splitCollision, onGoal = self.getNextJointCells(blockCells)
+            firstNextState = np.where(onGoal, terminalIndex, pairIndex[firstNextCells[0], firstNextCells[1]])[:, executedActions]
+            secondNextState = pairIndex[secondNextCells[0], secondNextCells[1]][:, executedActions]
+            splitCollision = splitCollision[:, executedActions]
+
+            # one entry per (state, intended action, executed action) outcome, a second one for collision splits
+            rows = np.arange(len(blockCells))[:, None]*numberOfJointActions + intendedActions[None, :]
+            firstProbabilities = kernelWeights[None, :]*np.where(splitCollision, .5, 1.0)
+            entryRows = np.concatenate([rows.ravel(), np.broadcast_to(rows, splitCollision.shape)[splitCollision]])
+            entryStates = np.concatenate([firstNextState.ravel(), secondNextState[splitCollision]])
+            entryProbabilities = np.concatenate([firstProbabilities.ravel(), firstProbabilities[splitCollision]])
+            # duplicate (row, next state) entries are summed on conversion, merging successors reached in several ways
+            blocks.append(sparse.coo_matrix((entryProbabilities, (entryRows, entryStates)), 
+                shape=(len(blockCells)*numberOfJointActions, numberOfStates)).tocsr())
+        blocks.append(sparse.csr_matrix((np.ones(numberOfJointActions), (np.arange(numberOfJointActions), 
+            np.full(numberOfJointActions, terminalIndex))), shape=(numberOfJointActions, numberOfStates)))
+
+        transitionMatrix = sparse.vstack(blocks, format='csr')
+        stateCells = np.concatenate([jointCells, [[-1, -1]]])
+        compiledTransitions = CompiledMDP(self.jointStateSet, self.jointActionSet, transitionMatrix.indptr, transitionMatrix.indices, 
+            transitionMatrix.data, cells = list(self.stateSet), stateCells = stateCells)
+        if groupActions:
+            # merged rows have no simple successor key, the groups are detected from the rows
+            compiledTransitions.getActionGroups()
+        return(compiledTransitions)
+
+
+"""
+Reward array aligned with the successor entries of a compiled transition table, shared by the reward setup classes.
+Inputs:
+    compiledTransitions - CompiledMDP of a joint transition table
+    goalStates, trapStates - lists of single agent cells
+    goalReward, trapCost - reward/cost of an agent landing on a goal/trap cell
+    agentActionCosts - (number of joint actions, number of agents) array, cost each agent pays for its part of each joint action
+Output: reward of every successor entry, the same values applyRewardFunction gives for each (state, action, nextState)
+"""
+
+def getCompiledRewardArray(compiledTransitions, goalStates, trapStates, goalReward, trapCost, agentActionCosts):
+    cells, stateCells = compiledTransitions.getStateCells()
+    # per cell masks with an extra False slot at the end, so the -1 cell index of 'terminal' reads as no special tile
+    goalStateSet = set(goalStates)
+    trapStateSet = set(trapStates)
+    isGoalCell = np.array([cell in goalStateSet for cell in cells] + [False])
+    isTrapCell = np.array([cell in trapStateSet for cell in cells] + [False])
+    isTerminal = (stateCells < 0).all(axis=1)
+    onGoal = isGoalCell[stateCells].any(axis=1)
+    onTrap = isTrapCell[stateCells].any(axis=1)
+
+    # move costs - no move cost in the goal state because every action moves to the terminal state
+    moveCosts = np.where(onGoal[:, None], 0, agentActionCosts.sum(axis=1)[None, :])
+    # if the next state is a special tile, the agents receive the rewards/costs of that location
+    specialTileRewards = np.where(onGoal, abs(goalReward), 0.0) - np.where(onTrap, abs(trapCost), 0.0)
+
+    rowOfEntries = compiledTransitions.getRowOfEntries()
+    stateOfEntries = rowOfEntries // compiledTransitions.numberOfActions
+    rewards = moveCosts.ravel()[rowOfEntries] + specialTileRewards[compiledTransitions.nextStateIndices]
+    # terminal state has no reward or cost
+    return(np.where(isTerminal[stateOfEntries], 0.0, rewards))
+
+
 """
 Reward table - 
 Inputs:
@@ -92,6 +333,9 @@ Inputs:
     cost of trap state(s)
     cost of taking action (0,0) - no movement 
 Output: Nested dictionary of joint state, joint action, cost/reward
+    getCompiledRewards takes the same arguments and returns the compiled transition table with the rewards attached,
+    computed with per cell goal/trap masks and per action costs instead of a pass over every dictionary entry.
+    The transition table may also be given as a CompiledMDP (e.g. from getCompiledTransitions) for this path.
 """
 
 class SetupRewardTable2AgentDistanceCost(object):
@@ -99,6 +343,7 @@ class SetupRewardTable2AgentDistanceCost(object):
         self.transitionTable = transitionTable
         self.goalStates = goalStates
         self.trapStates = trapStates
+        self.compiledTransitions = None
         
     def __call__(self, goalReward = 10, trapCost = -100, costOfNoMovement = .1):
         rewardTable = {state:{action: {nextState: self.applyRewardFunction(state, action, nextState, goalReward, trapCost, costOfNoMovement) \
@@ -107,6 +352,23 @@ class SetupRewardTable2AgentDistanceCost(object):
                         for state, actionDict in self.transitionTable.items()}
         return(rewardTable)
 
+    def getCompiledRewards(self, goalReward = 10, trapCost = -100, costOfNoMovement = .1):
+        # the same rewards as __call__, computed in bulk and attached to the compiled transition table
+        compiledTransitions = self.getCompiledTransitions()
+        actionComponents = compiledTransitions.getActionComponents()
+        isNullAction = (actionComponents == 0).all(axis=2)
+        agentActionCosts = np.where(isNullAction, -abs(costOfNoMovement), -np.abs(actionComponents).sum(axis=2))
+        rewards = getCompiledRewardArray(compiledTransitions, self.goalStates, self.trapStates, goalReward, trapCost, agentActionCosts)
+        return(compiledTransitions.withRewards(rewards))
+
+    def getCompiledTransitions(self):
+        # the transition table may be passed in already compiled, otherwise it is compiled once and kept
+        if isinstance(self.transitionTable, CompiledMDP):
+            return(self.transitionTable)
+        if self.compiledTransitions is None:
+            self.compiledTransitions = SetupCompiledMDP(self.transitionTable)()
+        return(self.compiledTransitions)
+
     def applyRewardFunction(self, state, action, nextState, goalReward, trapCost, costOfNoMovement):
         # terminal state has no reward or cost
         if state == 'terminal':
@@ -176,6 +438,8 @@ Inputs:
             1 is costs = distances and larger than 1 are weaker agents (costs become larger)
 
 Output: Dictionary of joint state, joint action, cost/reward
+    getCompiledRewards(agentAbilities) returns the compiled transition table with the same rewards attached, computed in bulk.
+    The transition table may also be given as a CompiledMDP (e.g. from getCompiledTransitions) for this path.
 """
 
 class SetupRewardTable2AgentWeakStrong(object):
@@ -187,6 +451,7 @@ class SetupRewardTable2AgentWeakStrong(object):
         self.goalReward = goalReward
         self.trapCost = trapCost
         self.costOfNoMovement = costOfNoMovement
+        self.compiledTransitions = None
 
         
     def __call__(self, agentAbilities):
@@ -196,6 +461,24 @@ class SetupRewardTable2AgentWeakStrong(object):
                         for state, actionDict in self.transitionTable.items()}
         return(rewardTable)
 
+    def getCompiledRewards(self, agentAbilities):
+        # the same rewards as __call__, computed in bulk and attached to the compiled transition table
+        compiledTransitions = self.getCompiledTransitions()
+        actionComponents = compiledTransitions.getActionComponents()
+        isNullAction = (actionComponents == 0).all(axis=2)
+        agentActionCosts = np.where(isNullAction, -abs(self.costOfNoMovement), 
+            -np.abs(actionComponents).sum(axis=2)*np.abs(np.array(agentAbilities, dtype=float))[None, :])
+        rewards = getCompiledRewardArray(compiledTransitions, self.goalStates, self.trapStates, self.goalReward, self.trapCost, agentActionCosts)
+        return(compiledTransitions.withRewards(rewards))
+
+    def getCompiledTransitions(self):
+        # the transition table may be passed in already compiled, otherwise it is compiled once and kept
+        if isinstance(self.transitionTable, CompiledMDP):
+            return(self.transitionTable)
+        if self.compiledTransitions is None:
+            self.compiledTransitions = SetupCompiledMDP(self.transitionTable)()
+        return(self.compiledTransitions)
+
     def applyRewardFunction(self, state, action, nextState, agentAbilities):
         # terminal state has no rew 12:10 and 1:45ard or cost
         if state == 'terminal':
@@ -0,0 +1,210 @@
+import os
+import pickle
+import time
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+from compiledMDP import CompiledMDP, getIndexType
+from grosseJointPlanner import SetupDeterministicTransitionByStateSet2Agent, SetupRewardTable2AgentDistanceCost
+from ValueIteration import BoltzmannValueIterationVectorized
+
+"""
+On disk cache of compiled MDPs and their solutions - content addressed by a hash of the parameters that made them.
+    Every entry is a directory of .npy arrays (plus the state/action keys pickled), loaded memory mapped and read only,
+    so processes that load the same entry share one copy of it in the page cache and loading copies nothing
+    (the transition matrix of a loaded CompiledMDP is built directly on the mapped 32 bit index arrays).
+    Entries are written to a temporary directory and renamed into place, so concurrent workers never read half an entry.
+    After every save, entries not used for maxAge seconds are removed, then the least recently used entries until the
+    cache is at most maxBytes (never the entry just saved). Another worker may remove an entry at any time, so loading
+    an entry that is gone, even after contains, is a miss (None) and the caller rebuilds it.
+Inputs:
+    cacheDirectory - directory of the cache (created if needed)
+    maxBytes - largest total size of the cache, None for no limit
+    maxAge - seconds since an entry was last used after which it is removed, None for no limit
+"""
+
+class MDPCache(object):
+    def __init__(self, cacheDirectory, maxBytes = None, maxAge = None):
+        self.cacheDirectory = cacheDirectory
+        self.maxBytes = maxBytes
+        self.maxAge = maxAge
+        os.makedirs(cacheDirectory, exist_ok=True)
+
+    def getKey(self, **parameters):
+        # repr of the parameters sorted by name; tuples, lists and numbers have a stable repr
+        description = repr(sorted(parameters.items()))
+        return(hashlib.sha256(description.encode()).hexdigest())
+
+    def contains(self, key):
+        return(os.path.isdir(self.getEntryDirectory(key)))
+
+    def saveMDP(self, key, compiledMDP):
+        # int32 indices only when every index fits, a larger table would wrap around
+        indexType = getIndexType(compiledMDP.numberOfStates, len(compiledMDP.nextStateIndices))
+        arrays = {'rowPointer': compiledMDP.rowPointer.astype(indexType), 'nextStateIndices': compiledMDP.nextStateIndices.astype(indexType),
+            'probabilities': compiledMDP.probabilities}
+        if compiledMDP.rewards is not None:
+            arrays.update({'rewards': compiledMDP.rewards, 'expectedRewards': compiledMDP.expectedRewards})
+        if compiledMDP.stateCells is not None:
+            arrays['stateCells'] = compiledMDP.stateCells
+        keys = {'states': compiledMDP.states, 'actions': compiledMDP.actions, 'cells': compiledMDP.cells}
+        self.saveEntry(key, arrays, keys)
+
+    def loadMDP(self, key):
+        # None if the entry is not (or no longer) in the cache
+        entry = self.loadEntry(key)
+        if entry is None:
+            return(None)
+        arrays, keys = entry
+        compiledMDP = CompiledMDP(keys['states'], keys['actions'], arrays['rowPointer'], arrays['nextStateIndices'],
+            arrays['probabilities'], None, keys['cells'], arrays.get('stateCells'))
+        # the stored rewards are attached as they are instead of recomputing the expected rewards in every process
+        if 'rewards' in arrays:
+            compiledMDP.rewards = arrays['rewards']
+            compiledMDP.expectedRewards = arrays['expectedRewards']
+        return(compiledMDP)
+
+    def saveArrays(self, key, **arrays):
+        self.saveEntry(key, arrays, {})
+
+    def loadArrays(self, key):
+        # None if the entry is not (or no longer) in the cache
+        entry = self.loadEntry(key)
+        if entry is None:
+            return(None)
+        arrays, keys = entry
+        return(arrays)
+
+    def saveEntry(self, key, arrays, keys):
+        temporaryDirectory = tempfile.mkdtemp(dir=self.cacheDirectory, prefix='.writing-')
+        for name, array in arrays.items():
+            np.save(os.path.join(temporaryDirectory, name + '.npy'), np.asarray(array))
+        with open(os.path.join(temporaryDirectory, 'keys.pickle'), 'wb') as keyFile:
+            pickle.dump(keys, keyFile, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            os.rename(temporaryDirectory, self.getEntryDirectory(key))
+        except OSError:
+            # another process stored the same entry first, its copy is identical
+            shutil.rmtree(temporaryDirectory, ignore_errors=True)
+        self.evict(keepKey = key)
+
+    def loadEntry(self, key):
+        entryDirectory = self.getEntryDirectory(key)
+        try:
+            arrays = {fileName[:-len('.npy')]: np.load(os.path.join(entryDirectory, fileName), mmap_mode='r')
+                for fileName in os.listdir(entryDirectory) if fileName.endswith('.npy')}
+            # the cache directory is only written by this class, so its pickles are trusted
+            with open(os.path.join(entryDirectory, 'keys.pickle'), 'rb') as keyFile:
+                keys = pickle.load(keyFile)
+        except FileNotFoundError:
+            # missing, or evicted by another worker while loading; arrays already mapped stay valid
+            return(None)
+        # the directory's modification time records the last use, for eviction; best effort (e.g. a read only cache)
+        try:
+            os.utime(entryDirectory)
+        except OSError:
+            pass
+        return(arrays, keys)
+
+    def evict(self, keepKey = None):
+        # keepKey - entry that is never removed (the one just saved)
+        entries = []
+        keptBytes = 0
+        for entryName in os.listdir(self.cacheDirectory):
+            entryDirectory = os.path.join(self.cacheDirectory, entryName)
+            try:
+                if entryName.startswith('.') or not os.path.isdir(entryDirectory):
+                    continue
+                entryBytes = sum(os.path.getsize(os.path.join(entryDirectory, fileName)) for fileName in os.listdir(entryDirectory))
+                lastUse = os.path.getmtime(entryDirectory)
+            except FileNotFoundError:
+                # removed by another worker meanwhile
+                continue
+            if entryName == keepKey:
+                keptBytes += entryBytes
+                continue
+            entries.append((lastUse, entryBytes, entryDirectory))
+
+        entries.sort()
+        now = time.time()
+        totalBytes = keptBytes + sum(entryBytes for lastUse, entryBytes, entryDirectory in entries)
+        for lastUse, entryBytes, entryDirectory in entries:
+            tooOld = self.maxAge is not None and now - lastUse > self.maxAge
+            tooLarge = self.maxBytes is not None and totalBytes > self.maxBytes
+            if not (tooOld or tooLarge):
+                continue
+            shutil.rmtree(entryDirectory, ignore_errors=True)
+            totalBytes -= entryBytes
+
+    def getEntryDirectory(self, key):
+        return(os.path.join(self.cacheDirectory, key))
+
+
+"""
+Cached joint MDP solve - builds, rewards (SetupRewardTable2AgentDistanceCost) and solves (BoltzmannValueIterationVectorized)
+    a two agent joint MDP, or loads all of it from an MDPCache when the same configuration was solved before.
+    The compiled MDP is cached under the hash of the board, actions, goal, traps, barriers and reward parameters, and the
+    values, Q-values and Boltzmann policy under that hash together with gamma, beta and the convergence tolerance,
+    so a new gamma or beta reuses the cached MDP.
+Inputs:
+    Constructor
+    cache - MDPCache
+    stateSet, actionSet, goalState, barrierList - as for SetupDeterministicTransitionByStateSet2Agent
+    trapStates, goalReward, trapCost, costOfNoMovement - as for SetupRewardTable2AgentDistanceCost
+    convergenceTolerance, discountingFactor, beta - as for BoltzmannValueIteration
+
+    Callable
+    returnTables - True builds the [valueTable, policyTable] dictionaries, False returns the arrays
+Output: [valueTable, policyTable], or [value array, policy array]; the (read only, memory mapped on a cache hit) .mdp,
+    .values, .qValues and .policies stay available, .cacheHit tells whether the solution came from the cache
+"""
+
+class SolveJointMDPWithCache(object):
+    def __init__(self, cache, stateSet, actionSet, goalState, trapStates, convergenceTolerance, discountingFactor, beta,
+            barrierList = [], goalReward = 10, trapCost = -100, costOfNoMovement = .1):
+        self.cache = cache
+        self.stateSet = stateSet
+        self.actionSet = actionSet
+        self.goalState = goalState
+        self.trapStates = trapStates
+        self.convergenceTolerance = convergenceTolerance
+        self.gamma = discountingFactor
+        self.beta = beta
+        self.barrierList = barrierList
+        self.goalReward = goalReward
+        self.trapCost = trapCost
+        self.costOfNoMovement = costOfNoMovement
+
+    def __call__(self, returnTables = True):
+        mdpKey = self.cache.getKey(stateSet=list(self.stateSet), actionSet=list(self.actionSet), goalState=self.goalState,
+            trapStates=list(self.trapStates), barrierList=list(self.barrierList), goalReward=self.goalReward, trapCost=self.trapCost,
+            costOfNoMovement=self.costOfNoMovement)
+        solutionKey = self.cache.getKey(mdpKey=mdpKey, convergenceTolerance=self.convergenceTolerance, gamma=self.gamma, beta=self.beta)
+
+        self.mdp = self.getMDP(mdpKey)
+        solution = self.cache.loadArrays(solutionKey) if self.cache.contains(solutionKey) else None
+        self.cacheHit = solution is not None
+        if self.cacheHit:
+            self.values, self.qValues, self.policies = solution['values'], solution['qValues'], solution['policies']
+        else:
+            performValueIteration = BoltzmannValueIterationVectorized(self.mdp, None, None, self.convergenceTolerance, self.gamma, self.beta)
+            performValueIteration()
+            self.values, self.qValues = performValueIteration.values, performValueIteration.qValues
+            self.policies = performValueIteration.getBoltzmannPolicies(self.qValues)
+            self.cache.saveArrays(solutionKey, values=self.values, qValues=self.qValues, policies=self.policies)
+
+        if not returnTables:
+            return([self.values, self.policies])
+        return([self.mdp.getValueTable(self.values), self.mdp.getPolicyTable(self.policies)])
+
+    def getMDP(self, mdpKey):
+        compiledMDP = self.cache.loadMDP(mdpKey) if self.cache.contains(mdpKey) else None
+        if compiledMDP is not None:
+            return(compiledMDP)
+        compiledTransitions = SetupDeterministicTransitionByStateSet2Agent(self.stateSet, self.actionSet, self.goalState,
+            self.barrierList).getCompiledTransitions()
+        compiledMDP = SetupRewardTable2AgentDistanceCost(compiledTransitions, [self.goalState], self.trapStates).getCompiledRewards(
+            self.goalReward, self.trapCost, self.costOfNoMovement)
+        self.cache.saveMDP(mdpKey, compiledMDP)
+        return(compiledMDP)
@@ -0,0 +1,212 @@
+import math
+import itertools
+from collections import OrderedDict
+from collections.abc import Mapping
+
+"""
+Lazy joint table - read only dictionary {state:{action:{nextState:value}}} whose per state entries are computed on access.
+    Joint state spaces of three or more agents are too large to hold as nested dictionaries, so only the most recently
+    used states are kept (least recently used states are dropped once cacheSize states are cached). Code written against
+    the nested dictionaries (BoltzmannValueIteration, SetupCompiledMDP, the reward setups) reads it the same way.
+Inputs:
+    getStateTable - function of a state returning its {action:{nextState:value}} dictionary
+    getStates - function returning a fresh iterator over every state, in a fixed order
+    numberOfStates - number of states getStates yields
+    isState - function telling whether a key is one of the states
+    cacheSize - largest number of states kept
+"""
+
+class LazyJointTable(Mapping):
+    def __init__(self, getStateTable, getStates, numberOfStates, isState, cacheSize = 4096):
+        self.getStateTable = getStateTable
+        self.getStates = getStates
+        self.numberOfStates = numberOfStates
+        self.isState = isState
+        self.cacheSize = cacheSize
+        self.cache = OrderedDict()
+
+    def __getitem__(self, state):
+        if state in self.cache:
+            self.cache.move_to_end(state)
+            return(self.cache[state])
+        if not self.isState(state):
+            raise KeyError(state)
+        stateTable = self.getStateTable(state)
+        self.cache[state] = stateTable
+        if len(self.cache) > self.cacheSize:
+            self.cache.popitem(last=False)
+        return(stateTable)
+
+    def __contains__(self, state):
+        return(self.isState(state))
+
+    def __iter__(self):
+        return(self.getStates())
+
+    def __len__(self):
+        return(self.numberOfStates)
+
+
+"""
+Creates a lazy transition table for any number of agents, the N agent generalization of SetupDeterministicTransitionByStateSet2Agent.
+    Joint states are tuples of distinct single agent cells (plus 'terminal'), joint actions are tuples of single agent actions.
+    Collisions are resolved the same way as for two agents:
+        an agent whose move leaves the board or crosses a barrier stays in place
+        an agent moving into the cell of an agent that stays in place (null action, blocked, or itself stopped) stays in place too
+        agents moving into the same cell: one of them, chosen uniformly at random, moves and the others stay in place
+    Agents may move into cells that other agents are leaving, so for two agents this gives exactly the table of
+    SetupDeterministicTransitionByStateSet2Agent (a contest of two is its .5/.5 collision split).
+
+Inputs:
+    state set - list of states as tuple of tuples (single agent)
+    action set - list of actions as tuple of tuples (single agent)
+    goal state - single agent state that ends the episode
+    numberOfAgents - number of agents in the joint state
+    barrier list - optional list of (state, nextState) single agent moves that are blocked
+    cacheSize - largest number of joint states whose successor distributions are kept
+Output: LazyJointTable {state:{action:{nextState:probability}}}, the joint actions in the order of itertools.product
+Once an agent is on the goal state, the transition moves to the terminal state no matter what actions are taken
+Once the terminal state is reached, the next state will also always be the terminal state
+"""
+
+class SetupLazyTransitionTableNAgent(object):
+    def __init__(self, stateSet, actionSet, goalState, numberOfAgents, barrierList = [], cacheSize = 4096):
+        self.stateSet = stateSet
+        self.actionSet = actionSet
+        self.goalState = goalState
+        self.numberOfAgents = numberOfAgents
+        self.jointActionSet = list(itertools.product(actionSet, repeat=numberOfAgents))
+        self.cellIndex = {cell: index for index, cell in enumerate(stateSet)}
+        self.blockedMoves = set(barrierList)
+        self.cacheSize = cacheSize
+
+    def __call__(self):
+        numberOfJointStates = math.perm(len(self.stateSet), self.numberOfAgents) + 1
+        return(LazyJointTable(self.getStateTransition, self.getJointStates, numberOfJointStates, self.isJointState, self.cacheSize))
+
+    def getJointStates(self):
+        # same order as the joint state set of the two agent setup, every arrangement of distinct cells then 'terminal'
+        return(itertools.chain(itertools.permutations(self.stateSet, self.numberOfAgents), ['terminal']))
+
+    def isJointState(self, state):
+        if state == 'terminal':
+            return(True)
+        return(isinstance(state, tuple) and len(state) == self.numberOfAgents and len(set(state)) == self.numberOfAgents
+            and all(cell in self.cellIndex for cell in state))
+
+    def getStateTransition(self, state):
+        if state == 'terminal' or self.goalState in state:
+            return({action: {'terminal': 1.0} for action in self.jointActionSet})
+        return({action: self.getTransitionDistribution(state, action) for action in self.jointActionSet})
+
+    def getTransitionDistribution(self, state, action):
+        # intended cell of every agent, and whether it tries to move at all (null actions and blocked moves stay in place)
+        targets = [self.addTuples(cell, agentAction) for cell, agentAction in zip(state, action)]
+        moving = [target != cell and target in self.cellIndex and (cell, target) not in self.blockedMoves
+            for cell, target in zip(state, targets)]
+        distribution = {}
+        self.resolveCollisions(state, targets, moving, 1.0, distribution)
+        return(distribution)
+
+    def resolveCollisions(self, state, targets, moving, probability, distribution):
+        # movers into the cell of an agent that stays are stopped, which can stop the movers into their cells in turn
+        moving = list(moving)
+        stoppedAgent = True
+        while stoppedAgent:
+            stayingCells = {cell for cell, agentMoving in zip(state, moving) if not agentMoving}
+            stoppedAgent = False
+            for agent in range(self.numberOfAgents):
+                if moving[agent] and targets[agent] in stayingCells:
+                    moving[agent] = False
+                    stoppedAgent = True
+
+        contenders = {}
+        for agent in range(self.numberOfAgents):
+            if moving[agent]:
+                contenders.setdefault(targets[agent], []).append(agent)
+        contestedCells = [agents for agents in contenders.values() if len(agents) > 1]
+        if not contestedCells:
+            nextState = tuple(target if agentMoving else cell for cell, target, agentMoving in zip(state, targets, moving))
+            distribution[nextState] = distribution.get(nextState, 0) + probability
+            return
+
+        # settle one contested cell: each contender wins with equal probability, the others stay, then resolve the rest
+        contestants = contestedCells[0]
+        for winner in contestants:
+            branchMoving = [agentMoving and (agent == winner or agent not in contestants) for agent, agentMoving in enumerate(moving)]
+            self.resolveCollisions(state, targets, branchMoving, probability/len(contestants), distribution)
+
+    def addTuples(self, tuple1, tuple2):
+        lengthOfShorterTuple = min(len(tuple1), len(tuple2))
+        summedTuple = tuple([tuple1[i] + tuple2[i] for i in range(lengthOfShorterTuple)])
+        return(summedTuple)
+
+
+"""
+Reward table for any number of agents, the N agent generalization of SetupRewardTable2AgentWeakStrong, computed lazily
+Inputs:
+    Constructor
+    transition table - e.g. the LazyJointTable of SetupLazyTransitionTableNAgent
+    goal state(s) - list of tuples
+    trap state(s) - list of tuples
+    goalReward - reward of goal state(s)
+    trapCost - cost of trap state(s)
+    costOfNoMovement - cost of taking action (0,0) - no movement
+    cacheSize - largest number of joint states whose rewards are kept
+
+    Callable
+        agent abilities - tuple with one multiplicative cost factor per agent, as for SetupRewardTable2AgentWeakStrong
+            (all 1 gives the costs of SetupRewardTable2AgentDistanceCost)
+Output: LazyJointTable {state:{action:{nextState:reward}}} keyed like the transition table
+"""
+
+class SetupRewardTableNAgent(object):
+    def __init__(self, transitionTable, goalStates = [], trapStates = [], goalReward = 10, trapCost = -100, costOfNoMovement = .1,
+            cacheSize = 4096):
+        self.transitionTable = transitionTable
+        self.goalStates = goalStates
+        self.trapStates = trapStates
+        self.goalReward = goalReward
+        self.trapCost = trapCost
+        self.costOfNoMovement = costOfNoMovement
+        self.cacheSize = cacheSize
+
+    def __call__(self, agentAbilities):
+        getStateRewards = lambda state: self.getStateRewards(state, agentAbilities)
+        return(LazyJointTable(getStateRewards, lambda: iter(self.transitionTable), len(self.transitionTable),
+            lambda state: state in self.transitionTable, self.cacheSize))
+
+    def getStateRewards(self, state, agentAbilities):
+        return({action: {nextState: self.applyRewardFunction(state, action, nextState, agentAbilities) for nextState in nextStateDict.keys()}
+            for action, nextStateDict in self.transitionTable[state].items()})
+
+    def applyRewardFunction(self, state, action, nextState, agentAbilities):
+        # terminal state has no reward or cost
+        if state == 'terminal':
+            return(0)
+        movementCosts = self.getCosts(state, action, agentAbilities)
+        specialTileCosts = self.getSpecialTileRewards(nextState)
+        return(movementCosts+specialTileCosts)
+
+    def getSpecialTileRewards(self, state):
+        # if the next state is a special tile, the agents receive the rewards/costs of that location
+        reward = 0.0
+        if state == 'terminal':
+            return(reward)
+        if any(agentState in self.goalStates for agentState in state):
+            reward += abs(self.goalReward)
+        if any(agentState in self.trapStates for agentState in state):
+            reward -= abs(self.trapCost)
+        return(reward)
+
+    def getCosts(self, state, action, agentAbilities):
+        # no move cost on the goal state because every action moves to the terminal state
+        if any(agentState in self.goalStates for agentState in state):
+            return(0)
+        return(sum([self.getCostOfDistance(agentAction, agentAbility) for agentAction, agentAbility in zip(action, agentAbilities)]))
+
+    def getCostOfDistance(self, action, agentAbilityScalar, nullAction = (0,0)):
+        if action == nullAction:
+            return(-abs(self.costOfNoMovement))
+        actionDistance = sum([abs(actionCoordinate) for actionCoordinate in action])
+        return(-actionDistance*abs(agentAbilityScalar))
@@ -0,0 +1,111 @@
+import warnings
+import numpy as np
+import scipy.sparse as sparse
+from scipy.sparse.linalg import spsolve
+from compiledMDP import CompiledMDP, SetupCompiledMDP
+
+"""
+Occupancy measure - expected (discounted) number of visits of every joint state under a policy, from a start distribution,
+    the exact counterpart of counting the visits of many SampleTrajectoryBatches rollouts.
+    The policy and the transitions give the Markov chain P[s, s'] = sum over a of policy(a|s)*T(s, a, s'). A trajectory is
+    counted in every state it passes through, start and stop state included, and ends on entering a stop state, so the rows
+    of the stop states are dropped from the chain. The occupancy d = sum over t of gamma**t * start P**t is found by
+        iterative propagation (default) - one sparse product per step, until the discounted probability mass still on the
+            way is at most convergenceTolerance (or for exactly maxSteps steps, the expected counts of rollouts cut off
+            after maxSteps steps like SampleTrajectoryBatches); memory stays linear in the size of the chain
+        sparse direct solve (convergenceTolerance None) - solves (I - gamma*P^T) d = start exactly; the LU factors of
+            large joint boards fill in badly (a 20x20 board does not fit in a few GB), so this is for small chains
+    Undiscounted (gamma 1) occupancies are finite only when every trajectory reaches a stop state; if some states can never
+    reach one, the solve raises ValueError (use gamma < 1 or maxSteps).
+Inputs:
+    Constructor
+    transitionTable - nested dictionary {state:{action:{nextState:probability}}} or a CompiledMDP
+    policyTable - dictionary {state:{action:probability}} or a (numberOfStates, numberOfActions) array in the compiled order
+    stopStates - states that end a trajectory, None stops at absorbing states (every action leads back to the state, e.g. 'terminal')
+
+    Callable
+    startDistribution - dictionary {state: probability}
+    discountingFactor - gamma, 1 for expected visit counts
+    maxSteps - None for unbounded trajectories, otherwise the number of steps propagated
+    convergenceTolerance - largest discounted probability mass left when propagation stops, None for the direct solve
+Output: dictionary {state: expected discounted visits}; the array stays available as .occupancies
+    getAgentCellOccupancies gives the marginal visits of every agent's cell, e.g. for visualizations.visualizeAgentOccupancies
+"""
+
+class GetOccupancyMeasure(object):
+    def __init__(self, transitionTable, policyTable, stopStates = None):
+        if isinstance(transitionTable, CompiledMDP):
+            self.mdp = transitionTable
+        else:
+            self.mdp = SetupCompiledMDP(transitionTable)()
+        self.policies = self.getPolicyArray(policyTable)
+        self.isStopState = self.mdp.getStopStates(stopStates)
+        self.chainMatrix = self.getChainMatrix()
+
+    def __call__(self, startDistribution, discountingFactor = 1, maxSteps = None, convergenceTolerance = 1e-10):
+        start = np.zeros(self.mdp.numberOfStates)
+        for state, probability in startDistribution.items():
+            start[self.mdp.stateIndex[state]] += probability
+
+        if maxSteps is None and convergenceTolerance is None:
+            self.occupancies = self.solveOccupancies(start, discountingFactor)
+        else:
+            self.occupancies = self.propagateOccupancies(start, discountingFactor, maxSteps, convergenceTolerance)
+        return(self.mdp.getValueTable(self.occupancies))
+
+    def solveOccupancies(self, start, gamma):
+        systemMatrix = sparse.identity(self.mdp.numberOfStates, format='csc') - gamma*self.chainMatrix.T.tocsc()
+        with warnings.catch_warnings(), np.errstate(all='ignore'):
+            # a singular system (a closed set of states without stop states) is reported below
+            warnings.simplefilter('ignore')
+            occupancies = spsolve(systemMatrix, start)
+        if not np.isfinite(occupancies).all() or (occupancies < -1e-9).any():
+            raise ValueError("the occupancy is unbounded, some states never reach a stop state (use a discount below 1 or maxSteps)")
+        return(np.maximum(occupancies, 0))
+
+    def propagateOccupancies(self, start, gamma, maxSteps, convergenceTolerance, checkInterval = 1000):
+        chainTranspose = self.chainMatrix.T.tocsr()
+        occupancies = start.copy()
+        stepDistribution = start
+        step = 0
+        checkedMass = stepDistribution.sum()
+        while maxSteps is None or step < maxSteps:
+            stepDistribution = gamma*(chainTranspose @ stepDistribution)
+            occupancies += stepDistribution
+            step += 1
+            if maxSteps is not None:
+                continue
+            mass = stepDistribution.sum()
+            if mass <= convergenceTolerance:
+                break
+            # mass that stays in the chain forever (no stop state reachable, gamma 1) would never drain
+            if step % checkInterval == 0:
+                if mass >= checkedMass*(1 - 1e-9):
+                    raise ValueError("the occupancy is unbounded, some states never reach a stop state (use a discount below 1 or maxSteps)")
+                checkedMass = mass
+        return(occupancies)
+
+    def getPolicyArray(self, policyTable):
+        if isinstance(policyTable, np.ndarray):
+            return(policyTable)
+        return(np.array([[policyTable[state][action] for action in self.mdp.actions] for state in self.mdp.states]))
+
+    def getChainMatrix(self):
+        # (numberOfStates, numberOfStates) state to state probabilities under the policy, no rows for stop states
+        numberOfStates, numberOfActions = self.mdp.numberOfStates, self.mdp.numberOfActions
+        actionWeights = self.policies*~self.isStopState[:, None]
+        policyMatrix = sparse.csr_matrix((actionWeights.ravel(), (np.repeat(np.arange(numberOfStates), numberOfActions),
+            np.arange(numberOfStates*numberOfActions))), shape=(numberOfStates, numberOfStates*numberOfActions))
+        return((policyMatrix @ self.mdp.transitionMatrix).tocsr())
+
+    def getAgentCellOccupancies(self, occupancies = None):
+        # one dictionary {cell: expected visits} per agent, summing the joint states with the agent in that cell
+        if occupancies is None:
+            occupancies = self.occupancies
+        cells, stateCells = self.mdp.getStateCells()
+        isJointState = (stateCells >= 0).all(axis=1)
+        agentOccupancies = []
+        for agent in range(stateCells.shape[1]):
+            cellVisits = np.bincount(stateCells[isJointState, agent], weights=occupancies[isJointState], minlength=len(cells))
+            agentOccupancies.append(dict(zip(cells, cellVisits.tolist())))
+        return(agentOccupancies)
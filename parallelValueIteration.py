@@ -0,0 +1,174 @@
+import multiprocessing
+from multiprocessing import shared_memory, util
+import numpy as np
+import scipy.sparse as sparse
+from ValueIteration import SolverMonitor, getCompiledSolverInputs, getBoltzmannPolicies
+
+"""
+Parallel Boltzmann value iteration - BoltzmannValueIterationVectorized with every sweep split over a pool of processes.
+    The states are partitioned into about numberOfBlocks contiguous blocks of whole agent 1 cells (in the order of the
+    transition builders the joint states of one agent 1 cell are contiguous, so the blocks are cut between runs of equal
+    CompiledMDP.getStateCells()[:, 0], as evenly as those runs allow), and every block is backed up as one
+    sparse product by one of the workers. The compiled transitions, the expected rewards and the value vector(s) live in
+    shared memory, so the workers copy nothing; only block bounds and the block's largest change are passed around, and
+    the main process checks convergence after every sweep (the largest change over the blocks).
+        Jacobi (gaussSeidel False) - every block reads the values of the previous sweep and writes a second value vector,
+            so the sweeps are exactly those of BoltzmannValueIterationVectorized whatever the number of processes
+        Gauss-Seidel (gaussSeidel True) - blocks read and write one value vector in place, so a block backed up later in
+            a sweep already sees the new values of earlier blocks (which blocks run first depends on the scheduling, so
+            the number of sweeps may differ between runs); usually fewer sweeps, same fixed point
+    Either way the result matches the serial solver within the convergence tolerance bound. The speedup is bounded by
+    the number of cores: with numberOfProcesses at most the number of cores each worker's share of a sweep shrinks
+    with the number of processes, beyond it the workers only take turns.
+Inputs:
+    transitionTable, rewardTable, valueTable, convergenceTolerance, discountingFactor, beta - as for BoltzmannValueIterationVectorized
+    numberOfProcesses - size of the process pool, None for the number of cores
+    numberOfBlocks - number of state blocks per sweep, None for 4 per process (to even out unequal blocks); at most
+        the number of agent 1 cells
+    gaussSeidel - False for Jacobi sweeps, True for in place block Gauss-Seidel sweeps
+    sweepCallback, maxIterations, timeBudget - optional, see SolverMonitor
+Output: [valueTable, policyTable]; .mdp, .values, .qValues, .numberOfSweeps, .numberOfBackups and .runReport as for
+    BoltzmannValueIterationVectorized
+"""
+
+class BoltzmannValueIterationParallel(object):
+    def __init__(self, transitionTable, rewardTable, valueTable, convergenceTolerance, discountingFactor, beta, numberOfProcesses = None,
+            numberOfBlocks = None, gaussSeidel = False, sweepCallback = None, maxIterations = None, timeBudget = None):
+        self.transitionTable = transitionTable
+        self.rewardTable  = rewardTable
+        self.valueTable = valueTable
+        self.convergenceTolerance = convergenceTolerance
+        self.gamma = discountingFactor
+        self.beta = beta
+        self.numberOfProcesses = numberOfProcesses or multiprocessing.cpu_count()
+        self.numberOfBlocks = numberOfBlocks or 4*self.numberOfProcesses
+        self.gaussSeidel = gaussSeidel
+        self.sweepCallback = sweepCallback
+        self.maxIterations = maxIterations
+        self.timeBudget = timeBudget
+
+    def __call__(self):
+        self.mdp, values = getCompiledSolverInputs(self.transitionTable, self.rewardTable, self.valueTable)
+        if self.valueTable is None:
+            self.valueTable = {}
+
+        transitionMatrix = self.mdp.transitionMatrix
+        sharedArrays = SharedArrays({'rowPointer': transitionMatrix.indptr, 'nextStateIndices': transitionMatrix.indices,
+            'probabilities': transitionMatrix.data, 'expectedRewards': self.mdp.expectedRewards, 'values0': values, 'values1': values})
+        try:
+            with multiprocessing.Pool(self.numberOfProcesses, initializer=attachWorkerArrays,
+                    initargs=(sharedArrays.getDescriptions(), self.mdp.numberOfActions, self.gamma)) as pool:
+                values = self.runSweeps(pool, sharedArrays)
+                # let the workers exit normally, so they run closeWorkerArrays rather than being terminated
+                pool.close()
+                pool.join()
+        finally:
+            sharedArrays.release()
+
+        self.values = values
+        self.qValues = self.mdp.getQValues(values, self.gamma)
+        policies = getBoltzmannPolicies(self.qValues, self.beta)
+        self.valueTable.update(self.mdp.getValueTable(values))
+        policyTable = self.mdp.getPolicyTable(policies)
+        return([self.valueTable, policyTable])
+
+    def getBlocks(self):
+        # [(firstState, lastState)] cut only where the agent 1 cell changes, each cut at the run boundary nearest to an
+        # even split
+        cells, stateCells = self.mdp.getStateCells()
+        runBounds = np.concatenate([[0], np.flatnonzero(np.diff(stateCells[:, 0]) != 0) + 1, [self.mdp.numberOfStates]])
+        if self.numberOfBlocks >= len(runBounds) - 1:
+            blockBounds = runBounds
+        else:
+            evenBounds = np.linspace(0, self.mdp.numberOfStates, self.numberOfBlocks + 1)
+            blockBounds = np.unique(runBounds[np.abs(runBounds[None, :] - evenBounds[:, None]).argmin(axis=1)])
+        return(list(zip(blockBounds[:-1].tolist(), blockBounds[1:].tolist())))
+
+    def runSweeps(self, pool, sharedArrays):
+        blocks = self.getBlocks()
+        monitor = SolverMonitor(self.convergenceTolerance, self.gamma, self.sweepCallback, self.maxIterations, self.timeBudget)
+        self.numberOfSweeps = 0
+        readVector, writeVector = 'values0', ('values0' if self.gaussSeidel else 'values1')
+        delta = self.convergenceTolerance*100
+        while(delta > self.convergenceTolerance):
+            delta = max(pool.starmap(sweepBlock, [(firstState, lastState, readVector, writeVector) for firstState, lastState in blocks]))
+            if not self.gaussSeidel:
+                readVector, writeVector = writeVector, readVector
+            self.numberOfSweeps += 1
+            if not monitor.recordSweep(delta, self.mdp.numberOfStates):
+                break
+        self.numberOfBackups = self.numberOfSweeps*self.mdp.numberOfStates
+        self.runReport = monitor.getRunReport()
+        return(sharedArrays.arrays[readVector].copy())
+
+
+"""
+Numpy arrays copied into shared memory blocks, for processes to attach to by name (see attachWorkerArrays)
+Inputs:
+    arrays - dictionary {name: array}
+Output: .arrays maps every name to the array backed by shared memory; release closes and removes the blocks
+"""
+
+class SharedArrays(object):
+    def __init__(self, arrays):
+        self.memoryBlocks = {}
+        self.arrays = {}
+        for name, array in arrays.items():
+            array = np.asarray(array)
+            memoryBlock = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            self.memoryBlocks[name] = memoryBlock
+            self.arrays[name] = np.ndarray(array.shape, dtype=array.dtype, buffer=memoryBlock.buf)
+            self.arrays[name][...] = array
+
+    def getDescriptions(self):
+        return({name: (self.memoryBlocks[name].name, array.shape, array.dtype.str) for name, array in self.arrays.items()})
+
+    def release(self):
+        self.arrays = {}
+        for memoryBlock in self.memoryBlocks.values():
+            memoryBlock.close()
+            memoryBlock.unlink()
+
+
+# per worker process state: the attached shared arrays and the block transition matrices built from them
+workerState = {}
+
+def attachWorkerArrays(descriptions, numberOfActions, gamma):
+    workerState['memoryBlocks'] = [shared_memory.SharedMemory(name=memoryName) for memoryName, shape, dtype in descriptions.values()]
+    workerState['arrays'] = {name: np.ndarray(shape, dtype=dtype, buffer=memoryBlock.buf)
+        for (name, (memoryName, shape, dtype)), memoryBlock in zip(descriptions.items(), workerState['memoryBlocks'])}
+    workerState['numberOfActions'] = numberOfActions
+    workerState['gamma'] = gamma
+    workerState['blockMatrices'] = {}
+    # run when the worker exits after Pool.close, so its handles to the shared blocks are closed
+    util.Finalize(None, closeWorkerArrays, exitpriority=10)
+
+def closeWorkerArrays():
+    # the views on the blocks must go before the blocks can be closed
+    workerState['blockMatrices'] = {}
+    workerState['arrays'] = {}
+    for memoryBlock in workerState.get('memoryBlocks', []):
+        memoryBlock.close()
+    workerState['memoryBlocks'] = []
+
+def getBlockMatrix(firstState, lastState):
+    # rows of the block's (state, action) pairs, on views of the shared index and probability arrays
+    if (firstState, lastState) not in workerState['blockMatrices']:
+        arrays, numberOfActions = workerState['arrays'], workerState['numberOfActions']
+        rowPointer = arrays['rowPointer'][firstState*numberOfActions:lastState*numberOfActions + 1]
+        firstEntry, lastEntry = rowPointer[0], rowPointer[-1]
+        blockMatrix = sparse.csr_matrix((arrays['probabilities'][firstEntry:lastEntry], arrays['nextStateIndices'][firstEntry:lastEntry],
+            rowPointer - firstEntry), shape=(len(rowPointer) - 1, len(arrays['values0'])), copy=False)
+        workerState['blockMatrices'][(firstState, lastState)] = blockMatrix
+    return(workerState['blockMatrices'][(firstState, lastState)])
+
+def sweepBlock(firstState, lastState, readVector, writeVector):
+    # backs up the states [firstState, lastState) from readVector into writeVector, returns the largest change
+    arrays = workerState['arrays']
+    qValues = (getBlockMatrix(firstState, lastState) @ arrays[readVector]).reshape(lastState - firstState, workerState['numberOfActions'])
+    qValues *= workerState['gamma']
+    qValues += arrays['expectedRewards'][firstState:lastState]
+    newValues = qValues.max(axis=1)
+    delta = np.abs(newValues - arrays[readVector][firstState:lastState]).max()
+    arrays[writeVector][firstState:lastState] = newValues
+    return(float(delta))
@@ -0,0 +1,216 @@
+import math
+import time
+import random
+
+"""
+Admissible goal distance heuristic for the joint planners - an upper bound on the optimal value of a joint state.
+    With d the smallest Manhattan distance of any agent to a goal, no policy earns the goal reward before step d; if it
+    does so at step T >= d, every one of the T steps costs at least minimumStepCost and d of them move an agent, costing
+    at least minimumMoveCost. The discounted value is largest with the moves last, which gives
+        gamma**T * K - minimumStepCost/(1 - gamma),
+        K = goalReward/gamma + minimumStepCost/(1 - gamma) - (minimumMoveCost - minimumStepCost)*(gamma**-d - 1)/(1 - gamma)
+    monotone in T, so the bound is the larger of T = d and never reaching the goal (-minimumStepCost/(1 - gamma)).
+    Barriers, traps, collisions and slippery moves only lower the true value. With several goals, agents landing on
+    different goals in the same step all earn the reward, so the goal reward is counted min(number of agents, number of
+    goals) times. States with an agent on a goal and 'terminal' are worth 0.
+Inputs:
+    goalStates - list of single agent goal cells
+    goalReward - reward of reaching a goal
+    minimumStepCost - smallest total cost of any joint action, e.g. numberOfAgents*costOfNoMovement for the distance
+        cost rewards
+    minimumMoveCost - smallest total cost of a joint action moving an agent one cell, e.g. 1 + costOfNoMovement*(numberOfAgents - 1)
+        for the distance cost rewards (with agent abilities, the smallest ability weighted costs); None for minimumStepCost
+    discountingFactor - gamma
+Output: callable giving the bound of a joint state
+"""
+
+class GoalDistanceHeuristic(object):
+    def __init__(self, goalStates, goalReward, minimumStepCost, discountingFactor, minimumMoveCost = None):
+        self.goalStates = goalStates
+        self.goalReward = abs(goalReward)
+        self.minimumStepCost = abs(minimumStepCost)
+        self.minimumMoveCost = self.minimumStepCost if minimumMoveCost is None else max(abs(minimumMoveCost), self.minimumStepCost)
+        self.gamma = discountingFactor
+
+    def __call__(self, state):
+        if state == 'terminal':
+            return(0.0)
+        distance = min(sum(abs(agentCoordinate - goalCoordinate) for agentCoordinate, goalCoordinate in zip(agentState, goalState))
+            for agentState in state for goalState in self.goalStates)
+        if distance == 0:
+            return(0.0)
+        goalReward = self.goalReward*min(len(state), len(self.goalStates))
+        if self.gamma == 1:
+            return(goalReward - self.minimumMoveCost*distance)
+        neverReaching = -self.minimumStepCost/(1 - self.gamma)
+        reachingFirst = self.gamma**distance*(goalReward/self.gamma - neverReaching
+            - (self.minimumMoveCost - self.minimumStepCost)*(self.gamma**-distance - 1)/(1 - self.gamma)) + neverReaching
+        return(max(reachingFirst, neverReaching))
+
+
+"""
+Labeled real time dynamic programming (LRTDP) - anytime Boltzmann planner for one joint state at a time.
+    Instead of sweeping every joint state, trials run greedily from the start state, sampling successors, and back up
+    only the states they visit (values start from the admissible heuristic, an upper bound, so unexplored states look
+    at least as good as they are and get explored before they can be ruled out). A state is labeled solved once every
+    state its greedy policy can reach has a Bellman residual of at most the convergence tolerance; trials stop at solved
+    states, and the start state is solved when its greedy envelope has converged.
+    Backups use the Q-values of BoltzmannValueIteration, Q(s, a) = sum over s' of p(s'|s, a)*(r(s, a, s') + gamma*V(s')),
+    and V(s) = max over a of Q(s, a); a backup solves for the state's own value (see backUp), so staying put, optimal
+    far from the goal, does not need a geometric tail of backups, and a trial ends when it stays put. The transition
+    and reward tables are only read for the states the trials reach, so lazy tables (nAgentJointPlanner's
+    LazyJointTable, e.g. SetupLazyTransitionTableNAgent with 2 agents) expand transitions on demand and never build the
+    |S|^2+1 joint states; the successors and rewards of every state reached are kept by the planner (.expandedStates),
+    so the tables' own caches may be small.
+    Once the start state is solved, the successors of all its actions are solved too, so that every action's Q-value at
+    the start state, not only the greedy one's, has converged (before that, non greedy actions can rest on heuristic
+    values and their Boltzmann probabilities are too high).
+Inputs:
+    Constructor
+    transitionTable - {state:{action:{nextState:probability}}}, a dictionary or a lazy Mapping
+    rewardTable - {state:{action:{nextState:reward}}} keyed like the transition table
+    heuristic - function of a state giving an upper bound of its value, e.g. GoalDistanceHeuristic
+    convergenceTolerance, discountingFactor, beta - as for BoltzmannValueIteration
+    maxTrialLength - largest number of steps of a trial (greedy cycles through several states would not end otherwise)
+    seed - seed of the successor sampling
+
+    Callable
+    startState - joint state to plan for
+    timeBudget - seconds to plan for, None to plan until the start state's actions are solved
+    maxTrials - largest number of trials, None for no limit
+Output: Boltzmann action distribution {action: probability} of the start state under the current values; calling again
+    continues from the values found so far. .valueTable holds the values of every state reached (heuristic values where
+    not backed up yet), .solvedStates the labeled states, .isStartSolved whether every action's Q-value at the last start
+    state has converged (False before the first call), .numberOfTrials and .numberOfBackups the work done. getActionDistribution gives the distribution of any state.
+"""
+
+class LabeledRTDPBoltzmannPlanner(object):
+    def __init__(self, transitionTable, rewardTable, heuristic, convergenceTolerance, discountingFactor, beta,
+            maxTrialLength = 1000, seed = None):
+        self.transitionTable = transitionTable
+        self.rewardTable = rewardTable
+        self.heuristic = heuristic
+        self.convergenceTolerance = convergenceTolerance
+        self.gamma = discountingFactor
+        self.beta = beta
+        self.maxTrialLength = maxTrialLength
+        self.randomGenerator = random.Random(seed)
+        self.valueTable = {}
+        self.expandedStates = {}
+        self.solvedStates = set()
+        self.numberOfTrials = 0
+        self.numberOfBackups = 0
+        self.isStartSolved = False
+
+    def __call__(self, startState, timeBudget = None, maxTrials = None):
+        deadline = None if timeBudget is None else time.perf_counter() + timeBudget
+        trialLimit = None if maxTrials is None else self.numberOfTrials + maxTrials
+        # the start state first, then every successor of its actions
+        statesToSolve = [startState] + [nextState for successors in self.expandState(startState).values()
+            for nextState, prob, reward in successors]
+        for state in statesToSolve:
+            while state not in self.solvedStates:
+                if (deadline is not None and time.perf_counter() >= deadline) or (trialLimit is not None and self.numberOfTrials >= trialLimit):
+                    self.isStartSolved = False
+                    return(self.getActionDistribution(startState))
+                self.runTrial(state)
+        self.isStartSolved = True
+        return(self.getActionDistribution(startState))
+
+    def runTrial(self, startState):
+        self.numberOfTrials += 1
+        visitedStates = []
+        state = startState
+        while state not in self.solvedStates and len(visitedStates) < self.maxTrialLength:
+            visitedStates.append(state)
+            greedyAction = self.backUp(state)
+            nextState = self.sampleNextState(state, greedyAction)
+            # staying put is already solved for by the backup
+            if nextState == state:
+                break
+            state = nextState
+        # label the visited states from the end of the trial back, stopping at the first one that is not solved yet
+        while visitedStates:
+            if not self.checkSolved(visitedStates.pop()):
+                break
+
+    def checkSolved(self, state):
+        # depth first over the greedy envelope of the state; all of it is solved if no residual is above the tolerance
+        converged = True
+        openStates = [state]
+        closedStates = []
+        reachedStates = {state}
+        while openStates:
+            currentState = openStates.pop()
+            closedStates.append(currentState)
+            qValues = self.getQValues(currentState)
+            greedyAction = max(qValues, key=qValues.get)
+            if abs(qValues[greedyAction] - self.getValue(currentState)) > self.convergenceTolerance:
+                converged = False
+                continue
+            for nextState, prob, reward in self.expandState(currentState)[greedyAction]:
+                if nextState not in self.solvedStates and nextState not in reachedStates:
+                    reachedStates.add(nextState)
+                    openStates.append(nextState)
+        if converged:
+            self.solvedStates.update(closedStates)
+        else:
+            for closedState in reversed(closedStates):
+                self.backUp(closedState)
+        return(converged)
+
+    def getValue(self, state):
+        if state not in self.valueTable:
+            self.valueTable[state] = self.heuristic(state)
+        return(self.valueTable[state])
+
+    def expandState(self, state):
+        # successors of every action as [(nextState, probability, reward)], read from the tables once per state
+        if state not in self.expandedStates:
+            rewardDict = self.rewardTable[state]
+            self.expandedStates[state] = {action: [(nextState, prob, rewardDict[action][nextState]) for nextState, prob in nextStateDict.items()]
+                for action, nextStateDict in self.transitionTable[state].items()}
+        return(self.expandedStates[state])
+
+    def getQValues(self, state):
+        return({action: sum(prob*(reward + self.gamma*self.getValue(nextState)) for nextState, prob, reward in successors)
+            for action, successors in self.expandState(state).items()})
+
+    def backUp(self, state):
+        # Bellman backup of the state with its own value solved for, returns its greedy action: with the other values
+        # fixed, V(s) = max over a of (sum over s' != s of p(r + gamma*V(s')) + p(s|s, a)*r(s, a, s))/(1 - gamma*p(s|s, a)),
+        # the value of repeating a until leaving s, so a state where staying put is best converges in one backup
+        # instead of a factor gamma per backup
+        localValues = {}
+        for action, successors in self.expandState(state).items():
+            leavingValue, stayingProbability = 0.0, 0.0
+            for nextState, prob, reward in successors:
+                if nextState == state:
+                    leavingValue += prob*reward
+                    stayingProbability += prob
+                else:
+                    leavingValue += prob*(reward + self.gamma*self.getValue(nextState))
+            if self.gamma*stayingProbability < 1:
+                localValues[action] = leavingValue/(1 - self.gamma*stayingProbability)
+            else:
+                # undiscounted self loop, repeated forever
+                localValues[action] = math.copysign(math.inf, leavingValue) if leavingValue != 0 else 0.0
+        greedyAction = max(localValues, key=localValues.get)
+        self.valueTable[state] = localValues[greedyAction]
+        self.numberOfBackups += 1
+        return(greedyAction)
+
+    def sampleNextState(self, state, action):
+        successors = self.expandState(state)[action]
+        if len(successors) == 1:
+            return(successors[0][0])
+        return(self.randomGenerator.choices([nextState for nextState, prob, reward in successors],
+            weights=[prob for nextState, prob, reward in successors])[0])
+
+    def getActionDistribution(self, state):
+        # Boltzmann policy of the current Q-values, largest exponent subtracted as in BoltzmannValueIteration
+        qValues = self.getQValues(state)
+        largestQValue = max(qValues.values())
+        unnormalizedPolicy = {action: math.exp(self.beta*(qValue - largestQValue)) for action, qValue in qValues.items()}
+        totalWeight = sum(unnormalizedPolicy.values())
+        return({action: weight/totalWeight for action, weight in unnormalizedPolicy.items()})
@@ -0,0 +1,203 @@
+import numpy as np
+import itertools
+import scipy.sparse as sparse
+from compiledMDP import CompiledMDP, SetupCompiledMDP
+from ValueIteration import BoltzmannValueIterationVectorized
+
+"""
+Finds the symmetries of a compiled joint MDP -
+    Candidates are every permutation of the agents combined with every rotation/reflection of the bounding box of the
+    board (the 8 symmetries of a square, only the 4 that keep the axes for a non square box). A candidate is kept only
+    if it maps the board and the action set onto themselves and leaves every transition probability and reward unchanged,
+    e.g. swapping the agents of SetupRewardTable2AgentDistanceCost, or of SetupRewardTable2AgentWeakStrong with equal abilities,
+    and reflecting a board whose goal and trap layout is mirror symmetric. The kept candidates always form a group.
+Inputs:
+    compiledMDP - CompiledMDP with rewards attached, states are tuples of single agent cells (plus e.g. 'terminal')
+    useAgentPermutations - try permuting the agents
+    useGridSymmetries - try rotating/reflecting the board (2-d cells only)
+Output: list of (statePermutation, actionPermutation) integer arrays, including the identity
+"""
+
+class FindJointMDPSymmetries(object):
+    def __init__(self, compiledMDP, useAgentPermutations = True, useGridSymmetries = True):
+        self.mdp = compiledMDP
+        self.useAgentPermutations = useAgentPermutations
+        self.useGridSymmetries = useGridSymmetries
+
+    def __call__(self):
+        cells, stateCells = self.mdp.getStateCells()
+        numberOfAgents = stateCells.shape[1]
+        agentPermutations = list(itertools.permutations(range(numberOfAgents))) if self.useAgentPermutations else [tuple(range(numberOfAgents))]
+        gridTransforms = self.getGridTransforms(cells) if self.useGridSymmetries else [np.eye(2, dtype=int)]
+
+        # compositions of symmetries are symmetries, so a candidate already generated by accepted ones needs no check
+        symmetries = {}
+        for agentPermutation, gridTransform in itertools.product(agentPermutations, gridTransforms):
+            candidate = self.getCandidatePermutations(cells, stateCells, agentPermutation, gridTransform)
+            if candidate is None or self.getSymmetryKey(candidate) in symmetries:
+                continue
+            isIdentity = np.array_equal(candidate[0], np.arange(len(candidate[0]))) and np.array_equal(candidate[1], np.arange(len(candidate[1])))
+            if isIdentity or self.isSymmetry(*candidate):
+                symmetries = self.getGroupClosure(symmetries, candidate)
+        return(list(symmetries.values()))
+
+    def getSymmetryKey(self, symmetry):
+        return(symmetry[0].tobytes() + symmetry[1].tobytes())
+
+    def getGroupClosure(self, symmetries, generator):
+        closure = dict(symmetries)
+        newElements = [generator]
+        while newElements:
+            element = newElements.pop()
+            if self.getSymmetryKey(element) in closure:
+                continue
+            closure[self.getSymmetryKey(element)] = element
+            for other in list(closure.values()):
+                newElements.append((element[0][other[0]], element[1][other[1]]))
+                newElements.append((other[0][element[0]], other[1][element[1]]))
+        return(closure)
+
+    def getGridTransforms(self, cells):
+        if len(cells[0]) != 2:
+            return([np.eye(2, dtype=int)])
+        rotationsAndReflections = [np.array(matrix) for matrix in [[[1,0],[0,1]], [[-1,0],[0,1]], [[1,0],[0,-1]], [[-1,0],[0,-1]],
+            [[0,-1],[1,0]], [[0,1],[-1,0]], [[0,1],[1,0]], [[0,-1],[-1,0]]]]
+        cellArray = np.array(cells)
+        width, height = cellArray.max(axis=0) - cellArray.min(axis=0)
+        # quarter turns and diagonal reflections only map a square box onto itself
+        return(rotationsAndReflections if width == height else rotationsAndReflections[:4])
+
+    def getCandidatePermutations(self, cells, stateCells, agentPermutation, gridTransform):
+        # transform about the centre of the bounding box, in doubled coordinates so half integer centres stay integer
+        cellArray = np.array(cells)
+        doubledCentre = cellArray.min(axis=0) + cellArray.max(axis=0)
+        doubledCells = (2*cellArray - doubledCentre) @ gridTransform.T + doubledCentre
+        if (doubledCells % 2 != 0).any():
+            return(None)
+        cellIndex = {cell: index for index, cell in enumerate(cells)}
+        cellPermutation = [cellIndex.get(tuple(cell), -1) for cell in (doubledCells // 2).tolist()]
+        if -1 in cellPermutation:
+            return(None)
+        cellPermutation = np.array(cellPermutation + [-1])
+
+        # joint states: each agent takes the transformed cell of the agent it is permuted with; states without cells map to themselves
+        numberOfCells = len(cells) + 1
+        stateKeys = self.getStateKeys(stateCells, numberOfCells)
+        mappedKeys = self.getStateKeys(cellPermutation[stateCells[:, list(agentPermutation)]], numberOfCells)
+        keyOrder = np.argsort(stateKeys)
+        positions = np.searchsorted(stateKeys, mappedKeys, sorter=keyOrder).clip(0, len(stateKeys)-1)
+        statePermutation = keyOrder[positions]
+        if not np.array_equal(stateKeys[statePermutation], mappedKeys):
+            return(None)
+
+        actionPermutation = []
+        for action in self.mdp.actions:
+            mappedAction = tuple(tuple((gridTransform @ np.array(action[agent])).tolist()) for agent in agentPermutation)
+            if mappedAction not in self.mdp.actionIndex:
+                return(None)
+            actionPermutation.append(self.mdp.actionIndex[mappedAction])
+        return(statePermutation, np.array(actionPermutation))
+
+    def getStateKeys(self, stateCells, numberOfCells):
+        # one integer per state from its agents' cell indices (the -1 of a state without cells becomes the last digit value)
+        digits = np.where(stateCells < 0, numberOfCells - 1, stateCells)
+        return((digits * numberOfCells**np.arange(stateCells.shape[1])).sum(axis=1))
+
+    def isSymmetry(self, statePermutation, actionPermutation):
+        # every (state, action) row must be mapped onto a row with the same successors (mapped), probabilities and rewards
+        if len(np.unique(statePermutation)) != len(statePermutation):
+            return(False)
+        # cheap rejection first: expected rewards and successor counts of every row must already agree
+        mappedExpectedRewards = self.mdp.expectedRewards[statePermutation][:, actionPermutation]
+        rowLengths = np.diff(self.mdp.rowPointer).reshape(self.mdp.numberOfStates, self.mdp.numberOfActions)
+        if not (np.allclose(mappedExpectedRewards, self.mdp.expectedRewards) 
+                and np.array_equal(rowLengths[statePermutation][:, actionPermutation], rowLengths)):
+            return(False)
+
+        numberOfActions = self.mdp.numberOfActions
+        rows = self.mdp.getRowOfEntries()
+        mappedRows = statePermutation[rows // numberOfActions]*numberOfActions + actionPermutation[rows % numberOfActions]
+        mappedNextStates = statePermutation[self.mdp.nextStateIndices]
+        # no row has a repeated successor, so equal probability and probability*reward matrices mean equal rows
+        for entryValues in [self.mdp.probabilities, self.mdp.probabilities*self.mdp.rewards]:
+            originalMatrix = sparse.csr_matrix((entryValues, self.mdp.nextStateIndices, self.mdp.rowPointer), shape=self.mdp.transitionMatrix.shape)
+            mappedMatrix = sparse.csr_matrix((entryValues, (mappedRows, mappedNextStates)), shape=self.mdp.transitionMatrix.shape)
+            difference = abs(mappedMatrix - originalMatrix)
+            if difference.nnz > 0 and difference.max() > 1e-9:
+                return(False)
+        return(True)
+
+
+"""
+Symmetry reduced Boltzmann value iteration -
+    Same inputs and [valueTable, policyTable] output as BoltzmannValueIteration. The symmetries found by FindJointMDPSymmetries
+    split the joint states into orbits; value iteration runs on one representative state per orbit (successors are replaced
+    by their representatives and duplicates merged), and the values are copied back to every state of each orbit.
+    The full table is only used for one final backup to get the Q-values and Boltzmann policy of every state.
+    Optimal values are constant on orbits, so the result matches the unreduced solve within the convergence tolerance.
+Inputs:
+    transitionTable, rewardTable, valueTable, convergenceTolerance, discountingFactor, beta - as for BoltzmannValueIterationVectorized
+    useAgentPermutations, useGridSymmetries - as for FindJointMDPSymmetries
+Output: [valueTable, policyTable]; the symmetries, number of orbits and the reduced MDP stay available as
+    .symmetries, .numberOfOrbits and .reducedMDP
+"""
+
+class SymmetryReducedBoltzmannValueIteration(object):
+    def __init__(self, transitionTable, rewardTable, valueTable, convergenceTolerance, discountingFactor, beta,
+            useAgentPermutations = True, useGridSymmetries = True):
+        self.transitionTable = transitionTable
+        self.rewardTable = rewardTable
+        self.valueTable = valueTable
+        self.convergenceTolerance = convergenceTolerance
+        self.gamma = discountingFactor
+        self.beta = beta
+        self.useAgentPermutations = useAgentPermutations
+        self.useGridSymmetries = useGridSymmetries
+
+    def __call__(self):
+        if isinstance(self.transitionTable, CompiledMDP):
+            self.mdp = self.transitionTable
+        else:
+            self.mdp = SetupCompiledMDP(self.transitionTable, self.rewardTable)()
+        self.symmetries = FindJointMDPSymmetries(self.mdp, self.useAgentPermutations, self.useGridSymmetries)()
+
+        # representative of each state is the smallest state index in its orbit
+        representatives = np.min([statePermutation for statePermutation, actionPermutation in self.symmetries], axis=0)
+        representativeStates, orbitOfState = np.unique(representatives, return_inverse=True)
+        self.numberOfOrbits = len(representativeStates)
+        self.reducedMDP = self.getReducedMDP(representativeStates, orbitOfState)
+
+        initialValueTable = None
+        if self.valueTable is not None:
+            initialValueTable = {orbit: self.valueTable[self.mdp.states[state]] for orbit, state in enumerate(representativeStates)}
+        performValueIteration = BoltzmannValueIterationVectorized(self.reducedMDP, None, initialValueTable,
+            self.convergenceTolerance, self.gamma, self.beta)
+        performValueIteration()
+
+        self.values = performValueIteration.values[orbitOfState]
+        self.qValues = self.mdp.getQValues(self.values, self.gamma)
+        policies = performValueIteration.getBoltzmannPolicies(self.qValues)
+        if self.valueTable is None:
+            self.valueTable = {}
+        self.valueTable.update(self.mdp.getValueTable(self.values))
+        return([self.valueTable, self.mdp.getPolicyTable(policies)])
+
+    def getReducedMDP(self, representativeStates, orbitOfState):
+        # rows of the representative states, successors replaced by their orbit, duplicate successors of a row merged
+        numberOfActions = self.mdp.numberOfActions
+        representativeRows = (representativeStates[:, None]*numberOfActions + np.arange(numberOfActions)[None, :]).ravel()
+        rowStarts = self.mdp.rowPointer[representativeRows]
+        rowLengths = self.mdp.rowPointer[representativeRows + 1] - rowStarts
+        entries = np.repeat(rowStarts - np.cumsum(rowLengths) + rowLengths, rowLengths) + np.arange(rowLengths.sum())
+        reducedRows = np.repeat(np.arange(len(representativeRows)), rowLengths)
+        reducedNextStates = orbitOfState[self.mdp.nextStateIndices[entries]]
+        probabilities = self.mdp.probabilities[entries]
+
+        mergedEntries, entryGroup = np.unique(np.stack([reducedRows, reducedNextStates]), axis=1, return_inverse=True)
+        entryGroup = entryGroup.ravel()
+        mergedProbabilities = np.bincount(entryGroup, weights=probabilities)
+        # probability weighted reward keeps the expected reward of every row unchanged
+        mergedRewards = np.bincount(entryGroup, weights=probabilities*self.mdp.rewards[entries])/mergedProbabilities
+        rowPointer = np.concatenate([[0], np.cumsum(np.bincount(mergedEntries[0], minlength=len(representativeRows)))])
+        return(CompiledMDP(list(range(len(representativeStates))), self.mdp.actions, rowPointer, mergedEntries[1],
+            mergedProbabilities, mergedRewards))
@@ -0,0 +1,56 @@
+import sys
+sys.path.append('../src/')
+
+import unittest
+from ddt import ddt, data, unpack
+import grosseJointPlanner as plannerCode
+import ValueIteration as solverCode
+import agentAbilitySweep as targetCode
+import itertools
+
+@ddt
+class TestSolveAgentAbilitySweep(unittest.TestCase):
+	def setUp(self): 
+		cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		gridWidth = 4
+		gridHeight = 4
+		self.goalState = (3,3)
+		self.trapState = (0,0)
+		stateSet4x4 = list(itertools.product(range(gridWidth), range(gridHeight)))
+		getTransitionTable = plannerCode.SetupDeterministicTransitionByStateSet2Agent(stateSet4x4,cardinalActionSet, self.goalState)
+		self.transitionTable = getTransitionTable()
+		self.getRewardTable = plannerCode.SetupRewardTable2AgentWeakStrong(self.transitionTable, [self.goalState], [self.trapState])
+		self.convergence = .000001
+		self.gamma = .95
+		self.beta = 2
+
+	# every ability pair must match its own solve, whatever the batching
+	@data(1, 3, 10)
+	def test_MatchesIndependentSolves(self, batchSize):
+		agentAbilitiesList = [(1,1), (2,1), (1,0.5), (.5,2), (1.5,1.5), (-1,1)]
+		solveSweep = targetCode.SolveAgentAbilitySweep(self.getRewardTable, self.convergence, self.gamma, self.beta, batchSize)
+		results = solveSweep(agentAbilitiesList)
+
+		self.assertEqual(len(results), len(agentAbilitiesList))
+		for agentAbilities, (valueTable, policyTable) in zip(agentAbilitiesList, results):
+			rewardTable = self.getRewardTable(agentAbilities)
+			expectedValues, expectedPolicy = solverCode.BoltzmannValueIterationVectorized(self.transitionTable, rewardTable, 
+				None, self.convergence, self.gamma, self.beta)()
+			for state in self.transitionTable.keys():
+				self.assertAlmostEqual(valueTable[state], expectedValues[state], places=4)
+				for action, actionProb in expectedPolicy[state].items():
+					self.assertAlmostEqual(policyTable[state][action], actionProb, places=3)
+
+	@data(True, False)
+	def test_EmptyAbilitiesList(self, returnTables):
+		solveSweep = targetCode.SolveAgentAbilitySweep(self.getRewardTable, self.convergence, self.gamma, self.beta)
+		self.assertEqual(solveSweep([], returnTables), [])
+		self.assertEqual(solveSweep.values.shape, (solveSweep.mdp.numberOfStates, 0))
+		self.assertEqual(solveSweep.numberOfSweeps, 0)
+
+	def tearDown(self):
+		pass
+
+
+if __name__ == '__main__':
+	unittest.main(verbosity=2)
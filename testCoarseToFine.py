@@ -0,0 +1,87 @@
+import sys
+sys.path.append('../src/')
+
+import unittest
+from ddt import ddt, data, unpack
+import grosseJointPlanner as plannerCode
+import ValueIteration as solverCode
+import coarseToFine as targetCode
+import itertools
+import numpy as np
+
+@ddt
+class TestCoarseToFineBoltzmannValueIteration(unittest.TestCase):
+	def setUp(self): 
+		self.cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		self.stateSet = list(itertools.product(range(8), range(8)))
+		self.goalState = (6,6)
+		self.trapStates = [(4,3), (1,6)]
+		self.convergenceTolerance = .000001
+
+	def getColdSolver(self, gamma, agentAbilities = (1, 1)):
+		compiledTransitions = plannerCode.SetupDeterministicTransitionByStateSet2Agent(self.stateSet, self.cardinalActionSet, 
+			self.goalState).getCompiledTransitions()
+		compiledMDP = plannerCode.SetupRewardTable2AgentWeakStrong(compiledTransitions, [self.goalState], self.trapStates).getCompiledRewards(agentAbilities)
+		coldSolver = solverCode.BoltzmannValueIterationVectorized(compiledMDP, None, None, self.convergenceTolerance, gamma, 2)
+		coldSolver()
+		return(coldSolver)
+
+	@data((.95, (1, 1), 16), (.99, (1, 1), 16), (.95, (1, 2), 4), (.95, (1, 1), 64))
+	@unpack
+	def test_MatchesColdStartWithFewerSweeps(self, gamma, agentAbilities, minimumCells):
+		coldSolver = self.getColdSolver(gamma, agentAbilities)
+		coarseToFine = targetCode.CoarseToFineBoltzmannValueIteration(self.stateSet, self.cardinalActionSet, self.goalState, 
+			self.trapStates, self.convergenceTolerance, gamma, 2, minimumCells=minimumCells, agentAbilities=agentAbilities)
+		valueTable, policyTable = coarseToFine()
+
+		# both solves are within gamma*tolerance/(1-gamma) of the optimal values
+		errorBound = 2*gamma*self.convergenceTolerance/(1 - gamma)
+		self.assertLessEqual(np.abs(coarseToFine.values - coldSolver.values).max(), errorBound)
+		self.assertEqual(set(valueTable.keys()), set(coldSolver.mdp.states))
+		self.assertAlmostEqual(sum(policyTable[((0,0),(7,7))].values()), 1)
+		self.assertLess(coarseToFine.numberOfSweeps, coldSolver.numberOfSweeps)
+
+	def test_SweepsOfEveryLevel(self):
+		coarseToFine = targetCode.CoarseToFineBoltzmannValueIteration(self.stateSet, self.cardinalActionSet, self.goalState, 
+			self.trapStates, self.convergenceTolerance, .95, 2, minimumCells=4)
+		coarseToFine(returnTables = False)
+		# 8x8, 4x4 and 2x2 boards, coarsest first
+		self.assertEqual(len(coarseToFine.sweepsPerLevel), 3)
+		self.assertEqual(coarseToFine.sweepsPerLevel[-1], coarseToFine.numberOfSweeps)
+
+	# the prolonged values are a heuristic underestimate, checked here on the test board
+	def test_WarmStartUnderestimatesOnTestBoard(self):
+		gamma = .95
+		coldSolver = self.getColdSolver(gamma)
+		coarseToFine = targetCode.CoarseToFineBoltzmannValueIteration(self.stateSet, self.cardinalActionSet, self.goalState, 
+			self.trapStates, self.convergenceTolerance, gamma, 2, minimumCells=16)
+		coarseToFine(returnTables = False)
+		warmStart = np.maximum(coarseToFine.getWarmStartValues(coarseToFine.solveCoarseBoard()), coarseToFine.getStayingValues())
+		self.assertTrue((warmStart <= coldSolver.values + .0001).all())
+
+	def test_StayingValues(self):
+		coarseToFine = targetCode.CoarseToFineBoltzmannValueIteration(self.stateSet, self.cardinalActionSet, self.goalState, 
+			self.trapStates, self.convergenceTolerance, .9, 2)
+		coarseToFine(returnTables = False)
+		stayingValues = coarseToFine.getStayingValues()
+		stateIndex = coarseToFine.mdp.stateIndex
+		self.assertAlmostEqual(stayingValues[stateIndex[((0,0),(7,7))]], -.2/(1 - .9))
+		# staying on a trap pays the trap cost every step, the goal and 'terminal' do not stay in place / are worth 0
+		self.assertAlmostEqual(stayingValues[stateIndex[((4,3),(7,7))]], (-.2 - 100)/(1 - .9))
+		self.assertEqual(stayingValues[stateIndex[((6,6),(7,7))]], -np.inf)
+		self.assertEqual(stayingValues[stateIndex['terminal']], 0)
+
+	# the staying values are a true lower bound on any board
+	@data(.9, .99)
+	def test_StayingValuesAreALowerBound(self, gamma):
+		coldSolver = self.getColdSolver(gamma)
+		coarseToFine = targetCode.CoarseToFineBoltzmannValueIteration(self.stateSet, self.cardinalActionSet, self.goalState, 
+			self.trapStates, self.convergenceTolerance, gamma, 2)
+		coarseToFine(returnTables = False)
+		self.assertTrue((coarseToFine.getStayingValues() <= coldSolver.values + .0001).all())
+
+	def tearDown(self):
+		pass
+
+if __name__ == '__main__':
+	unittest.main(verbosity=2)
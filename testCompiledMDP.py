@@ -0,0 +1,207 @@
+import sys
+sys.path.append('../src/')
+
+import unittest
+from ddt import ddt, data, unpack
+import grosseJointPlanner as plannerCode
+import ValueIteration as solverCode
+import compiledMDP as targetCode
+import itertools
+import numpy as np
+
+@ddt
+class TestSetupCompiledMDP(unittest.TestCase):
+	def setUp(self): 
+		cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		gridWidth = 4
+		gridHeight = 4
+		self.goalState = (3,3)
+		self.trapState = (0,0)
+		stateSet4x4 = list(itertools.product(range(gridWidth), range(gridHeight)))
+		getTransitionTable = plannerCode.SetupDeterministicTransitionByStateSet2Agent(stateSet4x4,cardinalActionSet, self.goalState)
+		self.transitionTable = getTransitionTable()
+		getRewardTable = plannerCode.SetupRewardTable2AgentDistanceCost(self.transitionTable, [self.goalState], [self.trapState])
+		self.rewardTable = getRewardTable()
+		self.compiledMDP = targetCode.SetupCompiledMDP(self.transitionTable, self.rewardTable)()
+
+	# the dictionary views reproduce the tables, including successor order of the collision splits
+	def test_DictionaryViewsMatchTables(self):
+		self.assertEqual(len(self.compiledMDP.transitionTable), len(self.transitionTable))
+		self.assertEqual(list(self.compiledMDP.transitionTable.keys()), list(self.transitionTable.keys()))
+		for state in self.transitionTable.keys():
+			self.assertEqual(self.compiledMDP.transitionTable[state], self.transitionTable[state])
+			self.assertEqual(list(self.compiledMDP.transitionTable[state][((1,0), (0,1))].keys()), 
+				list(self.transitionTable[state][((1,0), (0,1))].keys()))
+			self.assertEqual(self.compiledMDP.rewardTable[state], self.rewardTable[state])
+
+	@data((((0,1), (1,0)), ((1, 0), (0,1)), -2), 
+		(((1,0), (0,1)), ((0,1), (1,0)), -2), 
+		(((3,2), (0,1)), ((0, 1), (0,-1)), -92),
+		('terminal', ((0,1), (-1, 0)), 0))
+	@unpack
+	def test_ExpectedRewards(self, jointState, jointAction, expectedResult):
+		stateIndex = self.compiledMDP.stateIndex[jointState]
+		actionIndex = self.compiledMDP.actionIndex[jointAction]
+		self.assertAlmostEqual(self.compiledMDP.expectedRewards[stateIndex, actionIndex], expectedResult)
+
+	# only float32 values are swept in single precision, other types are promoted to float64 as before
+	@data((int, np.float64), (np.float16, np.float64), (np.float32, np.float32), (np.float64, np.float64))
+	@unpack
+	def test_QValueTypes(self, valueType, expectedType):
+		values = np.ones(self.compiledMDP.numberOfStates, dtype=valueType)
+		qValues = self.compiledMDP.getQValues(values, .9)
+		self.assertEqual(qValues.dtype, expectedType)
+		self.assertTrue(np.allclose(qValues, self.compiledMDP.getQValues(np.ones(self.compiledMDP.numberOfStates), .9), atol=1e-5))
+		self.assertTrue(set(self.compiledMDP.typedArrays.keys()) <= {np.dtype(np.float32)})
+
+	def test_RewardTableWithoutRewards(self):
+		compiledTransitions = targetCode.SetupCompiledMDP(self.transitionTable)()
+		self.assertIsNone(compiledTransitions.rewardTable)
+		self.assertIsNone(compiledTransitions.getCompactMDP().rewardTable)
+		self.assertEqual(compiledTransitions.transitionTable[((0,1),(1,0))], self.transitionTable[((0,1),(1,0))])
+
+	# only 'terminal' leads back to itself under every action, given stop states are marked as they are
+	def test_StopStates(self):
+		self.assertEqual([self.compiledMDP.states[state] for state in np.flatnonzero(self.compiledMDP.getStopStates())], ['terminal'])
+		isStopState = self.compiledMDP.getStopStates([((0,1),(1,0)), 'terminal'])
+		self.assertEqual(isStopState.sum(), 2)
+		self.assertTrue(isStopState[self.compiledMDP.stateIndex[((0,1),(1,0))]])
+
+	# solving the compiled MDP directly gives the same result as solving the dictionaries
+	def test_SolverConsumesCompiledMDP(self):
+		valueTable, policyTable = solverCode.BoltzmannValueIterationVectorized(self.transitionTable, self.rewardTable, 
+			{state:0 for state in self.transitionTable.keys()}, .000001, .95, 2)()
+		compiledValueTable, compiledPolicyTable = solverCode.BoltzmannValueIterationVectorized(self.compiledMDP, None, 
+			None, .000001, .95, 2)()
+		self.assertEqual(compiledValueTable, valueTable)
+		self.assertEqual(compiledPolicyTable, policyTable)
+
+	def tearDown(self):
+		pass
+
+@ddt
+class TestActionGroups(unittest.TestCase):
+	def setUp(self): 
+		self.cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		self.stateSet4x4 = list(itertools.product(range(4), range(4)))
+		self.goalState = (3,3)
+		getTransitionTable = plannerCode.SetupDeterministicTransitionByStateSet2Agent(self.stateSet4x4, self.cardinalActionSet, self.goalState)
+		self.transitionTable = getTransitionTable()
+		self.groupedTransitions = getTransitionTable.getCompiledTransitions(groupActions=True)
+
+	# builder keys and detection from the rows give the same groups
+	@data([], [((1,1),(1,2)), ((0,0),(1,0))])
+	def test_BuilderGroupsMatchDetectedGroups(self, barrierList):
+		getTransitionTable = plannerCode.SetupDeterministicTransitionByStateSet2Agent(self.stateSet4x4, self.cardinalActionSet, self.goalState, barrierList)
+		groupMatrix, rowGroups = getTransitionTable.getCompiledTransitions(groupActions=True).getActionGroups()
+		detectedGroupMatrix, detectedRowGroups = getTransitionTable.getCompiledTransitions().getActionGroups()
+		self.assertTrue(np.array_equal(rowGroups, detectedRowGroups))
+		self.assertEqual(abs(groupMatrix - detectedGroupMatrix).sum(), 0)
+
+	# every action of a group has the group's successor distribution, different groups of a state differ
+	def test_GroupsHoldIdenticalDistributions(self):
+		groupMatrix, rowGroups = self.groupedTransitions.getActionGroups()
+		numberOfActions = self.groupedTransitions.numberOfActions
+		for stateIndex, state in enumerate(self.groupedTransitions.states):
+			stateGroups = rowGroups[stateIndex*numberOfActions:(stateIndex+1)*numberOfActions]
+			distributions = {}
+			for action, group in zip(self.groupedTransitions.actions, stateGroups.tolist()):
+				distributions.setdefault(group, []).append(self.transitionTable[state][action])
+			for groupDistributions in distributions.values():
+				self.assertTrue(all(distribution == groupDistributions[0] for distribution in groupDistributions))
+			firstDistributions = [groupDistributions[0] for groupDistributions in distributions.values()]
+			self.assertEqual(len(firstDistributions), len(set(frozenset(distribution.items()) for distribution in firstDistributions)))
+
+	@data(
+		# agent 1 in a corner stays for 2 of its moves, agent 2 has 5 distinct moves
+		(((0,0),(2,2)), 15),
+		# on the goal every action moves to 'terminal'
+		(((3,3),(0,1)), 1),
+		('terminal', 1),
+		# both agents in corners, one of the stays of each agent is a wall move
+		(((0,0),(3,0)), 9))
+	@unpack
+	def test_NumberOfGroups(self, jointState, expectedGroups):
+		numberOfActions = self.groupedTransitions.numberOfActions
+		stateIndex = self.groupedTransitions.stateIndex[jointState]
+		rowGroups = self.groupedTransitions.getActionGroups()[1]
+		self.assertEqual(len(set(rowGroups[stateIndex*numberOfActions:(stateIndex+1)*numberOfActions].tolist())), expectedGroups)
+
+	# the grouped Q-values equal the full ones and the groups survive attaching rewards
+	def test_CollapsedQValues(self):
+		compiledMDP = plannerCode.SetupRewardTable2AgentWeakStrong(self.groupedTransitions, [self.goalState], [(1,1)]).getCompiledRewards((1, 2))
+		self.assertIs(compiledMDP.actionGroups, self.groupedTransitions.actionGroups)
+		values = np.random.RandomState(0).rand(compiledMDP.numberOfStates)
+		self.assertTrue(np.allclose(compiledMDP.getCollapsedQValues(values, .95), compiledMDP.getQValues(values, .95)))
+		values = np.random.RandomState(0).rand(compiledMDP.numberOfStates, 3)
+		self.assertTrue(np.allclose(compiledMDP.getCollapsedQValues(values, .95), compiledMDP.getQValues(values, .95)))
+
+	def tearDown(self):
+		pass
+
+@ddt
+class TestCompactCompiledMDP(unittest.TestCase):
+	def setUp(self): 
+		cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		stateSet4x4 = list(itertools.product(range(4), range(4)))
+		self.goalState = (3,3)
+		self.transitionTable = plannerCode.SetupDeterministicTransitionByStateSet2Agent(stateSet4x4, cardinalActionSet, self.goalState)()
+		# a trap next to open cells so some collision splits have successors with different rewards
+		self.rewardTable = plannerCode.SetupRewardTable2AgentDistanceCost(self.transitionTable, [self.goalState], [(1,1)])()
+		self.compiledMDP = targetCode.SetupCompiledMDP(self.transitionTable, self.rewardTable)()
+		self.compactMDP = self.compiledMDP.getCompactMDP()
+
+	def test_RewardsRoundTrip(self):
+		self.assertGreater(len(self.compactMDP.rewardExceptionEntries), 0)
+		self.assertLess(len(self.compactMDP.rewardExceptionEntries), len(self.compiledMDP.rewards)/100)
+		self.assertTrue(np.array_equal(self.compactMDP.rewards, self.compiledMDP.rewards))
+		self.assertTrue(np.array_equal(self.compactMDP.expectedRewards, self.compiledMDP.expectedRewards))
+		for state in self.transitionTable.keys():
+			self.assertEqual(self.compactMDP.transitionTable[state], self.transitionTable[state])
+			self.assertEqual(self.compactMDP.rewardTable[state], self.rewardTable[state])
+
+	def test_SolverResultsUnchanged(self):
+		expectedValues, expectedPolicy = solverCode.BoltzmannValueIterationVectorized(self.compiledMDP, None, None, .000001, .95, 2)()
+		values, policy = solverCode.BoltzmannValueIterationVectorized(self.compactMDP, None, None, .000001, .95, 2)()
+		self.assertEqual(values, expectedValues)
+		self.assertEqual(policy, expectedPolicy)
+
+	def test_WithRewardsStaysCompact(self):
+		rewards = np.arange(len(self.compiledMDP.probabilities), dtype=float)
+		compactWithRewards = self.compactMDP.withRewards(rewards)
+		self.assertIsInstance(compactWithRewards, targetCode.CompactCompiledMDP)
+		self.assertTrue(np.array_equal(compactWithRewards.rewards, rewards))
+		self.assertTrue(np.allclose(compactWithRewards.expectedRewards, self.compiledMDP.withRewards(rewards).expectedRewards))
+
+	def test_MemoryReport(self):
+		memoryReport = targetCode.getMemoryReport(self.transitionTable, self.rewardTable)
+		self.assertLess(memoryReport['compact'], memoryReport['compiled'])
+		self.assertLess(memoryReport['compiled'], memoryReport['dictionaries']/5)
+		footprint = self.compactMDP.getMemoryFootprint()
+		self.assertEqual(footprint['transitionMatrix.indices'], 0)
+		self.assertNotIn('rewards', footprint)
+
+	# the slippery build sums merged successors, rows of equal rewards must not become exceptions through rounding
+	def test_SlipperyRewardExceptionsAreRare(self):
+		stateSet6x6 = list(itertools.product(range(6), range(6)))
+		compiledTransitions = plannerCode.SetupSlipperyTransitionByStateSet2Agent(stateSet6x6, [(-1,0), (0,1), (1,0), (0,-1), (0,0)], 
+			(5,5), .8).getCompiledTransitions()
+		compiledMDP = plannerCode.SetupRewardTable2AgentDistanceCost(compiledTransitions, [(5,5)], []).getCompiledRewards()
+		compactMDP = compiledMDP.getCompactMDP()
+		rowOfEntries = compiledMDP.getRowOfEntries()
+		rowRange = np.maximum.reduceat(compiledMDP.rewards, compiledMDP.rowPointer[:-1]) - np.minimum.reduceat(compiledMDP.rewards, compiledMDP.rowPointer[:-1])
+		self.assertTrue((rowRange[rowOfEntries[compactMDP.rewardExceptionEntries]] > 0).all())
+		self.assertLess(len(compactMDP.rewardExceptionEntries), len(compiledMDP.rewards)/5)
+		self.assertTrue(np.allclose(compactMDP.rewards, compiledMDP.rewards, rtol=0, atol=1e-10))
+
+	@data((1000, 25000, np.int32), (1000, 2**31, np.int64), (2**31, 100, np.int64))
+	@unpack
+	def test_IndexType(self, numberOfStates, numberOfEntries, expectedType):
+		self.assertEqual(targetCode.getIndexType(numberOfStates, numberOfEntries), expectedType)
+
+	def tearDown(self):
+		pass
+
+
+if __name__ == '__main__':
+	unittest.main(verbosity=2)
@@ -0,0 +1,84 @@
+import sys
+sys.path.append('../src/')
+
+import unittest
+from ddt import ddt, data, unpack
+import grosseJointPlanner as plannerCode
+import ValueIteration as solverCode
+import goalInference as targetCode
+import itertools
+import math
+import numpy as np
+
+@ddt
+class TestSolveCandidateGoals(unittest.TestCase):
+	def setUp(self): 
+		self.cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		gridWidth = 4
+		gridHeight = 4
+		self.stateSet = list(itertools.product(range(gridWidth), range(gridHeight)))
+		self.candidateGoals = [(3,3), (0,3), (2,1)]
+		self.trapStates = [(1,1)]
+		self.convergence = .000001
+		self.gamma = .95
+		self.beta = 2
+
+	# every candidate must match building and solving the joint MDP with that goal alone
+	@data(([], (1,1), 1), ([((1,2),(2,2))], (1,1), 2), ([], (2,.5), 3))
+	@unpack
+	def test_MatchesSeparateSolves(self, barrierList, agentAbilities, batchSize):
+		solveGoals = targetCode.SolveCandidateGoals(self.stateSet, self.cardinalActionSet, self.candidateGoals, self.trapStates, 
+			self.convergence*(1-self.gamma)/10, self.gamma, self.beta, barrierList, agentAbilities = agentAbilities, batchSize = batchSize)
+		results = solveGoals()
+
+		for goal, (valueTable, policyTable) in zip(self.candidateGoals, results):
+			transitionTable = plannerCode.SetupDeterministicTransitionByStateSet2Agent(self.stateSet, self.cardinalActionSet, goal, barrierList)()
+			rewardTable = plannerCode.SetupRewardTable2AgentWeakStrong(transitionTable, [goal], self.trapStates)(agentAbilities)
+			expectedValues, expectedPolicy = solverCode.BoltzmannValueIterationVectorized(transitionTable, rewardTable, 
+				None, self.convergence*(1-self.gamma)/10, self.gamma, self.beta)()
+			for state in transitionTable.keys():
+				self.assertAlmostEqual(valueTable[state], expectedValues[state], places=5)
+				for action, actionProb in expectedPolicy[state].items():
+					self.assertAlmostEqual(policyTable[state][action], actionProb, places=5)
+
+	# the vectorized log likelihoods must equal summing out the actions step by step with the dictionaries
+	@data(False, True)
+	def test_TrajectoryLogLikelihoods(self, withActions):
+		solveGoals = targetCode.SolveCandidateGoals(self.stateSet, self.cardinalActionSet, self.candidateGoals, self.trapStates, 
+			self.convergence, self.gamma, self.beta)
+		results = solveGoals()
+		trajectories = [[((0,0),(3,0)), ((0,1),(3,1)), ((0,2),(3,2)), ((0,3),(3,2)), 'terminal'],
+			[((1,2),(1,0)), ((1,2),(2,0)), ((2,2),(2,1))],
+			[((0,1),(0,3)), ((0,2),(0,3))]]
+		actionSequences = [[((0,1),(0,1)), ((0,1),(0,1)), ((0,1),(0,0)), ((0,0),(0,0))],
+			[((0,0),(1,0)), ((1,0),(0,1))],
+			[((0,1),(0,0))]]
+		logLikelihoods = solveGoals.getTrajectoryLogLikelihoods(trajectories, actionSequences if withActions else None)
+
+		self.assertEqual(logLikelihoods.shape, (len(trajectories), len(self.candidateGoals)))
+		for goalIndex, (goal, (valueTable, policyTable)) in enumerate(zip(self.candidateGoals, results)):
+			transitionTable = plannerCode.SetupDeterministicTransitionByStateSet2Agent(self.stateSet, self.cardinalActionSet, goal)()
+			for trajectoryIndex, (trajectory, actionSequence) in enumerate(zip(trajectories, actionSequences)):
+				likelihood = 1.0
+				for step, (state, nextState) in enumerate(zip(trajectory[:-1], trajectory[1:])):
+					actions = [actionSequence[step]] if withActions else policyTable[state].keys()
+					likelihood *= sum(policyTable[state][action]*transitionTable[state][action].get(nextState, 0) for action in actions)
+				if likelihood == 0:
+					self.assertEqual(logLikelihoods[trajectoryIndex, goalIndex], -np.inf)
+				else:
+					self.assertAlmostEqual(logLikelihoods[trajectoryIndex, goalIndex], math.log(likelihood), places=8)
+
+	def test_GoalDirectedTrajectoryPrefersItsGoal(self):
+		solveGoals = targetCode.SolveCandidateGoals(self.stateSet, self.cardinalActionSet, self.candidateGoals, self.trapStates, 
+			self.convergence, self.gamma, self.beta)
+		solveGoals(returnTables = False)
+		towardTopCorner = [((0,0),(3,0)), ((0,1),(3,1)), ((0,2),(3,2)), ((0,3),(3,2))]
+		logLikelihoods = solveGoals.getTrajectoryLogLikelihoods([towardTopCorner])
+		self.assertEqual(int(np.argmax(logLikelihoods[0])), self.candidateGoals.index((0,3)))
+
+	def tearDown(self):
+		pass
+
+
+if __name__ == '__main__':
+	unittest.main(verbosity=2)
@@ -6,6 +6,7 @@ from ddt import ddt, data, unpack
 import grosseJointPlanner as targetCode
 import pandas as pd
 import itertools
+import numpy as np
 
 @ddt
 class TestTransitionByStateSet2Agent(unittest.TestCase):
@@ -60,6 +61,57 @@ class TestTransitionByStateSet2Agent(unittest.TestCase):
 
 		self.assertEqual(nextStateDistribution, expectedResult)
 
+	# the array built table must match the single (state, action) path everywhere, including successor order
+	# example 2 is an irregular board with a wall of missing cells, example 3 has a goal off the board
+	# example 4 has barriers blocking single moves
+	@data(((4, 4), [], (3,3), []), 
+		((5, 4), [(2,1), (2,2)], (4,0), []),
+		((3, 3), [], (9,9), []),
+		((4, 4), [], (3,3), [((1,0), (2,0)), ((2,0), (1,0)), ((1,1), (1,2))]))
+	@unpack
+	def test_VectorizedTableMatchesPerStateTransitions(self, gridSize, missingCells, goalState, barrierList):
+		stateSet = [cell for cell in itertools.product(range(gridSize[0]), range(gridSize[1])) if cell not in missingCells]
+		getTransitionTable = targetCode.SetupDeterministicTransitionByStateSet2Agent(stateSet, self.cardinalActionSet, goalState, barrierList)
+		transitionTable = getTransitionTable()
+
+		self.assertEqual(list(transitionTable.keys()), getTransitionTable.jointStateSet)
+		for state in getTransitionTable.jointStateSet:
+			expectedStateTransition = getTransitionTable.getStateTransition(state)
+			self.assertEqual(transitionTable[state], expectedStateTransition)
+			for action, nextStateDistribution in expectedStateTransition.items():
+				self.assertEqual(list(transitionTable[state][action].keys()), list(nextStateDistribution.keys()))
+
+	# a barrier is treated like the edge of the board, including for collisions
+	@data((((1,0), (3,0)), ((1,0), (-1,0)), {((1,0), (2,0)):1.0}),
+		(((1,1), (0,1)), ((0,1), (1,0)), {((1,1), (0,1)):1.0}),
+		(((2,0), (0,0)), ((-1,0), (1,0)), {((2,0), (1,0)):1.0}))
+	@unpack
+	def test_BarrierBlocksMove(self, jointState, jointAction, expectedResult):
+		barrierList = [((1,0), (2,0)), ((2,0), (1,0)), ((1,1), (1,2))]
+		getTransitionTable = targetCode.SetupDeterministicTransitionByStateSet2Agent(self.stateSet4x4, self.cardinalActionSet, self.goalState, barrierList)
+		self.assertEqual(getTransitionTable()[jointState][jointAction], expectedResult)
+
+	# only the reachable closure is built and it agrees with the full table on those states
+	# example 1 walls the agents into the left half away from the goal, example 2 can reach the goal
+	@data(([((1,y), (2,y)) for y in range(4)] + [((2,y), (1,y)) for y in range(4)], [((0,0), (1,0))], 57),
+		([], [((0,0), (1,0)), ((3,2), (2,3))], 16*15 + 1))
+	@unpack
+	def test_ReachableTableIsClosedPartOfFullTable(self, barrierList, startStates, expectedNumberOfStates):
+		fullTransitionTable = targetCode.SetupDeterministicTransitionByStateSet2Agent(self.stateSet4x4, self.cardinalActionSet, 
+			self.goalState, barrierList)()
+		transitionTable = targetCode.SetupDeterministicTransitionByStateSet2Agent(self.stateSet4x4, self.cardinalActionSet, 
+			self.goalState, barrierList, startStates)()
+
+		self.assertEqual(len(transitionTable), expectedNumberOfStates)
+		self.assertEqual(list(transitionTable.keys()), [state for state in fullTransitionTable.keys() if state in transitionTable])
+		for startState in startStates:
+			self.assertIn(startState, transitionTable)
+		for state, actionDict in transitionTable.items():
+			self.assertEqual(actionDict, fullTransitionTable[state])
+			for nextStateDistribution in actionDict.values():
+				for nextState in nextStateDistribution.keys():
+					self.assertIn(nextState, transitionTable)
+
 
 	def tearDown(self):
 		pass
@@ -122,6 +174,18 @@ class TestRewardSetup(unittest.TestCase):
 		stateActionReward = rewardTable[jointState][jointAction][nextState]
 
 		self.assertEqual(stateActionReward, expectedResult)
+
+	# the bulk rewards must equal the per entry rewards, example 3 also moves the goal and traps
+	@data((10, -100, .1, [(3,3)], [(0,0)]), 
+		(25, 40, -.5, [(3,3)], [(0,0), (1,2)]),
+		(10, -100, .1, [(3,3), (0,3)], [(2,2)]))
+	@unpack
+	def test_CompiledRewardsMatchRewardTable(self, goalReward, trapCost, costOfNoMovement, goalStates, trapStates):
+		getRewardTable = targetCode.SetupRewardTable2AgentDistanceCost(self.transitionTable, goalStates, trapStates)
+		rewardTable = getRewardTable(goalReward, trapCost, costOfNoMovement)
+		compiledRewardTable = getRewardTable.getCompiledRewards(goalReward, trapCost, costOfNoMovement).rewardTable
+		for state in self.transitionTable.keys():
+			self.assertEqual(compiledRewardTable[state], rewardTable[state])
 	
 	def tearDown(self):
 		pass
@@ -184,11 +248,92 @@ class TestRewardSetup_WeakStrongAgents(unittest.TestCase):
 		stateActionReward = rewardTable[jointState][jointAction][nextState]
 
 		self.assertAlmostEqual(stateActionReward, expectedResult)
+
+	@data((1,1), (5.5,1), (1,0.25), (.7,7))
+	def test_CompiledRewardsMatchRewardTable(self, agentAbilities):
+		getRewardTable = targetCode.SetupRewardTable2AgentWeakStrong(self.transitionTable, [self.goalState], [self.trapState])
+		rewardTable = getRewardTable(agentAbilities)
+		compiledRewardTable = getRewardTable.getCompiledRewards(agentAbilities).rewardTable
+		for state in self.transitionTable.keys():
+			self.assertEqual(compiledRewardTable[state], rewardTable[state])
 	
 	def tearDown(self):
 		pass
 
 
  
+@ddt
+class TestSlipperyTransitionByStateSet2Agent(unittest.TestCase):
+	def setUp(self): 
+		self.cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		self.stateSet = list(itertools.product(range(3), range(3)))
+		self.goalState = (2,2)
+		self.barrierList = [((0,0), (0,1)), ((0,1), (0,0))]
+
+	def getComposedTable(self, slipperySetup):
+		# reference: every intended joint action as the kernel weighted sum of the deterministic outcomes of the executed ones
+		deterministicSetup = targetCode.SetupDeterministicTransitionByStateSet2Agent(self.stateSet, self.cardinalActionSet, self.goalState, 
+			self.barrierList)
+		jointActions = deterministicSetup.jointActionSet
+		composedTable = {}
+		for state in deterministicSetup.jointStateSet:
+			composedTable[state] = {}
+			for intended, intendedAction in enumerate(jointActions):
+				distribution = {}
+				for executed, executedAction in enumerate(jointActions):
+					weight = slipperySetup.slipKernels[0][intended // 5, executed // 5]*slipperySetup.slipKernels[1][intended % 5, executed % 5]
+					if weight == 0:
+						continue
+					for nextState, probability in deterministicSetup.getStateActionTransition(state, executedAction).items():
+						distribution[nextState] = distribution.get(nextState, 0) + weight*probability
+				composedTable[state][intendedAction] = distribution
+		return(composedTable)
+
+	@data(.8, (.9, .6), 1.0)
+	def test_MatchesComposedDeterministicTable(self, successProbability):
+		slipperySetup = targetCode.SetupSlipperyTransitionByStateSet2Agent(self.stateSet, self.cardinalActionSet, self.goalState, 
+			successProbability, self.barrierList, statesPerBlock=7)
+		transitionTable = slipperySetup()
+		composedTable = self.getComposedTable(slipperySetup)
+		self.assertEqual(set(transitionTable.keys()), set(composedTable.keys()))
+		for state, actionDict in composedTable.items():
+			for action, distribution in actionDict.items():
+				# merged: one entry per distinct successor
+				self.assertEqual(set(transitionTable[state][action].keys()), set(distribution.keys()))
+				for nextState, probability in distribution.items():
+					self.assertAlmostEqual(transitionTable[state][action][nextState], probability)
+
+	def test_CertainMovesAreDeterministic(self):
+		slipperyTable = targetCode.SetupSlipperyTransitionByStateSet2Agent(self.stateSet, self.cardinalActionSet, self.goalState, 1.0)()
+		deterministicTable = targetCode.SetupDeterministicTransitionByStateSet2Agent(self.stateSet, self.cardinalActionSet, self.goalState)()
+		self.assertEqual(slipperyTable, deterministicTable)
+
+	# agent 1 slipping left or down off the board stays at (0,0), the null action never slips
+	@data((((0,0), (2,0)), ((1,0), (0,0)), {((1,0), (2,0)): .8, ((0,1), (2,0)): .2/3, ((0,0), (2,0)): .4/3}),
+		(((0,0), (2,0)), ((0,0), (0,0)), {((0,0), (2,0)): 1.0}),
+		(((2,2), (0,0)), ((1,0), (0,1)), {'terminal': 1.0}))
+	@unpack
+	def test_SlipExamples(self, state, action, expectedDistribution):
+		transitionTable = targetCode.SetupSlipperyTransitionByStateSet2Agent(self.stateSet, self.cardinalActionSet, self.goalState, .8)()
+		self.assertEqual(set(transitionTable[state][action].keys()), set(expectedDistribution.keys()))
+		for nextState, probability in expectedDistribution.items():
+			self.assertAlmostEqual(transitionTable[state][action][nextState], probability)
+
+	def test_CompiledRowsAndRewards(self):
+		slipperySetup = targetCode.SetupSlipperyTransitionByStateSet2Agent(self.stateSet, self.cardinalActionSet, self.goalState, .7, 
+			startStates=[((0,0), (1,0))])
+		compiledTransitions = slipperySetup.getCompiledTransitions()
+		rowSums = np.bincount(compiledTransitions.getRowOfEntries(), weights=compiledTransitions.probabilities)
+		self.assertTrue(np.allclose(rowSums, 1))
+		compiledMDP = targetCode.SetupRewardTable2AgentDistanceCost(compiledTransitions, [self.goalState], [(1,1)]).getCompiledRewards(10, -100, .1)
+		rewardTable = targetCode.SetupRewardTable2AgentDistanceCost(slipperySetup(), [self.goalState], [(1,1)])(10, -100, .1)
+		for state in [((0,0), (1,0)), ((2,1), (0,2))]:
+			for action in [((1,0), (0,1)), ((0,0), (0,0))]:
+				for nextState, reward in rewardTable[state][action].items():
+					self.assertAlmostEqual(compiledMDP.rewardTable[state][action][nextState], reward)
+
+	def tearDown(self):
+		pass
+
 if __name__ == '__main__':
 	unittest.main(verbosity=2)
\ No newline at end of file
@@ -0,0 +1,140 @@
+import sys
+sys.path.append('../src/')
+
+import unittest
+from ddt import ddt, data, unpack
+import grosseJointPlanner as plannerCode
+import ValueIteration as solverCode
+import mdpCache as targetCode
+import itertools
+import os
+import time
+import shutil
+import tempfile
+import numpy as np
+
+@ddt
+class TestSolveJointMDPWithCache(unittest.TestCase):
+	def setUp(self): 
+		self.cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		self.stateSet = list(itertools.product(range(4), range(4)))
+		self.goalState = (3,3)
+		self.trapStates = [(0,0)]
+		self.cacheDirectory = tempfile.mkdtemp()
+
+	def getSolver(self, cache, gamma = .95, beta = 2):
+		return(targetCode.SolveJointMDPWithCache(cache, self.stateSet, self.cardinalActionSet, self.goalState, self.trapStates, 
+			.000001, gamma, beta))
+
+	def test_MissThenHitMatchesDirectSolve(self):
+		transitionTable = plannerCode.SetupDeterministicTransitionByStateSet2Agent(self.stateSet, self.cardinalActionSet, self.goalState)()
+		rewardTable = plannerCode.SetupRewardTable2AgentDistanceCost(transitionTable, [self.goalState], self.trapStates)()
+		expectedValues, expectedPolicy = solverCode.BoltzmannValueIterationVectorized(transitionTable, rewardTable, None, .000001, .95, 2)()
+
+		cache = targetCode.MDPCache(self.cacheDirectory)
+		solveMiss = self.getSolver(cache)
+		missValues, missPolicy = solveMiss()
+		solveHit = self.getSolver(targetCode.MDPCache(self.cacheDirectory))
+		hitValues, hitPolicy = solveHit()
+
+		self.assertFalse(solveMiss.cacheHit)
+		self.assertTrue(solveHit.cacheHit)
+		for valueTable, policyTable in [(missValues, missPolicy), (hitValues, hitPolicy)]:
+			self.assertEqual(set(valueTable.keys()), set(expectedValues.keys()))
+			for state in expectedValues.keys():
+				self.assertAlmostEqual(valueTable[state], expectedValues[state], places=10)
+				for action, actionProb in expectedPolicy[state].items():
+					self.assertAlmostEqual(policyTable[state][action], actionProb, places=10)
+		self.assertEqual(solveHit.mdp.transitionTable[((0,1),(1,0))], transitionTable[((0,1),(1,0))])
+		self.assertEqual(solveHit.mdp.rewardTable[((0,1),(1,0))], rewardTable[((0,1),(1,0))])
+
+	# a hit maps the stored arrays read only and the transition matrix uses them without copying
+	def test_HitIsMemoryMapped(self):
+		self.getSolver(targetCode.MDPCache(self.cacheDirectory))(returnTables = False)
+		solveHit = self.getSolver(targetCode.MDPCache(self.cacheDirectory))
+		values, policies = solveHit(returnTables = False)
+		self.assertIsInstance(values, np.memmap)
+		self.assertFalse(values.flags.writeable)
+		self.assertIsInstance(solveHit.mdp.expectedRewards, np.memmap)
+		self.assertTrue(np.shares_memory(solveHit.mdp.transitionMatrix.indices, solveHit.mdp.nextStateIndices))
+		self.assertIsInstance(solveHit.mdp.nextStateIndices.base, np.memmap)
+
+	# a new beta reuses the stored MDP and stores only a new solution
+	def test_NewBetaReusesMDP(self):
+		cache = targetCode.MDPCache(self.cacheDirectory)
+		self.getSolver(cache, beta = 2)(returnTables = False)
+		solveNewBeta = self.getSolver(cache, beta = 5)
+		solveNewBeta(returnTables = False)
+		self.assertFalse(solveNewBeta.cacheHit)
+		self.assertEqual(len(os.listdir(self.cacheDirectory)), 3)
+
+	@data('size', 'age')
+	def test_Eviction(self, evictBy):
+		cache = targetCode.MDPCache(self.cacheDirectory)
+		cache.saveArrays('old', values=np.zeros(1000))
+		os.utime(os.path.join(self.cacheDirectory, 'old'), (time.time() - 100, time.time() - 100))
+		cache.saveArrays('new', values=np.zeros(1000))
+		if evictBy == 'size':
+			cache.maxBytes = 9000
+		else:
+			cache.maxAge = 50
+		cache.saveArrays('newest', values=np.zeros(10))
+		self.assertFalse(cache.contains('old'))
+		self.assertTrue(cache.contains('new'))
+		self.assertTrue(cache.contains('newest'))
+
+	# an entry removed by another worker between contains and loading is a miss and is rebuilt
+	def test_EntryRemovedBeforeLoadIsRebuilt(self):
+		expectedValues, expectedPolicies = self.getSolver(targetCode.MDPCache(self.cacheDirectory))(returnTables = False)
+		cache = targetCode.MDPCache(self.cacheDirectory)
+		containsEntry = cache.contains
+		def containsThenRemove(key):
+			found = containsEntry(key)
+			shutil.rmtree(cache.getEntryDirectory(key), ignore_errors=True)
+			return(found)
+		cache.contains = containsThenRemove
+		self.assertIsNone(cache.loadArrays('missing'))
+		solveRemoved = self.getSolver(cache)
+		values, policies = solveRemoved(returnTables = False)
+		self.assertFalse(solveRemoved.cacheHit)
+		self.assertTrue(np.allclose(values, expectedValues))
+		self.assertTrue(np.allclose(policies, expectedPolicies))
+
+	# the entry just saved survives eviction even if it alone is over maxBytes
+	def test_EvictionKeepsSavedEntry(self):
+		cache = targetCode.MDPCache(self.cacheDirectory, maxBytes = 1000)
+		self.getSolver(cache)(returnTables = False)
+		entries = os.listdir(self.cacheDirectory)
+		self.assertEqual(len(entries), 1)
+		self.assertIn('values', cache.loadArrays(entries[0]))
+
+	# small tables are stored with int32 indices, the loaded transitions are unchanged
+	def test_SavedIndexType(self):
+		cache = targetCode.MDPCache(self.cacheDirectory)
+		compiledMDP = plannerCode.SetupDeterministicTransitionByStateSet2Agent(self.stateSet, self.cardinalActionSet, 
+			self.goalState).getCompiledTransitions()
+		cache.saveMDP('mdp', compiledMDP)
+		arrays = cache.loadArrays('mdp')
+		self.assertEqual(arrays['nextStateIndices'].dtype, np.int32)
+		self.assertTrue(np.array_equal(arrays['nextStateIndices'], compiledMDP.nextStateIndices))
+		self.assertTrue(np.array_equal(arrays['rowPointer'], compiledMDP.rowPointer))
+
+	def test_ReadOnlyLoadIgnoresTimestampErrors(self):
+		cache = targetCode.MDPCache(self.cacheDirectory)
+		cache.saveArrays('entry', values=np.arange(3.0))
+		utime = os.utime
+		def failingUtime(*arguments, **keywords):
+			raise PermissionError('read only')
+		os.utime = failingUtime
+		try:
+			arrays = cache.loadArrays('entry')
+		finally:
+			os.utime = utime
+		self.assertTrue(np.array_equal(arrays['values'], np.arange(3.0)))
+
+	def tearDown(self):
+		shutil.rmtree(self.cacheDirectory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+	unittest.main(verbosity=2)
@@ -0,0 +1,105 @@
+import sys
+sys.path.append('../src/')
+
+import unittest
+from ddt import ddt, data, unpack
+import grosseJointPlanner as plannerCode
+import ValueIteration as solverCode
+import nAgentJointPlanner as targetCode
+import itertools
+
+@ddt
+class TestSetupLazyTransitionTableNAgent(unittest.TestCase):
+	def setUp(self): 
+		self.cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		self.stateSet3x3 = list(itertools.product(range(3), range(3)))
+		self.goalState = (2,2)
+
+	# two agents must give exactly the table of the two agent setup, successor order included
+	@data([], [((1,1),(1,2)), ((0,0),(1,0)), ((2,1),(2,0))])
+	def test_TwoAgentsMatchTwoAgentSetup(self, barrierList):
+		expectedTable = plannerCode.SetupDeterministicTransitionByStateSet2Agent(self.stateSet3x3, self.cardinalActionSet, self.goalState, barrierList)()
+		lazyTable = targetCode.SetupLazyTransitionTableNAgent(self.stateSet3x3, self.cardinalActionSet, self.goalState, 2, barrierList)()
+		self.assertEqual(len(lazyTable), len(expectedTable))
+		self.assertEqual(list(lazyTable.keys()), list(expectedTable.keys()))
+		for state in expectedTable.keys():
+			self.assertEqual(list(lazyTable[state].items()), list(expectedTable[state].items()))
+
+	@data(
+		# two agents contest (1,1), the third is unaffected
+		((((0,1),(1,0),(0,2)), ((1,0),(0,1),(0,0))), {((1,1),(1,0),(0,2)):.5, ((0,1),(1,1),(0,2)):.5}),
+		# agent 3 stays, agent 2 is stopped moving into it, which stops agent 1 moving into agent 2's cell
+		((((0,0),(0,1),(0,2)), ((0,1),(0,1),(0,0))), {((0,0),(0,1),(0,2)):1.0}),
+		# a chain moving forward into cells being vacated all moves
+		((((0,0),(0,1),(0,2)), ((1,0),(0,-1),(0,-1))), {((1,0),(0,0),(0,1)):1.0}),
+		# three agents contest one cell
+		((((0,1),(1,0),(1,2)), ((1,0),(0,1),(0,-1))), {((1,1),(1,0),(1,2)):1/3, ((0,1),(1,1),(1,2)):1/3, ((0,1),(1,0),(1,1)):1/3}),
+		# the loser of the contest for (1,1) stops agent 3 moving into its cell
+		((((0,1),(1,0),(0,0)), ((1,0),(0,1),(0,1))), {((1,1),(1,0),(0,1)):.5, ((0,1),(1,1),(0,0)):.5}),
+		# an agent on the goal ends the episode
+		((((2,2),(1,0),(0,0)), ((0,0),(0,0),(0,0))), {'terminal':1.0}))
+	@unpack
+	def test_ThreeAgentCollisions(self, stateAction, expectedDistribution):
+		lazyTable = targetCode.SetupLazyTransitionTableNAgent(self.stateSet3x3, self.cardinalActionSet, self.goalState, 3)()
+		state, action = stateAction
+		distribution = lazyTable[state][action]
+		self.assertEqual(set(distribution.keys()), set(expectedDistribution.keys()))
+		for nextState, probability in expectedDistribution.items():
+			self.assertAlmostEqual(distribution[nextState], probability)
+
+	def test_ThreeAgentTableIsValid(self):
+		lazyTable = targetCode.SetupLazyTransitionTableNAgent(self.stateSet3x3, self.cardinalActionSet, self.goalState, 3, cacheSize=10)()
+		self.assertEqual(len(lazyTable), 9*8*7 + 1)
+		self.assertEqual(len(lazyTable[((0,0),(0,1),(0,2))]), 125)
+		for state in itertools.islice(lazyTable.keys(), 0, None, 37):
+			for action, distribution in lazyTable[state].items():
+				self.assertAlmostEqual(sum(distribution.values()), 1.0)
+				for nextState in distribution.keys():
+					self.assertIn(nextState, lazyTable)
+		self.assertLessEqual(len(lazyTable.cache), 10)
+		self.assertNotIn(((0,0),(0,0),(0,2)), lazyTable)
+		self.assertNotIn(((0,0),(0,1)), lazyTable)
+
+	def tearDown(self):
+		pass
+
+
+@ddt
+class TestSetupRewardTableNAgent(unittest.TestCase):
+	def setUp(self): 
+		self.cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		self.goalState = (2,2)
+		self.trapStates = [(0,0)]
+
+	@data((1,1), (2,.5))
+	def test_TwoAgentsMatchWeakStrong(self, agentAbilities):
+		stateSet3x3 = list(itertools.product(range(3), range(3)))
+		transitionTable = plannerCode.SetupDeterministicTransitionByStateSet2Agent(stateSet3x3, self.cardinalActionSet, self.goalState)()
+		expectedRewards = plannerCode.SetupRewardTable2AgentWeakStrong(transitionTable, [self.goalState], self.trapStates)(agentAbilities)
+		lazyTransitionTable = targetCode.SetupLazyTransitionTableNAgent(stateSet3x3, self.cardinalActionSet, self.goalState, 2)()
+		lazyRewards = targetCode.SetupRewardTableNAgent(lazyTransitionTable, [self.goalState], self.trapStates)(agentAbilities)
+		for state in transitionTable.keys():
+			for action, nextStateRewards in expectedRewards[state].items():
+				for nextState, reward in nextStateRewards.items():
+					self.assertAlmostEqual(lazyRewards[state][action][nextState], reward)
+
+	# the lazy tables feed the dictionary solver directly and the compiled solver through SetupCompiledMDP
+	def test_ThreeAgentSolvers(self):
+		stateSet2x3 = list(itertools.product(range(2), range(3)))
+		goalState = (1,2)
+		lazyTransitionTable = targetCode.SetupLazyTransitionTableNAgent(stateSet2x3, self.cardinalActionSet, goalState, 3)()
+		lazyRewards = targetCode.SetupRewardTableNAgent(lazyTransitionTable, [goalState], self.trapStates)((1,1,1))
+		values, policy = solverCode.BoltzmannValueIteration(lazyTransitionTable, lazyRewards, 
+			{state:0 for state in lazyTransitionTable.keys()}, .0001, .9, 2)()
+		vectorizedValues, vectorizedPolicy = solverCode.BoltzmannValueIterationVectorized(lazyTransitionTable, lazyRewards, 
+			None, .0001, .9, 2)()
+		self.assertEqual(len(values), 6*5*4 + 1)
+		for state in lazyTransitionTable.keys():
+			self.assertAlmostEqual(values[state], vectorizedValues[state], places=2)
+
+	def tearDown(self):
+		pass
+
+
+if __name__ == '__main__':
+	unittest.main(verbosity=2)
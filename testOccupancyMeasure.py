@@ -0,0 +1,93 @@
+import sys
+sys.path.append('../src/')
+
+import unittest
+from ddt import ddt, data, unpack
+import grosseJointPlanner as plannerCode
+import ValueIteration as solverCode
+import trajectorySampling as samplingCode
+import visualizations as visualizationCode
+import occupancyMeasure as targetCode
+import itertools
+import numpy as np
+
+@ddt
+class TestGetOccupancyMeasure(unittest.TestCase):
+	def setUp(self): 
+		self.cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		self.stateSet = list(itertools.product(range(3), range(3)))
+		self.goalState = (2,2)
+		compiledTransitions = plannerCode.SetupDeterministicTransitionByStateSet2Agent(self.stateSet, self.cardinalActionSet, 
+			self.goalState).getCompiledTransitions()
+		self.mdp = plannerCode.SetupRewardTable2AgentDistanceCost(compiledTransitions, [self.goalState], [(1,1)]).getCompiledRewards(10, -100, .1)
+		valueTable, self.policyTable = solverCode.BoltzmannValueIterationVectorized(self.mdp, None, None, .000001, .95, 1)()
+		self.start = {((0,0),(2,0)): .5, ((0,2),(0,0)): .5}
+
+	# the direct solve is the limit of the propagated expected counts
+	@data(.9, 1)
+	def test_SolveMatchesPropagation(self, gamma):
+		getOccupancy = targetCode.GetOccupancyMeasure(self.mdp, self.policyTable)
+		occupancyTable = getOccupancy(self.start, gamma, convergenceTolerance=None)
+		solved = getOccupancy.occupancies
+		self.assertAlmostEqual(occupancyTable[((0,0),(2,0))], solved[self.mdp.stateIndex[((0,0),(2,0))]])
+		getOccupancy(self.start, gamma)
+		self.assertTrue(np.allclose(solved, getOccupancy.occupancies, atol=1e-8))
+		getOccupancy(self.start, gamma, maxSteps=3000)
+		self.assertTrue(np.allclose(solved, getOccupancy.occupancies, atol=1e-8))
+
+	def test_MaxStepsCountsTruncatedTrajectories(self):
+		getOccupancy = targetCode.GetOccupancyMeasure(self.mdp, self.policyTable)
+		occupancyTable = getOccupancy(self.start, 1, maxSteps=2)
+		self.assertAlmostEqual(sum(occupancyTable.values()), 3)
+
+	# undiscounted, every trajectory ends in 'terminal' exactly once and visits sum to the expected number of states
+	def test_UndiscountedVisitsMatchSampledTrajectories(self):
+		getOccupancy = targetCode.GetOccupancyMeasure(self.mdp, self.policyTable)
+		occupancyTable = getOccupancy(self.start)
+		self.assertAlmostEqual(occupancyTable['terminal'], 1)
+
+		sampleTrajectories = samplingCode.SampleTrajectoryBatches(self.mdp, self.policyTable, maxSteps=500)
+		sampledLengths = [lengths for stateIndices, actionIndices, lengths in 
+			sampleTrajectories(list(self.start.keys()), 20000, 10000, seed=3)]
+		self.assertAlmostEqual(sum(occupancyTable.values()), np.mean(np.concatenate(sampledLengths)) + 1, delta=.1)
+
+	def test_StartInStopState(self):
+		getOccupancy = targetCode.GetOccupancyMeasure(self.mdp, self.policyTable, stopStates=[((0,0),(2,0))])
+		occupancyTable = getOccupancy({((0,0),(2,0)): 1.0}, .9)
+		self.assertEqual(occupancyTable[((0,0),(2,0))], 1)
+		self.assertEqual(sum(occupancyTable.values()), 1)
+
+	def test_NeverStoppingChainRaises(self):
+		# 'terminal' is not a stop state here, so undiscounted visits are unbounded
+		getOccupancy = targetCode.GetOccupancyMeasure(self.mdp, self.policyTable, stopStates=[])
+		with self.assertRaises(ValueError):
+			getOccupancy(self.start)
+		with self.assertRaises(ValueError):
+			getOccupancy(self.start, convergenceTolerance=None)
+		occupancyTable = getOccupancy(self.start, .5)
+		self.assertAlmostEqual(sum(occupancyTable.values()), 2)
+
+	def test_AgentCellOccupancies(self):
+		getOccupancy = targetCode.GetOccupancyMeasure(self.mdp, self.policyTable)
+		occupancyTable = getOccupancy(self.start, .9)
+		agentOccupancies = getOccupancy.getAgentCellOccupancies()
+		self.assertEqual(len(agentOccupancies), 2)
+		jointVisits = sum(visits for state, visits in occupancyTable.items() if state != 'terminal')
+		for agent, cellOccupancies in enumerate(agentOccupancies):
+			self.assertAlmostEqual(sum(cellOccupancies.values()), jointVisits)
+			self.assertAlmostEqual(cellOccupancies[(0,0)], sum(visits for state, visits in occupancyTable.items() 
+				if state != 'terminal' and state[agent] == (0,0)))
+		figure = visualizationCode.visualizeAgentOccupancies(3, 3, agentOccupancies, [self.goalState], savePath=[])
+		self.assertEqual(len(figure.axes), 4)
+
+	def test_PolicyArray(self):
+		policies = np.array([[self.policyTable[state][action] for action in self.mdp.actions] for state in self.mdp.states])
+		fromTable = targetCode.GetOccupancyMeasure(self.mdp, self.policyTable)(self.start, .9)
+		fromArray = targetCode.GetOccupancyMeasure(self.mdp, policies)(self.start, .9)
+		self.assertEqual(fromTable, fromArray)
+
+	def tearDown(self):
+		pass
+
+if __name__ == '__main__':
+	unittest.main(verbosity=2)
@@ -0,0 +1,99 @@
+import sys
+sys.path.append('../src/')
+
+import unittest
+from ddt import ddt, data, unpack
+import grosseJointPlanner as plannerCode
+import ValueIteration as solverCode
+import parallelValueIteration as targetCode
+import itertools
+import numpy as np
+
+@ddt
+class TestBoltzmannValueIterationParallel(unittest.TestCase):
+	def setUp(self): 
+		self.cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		self.stateSet = list(itertools.product(range(5), range(5)))
+		self.goalState = (3,3)
+		self.trapStates = [(2,1)]
+		compiledTransitions = plannerCode.SetupDeterministicTransitionByStateSet2Agent(self.stateSet, self.cardinalActionSet, 
+			self.goalState).getCompiledTransitions()
+		self.mdp = plannerCode.SetupRewardTable2AgentDistanceCost(compiledTransitions, [self.goalState], self.trapStates).getCompiledRewards(10, -100, .1)
+		self.serialSolver = solverCode.BoltzmannValueIterationVectorized(self.mdp, None, None, .000001, .95, 2)
+		self.serialValues, self.serialPolicy = self.serialSolver()
+
+	# Jacobi sweeps are the serial sweeps, however the states are split
+	@data((1, None), (2, None), (2, 7), (3, 1))
+	@unpack
+	def test_JacobiMatchesSerialSolver(self, numberOfProcesses, numberOfBlocks):
+		parallelSolver = targetCode.BoltzmannValueIterationParallel(self.mdp, None, None, .000001, .95, 2, 
+			numberOfProcesses=numberOfProcesses, numberOfBlocks=numberOfBlocks)
+		valueTable, policyTable = parallelSolver()
+		self.assertEqual(parallelSolver.numberOfSweeps, self.serialSolver.numberOfSweeps)
+		self.assertTrue(np.allclose(parallelSolver.values, self.serialSolver.values, rtol=0, atol=1e-12))
+		for action, actionProb in self.serialPolicy[((0,0),(4,4))].items():
+			self.assertAlmostEqual(policyTable[((0,0),(4,4))][action], actionProb, places=10)
+
+	def test_GaussSeidelMatchesWithinTolerance(self):
+		parallelSolver = targetCode.BoltzmannValueIterationParallel(self.mdp, None, None, .000001, .95, 2, numberOfProcesses=2, gaussSeidel=True)
+		parallelSolver()
+		errorBound = 2*.95*.000001/(1 - .95)
+		self.assertLessEqual(np.abs(parallelSolver.values - self.serialSolver.values).max(), errorBound)
+		self.assertLessEqual(parallelSolver.numberOfSweeps, self.serialSolver.numberOfSweeps)
+
+	def test_StartsFromValueTableAndReportsRun(self):
+		parallelSolver = targetCode.BoltzmannValueIterationParallel(self.mdp, None, dict(self.serialValues), .000001, .95, 2, 
+			numberOfProcesses=2, maxIterations=5)
+		parallelSolver()
+		self.assertEqual(parallelSolver.numberOfSweeps, 1)
+		self.assertEqual(parallelSolver.runReport['stopReason'], 'converged')
+
+	def test_MaxIterations(self):
+		parallelSolver = targetCode.BoltzmannValueIterationParallel(self.mdp, None, None, .000001, .95, 2, numberOfProcesses=2, maxIterations=5)
+		parallelSolver()
+		self.assertEqual(parallelSolver.numberOfSweeps, 5)
+		self.assertEqual(parallelSolver.runReport['stopReason'], 'maxIterations')
+
+	def test_SharedArraysRoundTrip(self):
+		sharedArrays = targetCode.SharedArrays({'a': np.arange(6).reshape(2, 3), 'b': np.array([], dtype=float)})
+		try:
+			self.assertTrue((sharedArrays.arrays['a'] == np.arange(6).reshape(2, 3)).all())
+			self.assertEqual(sharedArrays.getDescriptions()['a'][1:], ((2, 3), np.arange(6).dtype.str))
+		finally:
+			sharedArrays.release()
+		self.assertEqual(sharedArrays.arrays, {})
+
+	# blocks hold whole agent 1 cells, whatever the number of blocks asked for
+	@data(1, 3, 7, 1000)
+	def test_BlocksAreRunsOfAgent1Cells(self, numberOfBlocks):
+		parallelSolver = targetCode.BoltzmannValueIterationParallel(self.mdp, None, None, .000001, .95, 2, numberOfProcesses=1, 
+			numberOfBlocks=numberOfBlocks)
+		parallelSolver.mdp = self.mdp
+		blocks = parallelSolver.getBlocks()
+		cells, stateCells = self.mdp.getStateCells()
+		agent1Cells = [set(stateCells[firstState:lastState, 0].tolist()) for firstState, lastState in blocks]
+		self.assertEqual(blocks[0][0], 0)
+		self.assertEqual(blocks[-1][1], self.mdp.numberOfStates)
+		self.assertLessEqual(len(blocks), numberOfBlocks)
+		if numberOfBlocks >= len(cells) + 1:
+			self.assertEqual(len(blocks), len(cells) + 1)
+		for blockCells, otherBlockCells in itertools.combinations(agent1Cells, 2):
+			self.assertFalse(blockCells & otherBlockCells)
+
+	def test_WorkerArraysAreClosed(self):
+		sharedArrays = targetCode.SharedArrays({'a': np.arange(6.0)})
+		try:
+			targetCode.attachWorkerArrays(sharedArrays.getDescriptions(), 1, .95)
+			memoryBlocks = targetCode.workerState['memoryBlocks']
+			self.assertEqual(targetCode.workerState['arrays']['a'][5], 5.0)
+			targetCode.closeWorkerArrays()
+			self.assertEqual(targetCode.workerState['memoryBlocks'], [])
+			self.assertTrue(all(memoryBlock.buf is None for memoryBlock in memoryBlocks))
+		finally:
+			sharedArrays.release()
+
+	def tearDown(self):
+		pass
+
+if __name__ == '__main__':
+	unittest.main(verbosity=2)
@@ -0,0 +1,108 @@
+import sys
+sys.path.append('../src/')
+
+import unittest
+from ddt import ddt, data, unpack
+import grosseJointPlanner as plannerCode
+import nAgentJointPlanner as lazyPlannerCode
+import ValueIteration as solverCode
+import realTimePlanner as targetCode
+import itertools
+
+@ddt
+class TestLabeledRTDPBoltzmannPlanner(unittest.TestCase):
+	def setUp(self):
+		self.cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		self.stateSet = list(itertools.product(range(5), range(5)))
+		self.goalState = (4,4)
+		self.trapStates = [(2,2)]
+		self.convergenceTolerance = .000001
+		self.beta = 2
+
+	def getTables(self):
+		transitionTable = plannerCode.SetupDeterministicTransitionByStateSet2Agent(self.stateSet, self.cardinalActionSet, self.goalState)()
+		rewardTable = plannerCode.SetupRewardTable2AgentDistanceCost(transitionTable, [self.goalState], self.trapStates)()
+		return(transitionTable, rewardTable)
+
+	def getPlanner(self, transitionTable, rewardTable, gamma, seed = 1):
+		heuristic = targetCode.GoalDistanceHeuristic([self.goalState], 10, 2*.1, gamma, 1 + .1)
+		return(targetCode.LabeledRTDPBoltzmannPlanner(transitionTable, rewardTable, heuristic, self.convergenceTolerance, gamma, self.beta, seed=seed))
+
+	@data((.9, None), (.95, 1 + .1), (.99, 1 + .1))
+	@unpack
+	def test_HeuristicIsAdmissible(self, gamma, minimumMoveCost):
+		transitionTable, rewardTable = self.getTables()
+		valueTable, policyTable = solverCode.BoltzmannValueIteration(transitionTable, rewardTable, {state: 0 for state in transitionTable}, self.convergenceTolerance, gamma, self.beta)()
+		heuristic = targetCode.GoalDistanceHeuristic([self.goalState], 10, 2*.1, gamma, minimumMoveCost)
+		for state, value in valueTable.items():
+			self.assertGreaterEqual(heuristic(state), value - 1e-4)
+
+	@data((((0,0),(0,1)), .9), (((1,0),(3,2)), .95), (((0,4),(4,0)), .95), (((0,0),(1,0)), .99))
+	@unpack
+	def test_MatchesFullValueIterationAtStartState(self, startState, gamma):
+		transitionTable, rewardTable = self.getTables()
+		valueTable, policyTable = solverCode.BoltzmannValueIteration(transitionTable, rewardTable, {state: 0 for state in transitionTable}, self.convergenceTolerance, gamma, self.beta)()
+		planner = self.getPlanner(transitionTable, rewardTable, gamma)
+		actionDistribution = planner(startState)
+
+		self.assertTrue(planner.isStartSolved)
+		self.assertIn(startState, planner.solvedStates)
+		self.assertAlmostEqual(planner.valueTable[startState], valueTable[startState], places=3)
+		for action, probability in policyTable[startState].items():
+			self.assertAlmostEqual(actionDistribution[action], probability, places=3)
+
+	def test_LazyTablesGiveTheSameDistribution(self):
+		startState = ((0,0),(2,4))
+		transitionTable, rewardTable = self.getTables()
+		expectedDistribution = self.getPlanner(transitionTable, rewardTable, .95)(startState)
+
+		lazyTransitionTable = lazyPlannerCode.SetupLazyTransitionTableNAgent(self.stateSet, self.cardinalActionSet, self.goalState, 2)()
+		lazyRewardTable = lazyPlannerCode.SetupRewardTableNAgent(lazyTransitionTable, [self.goalState], self.trapStates)((1, 1))
+		actionDistribution = self.getPlanner(lazyTransitionTable, lazyRewardTable, .95)(startState)
+		for action, probability in expectedDistribution.items():
+			self.assertAlmostEqual(actionDistribution[action], probability, places=6)
+
+	def test_LazyTablesExpandOnlyPartOfALargeBoard(self):
+		stateSet = list(itertools.product(range(12), range(12)))
+		lazyTransitionTable = lazyPlannerCode.SetupLazyTransitionTableNAgent(stateSet, self.cardinalActionSet, (10,10), 2)()
+		lazyRewardTable = lazyPlannerCode.SetupRewardTableNAgent(lazyTransitionTable, [(10,10)], [])((1, 1))
+		heuristic = targetCode.GoalDistanceHeuristic([(10,10)], 10, 2*.1, .95, 1 + .1)
+		planner = targetCode.LabeledRTDPBoltzmannPlanner(lazyTransitionTable, lazyRewardTable, heuristic, self.convergenceTolerance, .95, self.beta, seed=1)
+		actionDistribution = planner(((7,7),(3,3)))
+		self.assertTrue(planner.isStartSolved)
+		self.assertLess(len(planner.valueTable), len(lazyTransitionTable)/10)
+		# agent 1 is 6 steps from the goal, moving towards it is most likely
+		mostLikelyAction = max(actionDistribution, key=actionDistribution.get)
+		self.assertIn(mostLikelyAction[0], [(1,0), (0,1)])
+
+	def test_AnytimeCallsContinueToTheSameResult(self):
+		startState = ((0,0),(0,1))
+		transitionTable, rewardTable = self.getTables()
+		planner = self.getPlanner(transitionTable, rewardTable, .95)
+		partialDistribution = planner(startState, maxTrials=1)
+		self.assertFalse(planner.isStartSolved)
+		self.assertEqual(planner.numberOfTrials, 1)
+		self.assertAlmostEqual(sum(partialDistribution.values()), 1.0)
+
+		while not planner.isStartSolved:
+			actionDistribution = planner(startState, maxTrials=5)
+		expectedDistribution = self.getPlanner(transitionTable, rewardTable, .95)(startState)
+		for action, probability in expectedDistribution.items():
+			self.assertAlmostEqual(actionDistribution[action], probability, places=4)
+
+	def test_ZeroTimeBudgetReturnsHeuristicDistribution(self):
+		startState = ((0,0),(0,1))
+		transitionTable, rewardTable = self.getTables()
+		planner = self.getPlanner(transitionTable, rewardTable, .95)
+		self.assertFalse(planner.isStartSolved)
+		actionDistribution = planner(startState, timeBudget=0)
+		self.assertEqual(planner.numberOfTrials, 0)
+		self.assertFalse(planner.isStartSolved)
+		self.assertEqual(set(actionDistribution.keys()), set(transitionTable[startState].keys()))
+		self.assertAlmostEqual(sum(actionDistribution.values()), 1.0)
+
+	def tearDown(self):
+		pass
+
+if __name__ == '__main__':
+	unittest.main(verbosity=2)
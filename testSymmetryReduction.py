@@ -0,0 +1,55 @@
+import sys
+sys.path.append('../src/')
+
+import unittest
+from ddt import ddt, data, unpack
+import grosseJointPlanner as plannerCode
+import ValueIteration as solverCode
+import symmetryReduction as targetCode
+import itertools
+
+@ddt
+class TestSymmetryReducedValueIteration(unittest.TestCase):
+	def setUp(self): 
+		self.cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		gridWidth = 4
+		gridHeight = 4
+		self.goalState = (3,3)
+		self.stateSet4x4 = list(itertools.product(range(gridWidth), range(gridHeight)))
+		getTransitionTable = plannerCode.SetupDeterministicTransitionByStateSet2Agent(self.stateSet4x4, self.cardinalActionSet, self.goalState)
+		self.transitionTable = getTransitionTable()
+		self.convergence = .000001
+		self.gamma = .95
+		self.beta = 2
+
+	# example 1: agent swap and the diagonal reflection through the goal and trap
+	# example 2: a trap off the diagonal leaves only the agent swap
+	# example 3: unequal abilities leave only the diagonal reflection
+	# example 4: an asymmetric layout with unequal abilities has no symmetry
+	@data(([(0,0)], (1,1), 4), 
+		([(0,1)], (1,1), 2),
+		([(0,0)], (1,2), 2),
+		([(0,1)], (1,2), 1))
+	@unpack
+	def test_MatchesFullSolve(self, trapStates, agentAbilities, expectedNumberOfSymmetries):
+		rewardTable = plannerCode.SetupRewardTable2AgentWeakStrong(self.transitionTable, [self.goalState], trapStates)(agentAbilities)
+		expectedValues, expectedPolicy = solverCode.BoltzmannValueIterationVectorized(self.transitionTable, rewardTable, 
+			None, self.convergence, self.gamma, self.beta)()
+		performReducedSolve = targetCode.SymmetryReducedBoltzmannValueIteration(self.transitionTable, rewardTable, 
+			None, self.convergence, self.gamma, self.beta)
+		values, policy = performReducedSolve()
+
+		self.assertEqual(len(performReducedSolve.symmetries), expectedNumberOfSymmetries)
+		self.assertLess(performReducedSolve.numberOfOrbits, len(self.transitionTable)/expectedNumberOfSymmetries + len(self.stateSet4x4))
+		self.assertEqual(list(values.keys()), list(self.transitionTable.keys()))
+		for state in self.transitionTable.keys():
+			self.assertAlmostEqual(values[state], expectedValues[state], places=5)
+			for action, actionProb in expectedPolicy[state].items():
+				self.assertAlmostEqual(policy[state][action], actionProb, places=5)
+
+	def tearDown(self):
+		pass
+
+
+if __name__ == '__main__':
+	unittest.main(verbosity=2)
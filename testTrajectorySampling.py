@@ -0,0 +1,81 @@
+import sys
+sys.path.append('../src/')
+
+import unittest
+from ddt import ddt, data, unpack
+import grosseJointPlanner as plannerCode
+import ValueIteration as solverCode
+import trajectorySampling as targetCode
+import itertools
+import numpy as np
+
+@ddt
+class TestSampleTrajectoryBatches(unittest.TestCase):
+	def setUp(self): 
+		self.cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		gridWidth = 4
+		gridHeight = 4
+		self.goalState = (3,3)
+		stateSet4x4 = list(itertools.product(range(gridWidth), range(gridHeight)))
+		getTransitionTable = plannerCode.SetupDeterministicTransitionByStateSet2Agent(stateSet4x4,self.cardinalActionSet, self.goalState)
+		self.transitionTable = getTransitionTable()
+		rewardTable = plannerCode.SetupRewardTable2AgentDistanceCost(self.transitionTable, [self.goalState], [(0,0)])()
+		valueTable, self.policyTable = solverCode.BoltzmannValueIterationVectorized(self.transitionTable, rewardTable, 
+			None, .000001, .95, 2)()
+
+	def test_SameSeedSameBatches(self):
+		sampleTrajectories = targetCode.SampleTrajectoryBatches(self.transitionTable, self.policyTable)
+		firstRun = list(sampleTrajectories([((0,1),(1,0))], 250, 100, seed=3))
+		secondRun = list(sampleTrajectories([((0,1),(1,0))], 250, 100, seed=3))
+		self.assertEqual([len(lengths) for states, actions, lengths in firstRun], [100, 100, 50])
+		for (states1, actions1, lengths1), (states2, actions2, lengths2) in zip(firstRun, secondRun):
+			self.assertTrue(np.array_equal(states1, states2))
+			self.assertTrue(np.array_equal(actions1, actions2))
+
+	# every step must be a transition with positive probability under a sampled action, ending at the stop state
+	@data(None, 'onGoal')
+	def test_TrajectoriesFollowTransitions(self, stopStates):
+		if stopStates == 'onGoal':
+			stopStates = [state for state in self.transitionTable.keys() if state != 'terminal' and self.goalState in state]
+		sampleTrajectories = targetCode.SampleTrajectoryBatches(self.transitionTable, self.policyTable, stopStates)
+		stateIndices, actionIndices, lengths = next(sampleTrajectories([((0,1),(1,0)), ((2,0),(0,2))], 200, 200, seed=0))
+		trajectories = sampleTrajectories.getTrajectories(stateIndices, lengths)
+		actions = sampleTrajectories.mdp.actions
+		for trajectory, trajectoryActions, length in zip(trajectories, actionIndices.tolist(), lengths.tolist()):
+			for step in range(length):
+				action = actions[trajectoryActions[step]]
+				self.assertGreater(self.transitionTable[trajectory[step]][action].get(trajectory[step+1], 0), 0)
+			if stopStates is None:
+				self.assertEqual(trajectory[-1], 'terminal')
+			else:
+				self.assertIn(trajectory[-1], stopStates)
+				self.assertNotIn(trajectory[-2], stopStates)
+
+	def test_CollisionOutcomesSplitEvenly(self):
+		collisionState = ((0,0),(0,2))
+		collisionAction = ((0,1),(0,-1))
+		policyTable = {state: {action: float(action == collisionAction) for action in self.getJointActions()} 
+			for state in self.transitionTable.keys()}
+		sampleTrajectories = targetCode.SampleTrajectoryBatches(self.transitionTable, policyTable, maxSteps=1)
+		stateIndices, actionIndices, lengths = next(sampleTrajectories([collisionState], 20000, 20000, seed=1))
+		nextStates = [sampleTrajectories.mdp.states[stateIndex] for stateIndex in stateIndices[:, 1]]
+		firstAgentMoved = sum(nextState == ((0,1),(0,2)) for nextState in nextStates)
+		secondAgentMoved = sum(nextState == ((0,0),(0,1)) for nextState in nextStates)
+		self.assertEqual(firstAgentMoved + secondAgentMoved, 20000)
+		self.assertAlmostEqual(firstAgentMoved/20000, .5, delta=.02)
+
+	def test_StartAtStopStateHasNoSteps(self):
+		sampleTrajectories = targetCode.SampleTrajectoryBatches(self.transitionTable, self.policyTable)
+		stateIndices, actionIndices, lengths = next(sampleTrajectories(['terminal'], 5, 5, seed=0))
+		self.assertTrue((lengths == 0).all())
+		self.assertEqual(sampleTrajectories.getTrajectories(stateIndices, lengths), [['terminal']]*5)
+
+	def getJointActions(self):
+		return(list(itertools.product(self.cardinalActionSet, self.cardinalActionSet)))
+
+	def tearDown(self):
+		pass
+
+
+if __name__ == '__main__':
+	unittest.main(verbosity=2)
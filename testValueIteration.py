@@ -0,0 +1,402 @@
+import sys
+sys.path.append('../src/')
+
+import unittest
+from ddt import ddt, data, unpack
+import grosseJointPlanner as plannerCode
+import ValueIteration as targetCode
+import itertools
+import numpy as np
+
+@ddt
+class TestBoltzmannValueIterationVectorized(unittest.TestCase):
+	def setUp(self): 
+		cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		gridWidth = 4
+		gridHeight = 4
+		self.goalState = (3,3)
+		self.trapState = (0,0)
+		stateSet4x4 = list(itertools.product(range(gridWidth), range(gridHeight)))
+		getTransitionTable = plannerCode.SetupDeterministicTransitionByStateSet2Agent(stateSet4x4,cardinalActionSet, self.goalState)
+		self.transitionTable = getTransitionTable()
+		getRewardTable = plannerCode.SetupRewardTable2AgentDistanceCost(self.transitionTable, [self.goalState], [self.trapState])
+		self.rewardTable = getRewardTable()
+		self.convergence = .000001
+		self.gamma = .95
+
+	# the synchronous vectorized sweeps must agree with the in-place dictionary sweeps within tolerance
+	@data(.5, 2, 50)
+	def test_MatchesDictionaryValueIteration(self, beta):
+		performValueIteration = targetCode.BoltzmannValueIteration(self.transitionTable, self.rewardTable, 
+			{state:0 for state in self.transitionTable.keys()}, self.convergence, self.gamma, beta)
+		expectedValues, expectedPolicy = performValueIteration()
+
+		performVectorized = targetCode.BoltzmannValueIterationVectorized(self.transitionTable, self.rewardTable, 
+			{state:0 for state in self.transitionTable.keys()}, self.convergence, self.gamma, beta)
+		values, policy = performVectorized()
+
+		self.assertEqual(list(values.keys()), list(expectedValues.keys()))
+		for state in self.transitionTable.keys():
+			self.assertAlmostEqual(values[state], expectedValues[state], places=4)
+			self.assertEqual(list(policy[state].keys()), list(expectedPolicy[state].keys()))
+			for action, actionProb in expectedPolicy[state].items():
+				self.assertAlmostEqual(policy[state][action], actionProb, places=3)
+
+	# policies for other betas from the cached Q-values match solving again with that beta
+	def test_PoliciesForManyBetas(self):
+		betas = [.1, 2, 500]
+		performVectorized = targetCode.BoltzmannValueIterationVectorized(self.transitionTable, self.rewardTable, 
+			None, self.convergence, self.gamma, 1)
+		performVectorized()
+		policyTables = performVectorized.getBoltzmannPoliciesForBetas(betas, returnTables=True)
+		self.assertEqual(performVectorized.getBoltzmannPoliciesForBetas(betas).shape, (len(betas),) + performVectorized.qValues.shape)
+
+		for beta, policyTable in zip(betas, policyTables):
+			expectedValues, expectedPolicy = targetCode.BoltzmannValueIterationVectorized(self.transitionTable, self.rewardTable, 
+				None, self.convergence, self.gamma, beta)()
+			for state in self.transitionTable.keys():
+				for action, actionProb in expectedPolicy[state].items():
+					self.assertAlmostEqual(policyTable[state][action], actionProb)
+
+	# exponents far above 700 must neither overflow nor be rescaled away
+	@data(1000, 1e6)
+	def test_LargeBetaPolicyIsStable(self, beta):
+		performValueIteration = targetCode.BoltzmannValueIteration(self.transitionTable, self.rewardTable, 
+			{state:0 for state in self.transitionTable.keys()}, self.convergence, self.gamma, beta)
+		values, policy = performValueIteration()
+		for state in self.transitionTable.keys():
+			self.assertFalse(any(np.isnan(actionProb) for actionProb in policy[state].values()))
+			self.assertAlmostEqual(sum(policy[state].values()), 1)
+			# all the probability is on the actions with the largest Q-value, the others are exp(-beta*gap) ~ 0
+			qValues = {action: performValueIteration.getQValue(state, action) for action in policy[state].keys()}
+			largestQValue = max(qValues.values())
+			bestActions = [action for action, qValue in qValues.items() if beta*(largestQValue - qValue) < 1e-6]
+			self.assertAlmostEqual(sum(policy[state][action] for action in bestActions), 1)
+			for action in bestActions:
+				self.assertAlmostEqual(policy[state][action], 1/len(bestActions), places=5)
+
+	# side by side value functions, with the mask holding masked states at 0, match their own solves
+	def test_BatchedValuesMatchSingleSolves(self):
+		performVectorized = targetCode.BoltzmannValueIterationVectorized(self.transitionTable, self.rewardTable, 
+			None, self.convergence, self.gamma, 2)
+		performVectorized()
+		mdp = performVectorized.mdp
+		expectedRewards = np.stack([mdp.expectedRewards, 2*mdp.expectedRewards], axis=2)
+		values, numberOfSweeps = targetCode.getBatchedValues(mdp, expectedRewards, np.zeros((mdp.numberOfStates, 2)), 
+			self.convergence, self.gamma, np.ones((mdp.numberOfStates, 2)))
+		self.assertGreaterEqual(numberOfSweeps, performVectorized.numberOfSweeps)
+		self.assertTrue(np.allclose(values[:, 0], performVectorized.values, atol=1e-5))
+		self.assertTrue(np.allclose(values[:, 1], 2*performVectorized.values, atol=1e-5))
+
+		policies = targetCode.getBoltzmannPolicies(mdp.getQValues(values, self.gamma, expectedRewards), 2, actionAxis=-2)
+		self.assertTrue(np.allclose(policies[:, :, 0], performVectorized.getBoltzmannPolicies(performVectorized.qValues), atol=1e-5))
+
+		masked = np.arange(mdp.numberOfStates) % 2 == 0
+		maskedValues, numberOfSweeps = targetCode.getBatchedValues(mdp, expectedRewards, np.zeros((mdp.numberOfStates, 2)), 
+			self.convergence, self.gamma, ~masked[:, None].repeat(2, axis=1))
+		self.assertTrue((maskedValues[masked] == 0).all())
+
+	def tearDown(self):
+		pass
+
+
+@ddt
+class TestCollapsedActions(unittest.TestCase):
+	def setUp(self): 
+		cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		stateSet5x5 = list(itertools.product(range(5), range(5)))
+		self.goalState = (4,4)
+		self.trapStates = [(2,2)]
+		getTransitionTable = plannerCode.SetupDeterministicTransitionByStateSet2Agent(stateSet5x5, cardinalActionSet, self.goalState)
+		self.transitionTable = getTransitionTable()
+		self.rewardTable = plannerCode.SetupRewardTable2AgentWeakStrong(self.transitionTable, [self.goalState], self.trapStates)((1, 2))
+		self.compiledMDP = plannerCode.SetupRewardTable2AgentWeakStrong(getTransitionTable.getCompiledTransitions(groupActions=True), 
+			[self.goalState], self.trapStates).getCompiledRewards((1, 2))
+		self.convergence = .000001
+		self.gamma = .95
+
+	def test_DictionarySolverMatchesWithFewerBackups(self):
+		performValueIteration = targetCode.BoltzmannValueIteration(self.transitionTable, self.rewardTable, 
+			{state:0 for state in self.transitionTable.keys()}, self.convergence, self.gamma, 2)
+		expectedValues, expectedPolicy = performValueIteration()
+		performCollapsed = targetCode.BoltzmannValueIteration(self.transitionTable, self.rewardTable, 
+			{state:0 for state in self.transitionTable.keys()}, self.convergence, self.gamma, 2, collapseActions=True)
+		values, policy = performCollapsed()
+
+		self.assertLess(performCollapsed.numberOfActionBackups, performValueIteration.numberOfActionBackups)
+		for state in self.transitionTable.keys():
+			self.assertAlmostEqual(values[state], expectedValues[state], places=6)
+			self.assertEqual(list(policy[state].keys()), list(expectedPolicy[state].keys()))
+			for action, actionProb in expectedPolicy[state].items():
+				self.assertAlmostEqual(policy[state][action], actionProb, places=6)
+
+	def test_VectorizedSolverMatchesWithFewerBackups(self):
+		performVectorized = targetCode.BoltzmannValueIterationVectorized(self.compiledMDP, None, None, self.convergence, self.gamma, 2)
+		expectedValues, expectedPolicy = performVectorized()
+		performCollapsed = targetCode.BoltzmannValueIterationVectorized(self.compiledMDP, None, None, self.convergence, self.gamma, 2, 
+			collapseActions=True)
+		values, policy = performCollapsed()
+
+		self.assertEqual(performCollapsed.numberOfSweeps, performVectorized.numberOfSweeps)
+		self.assertEqual(performCollapsed.numberOfActionBackups, performCollapsed.numberOfSweeps*self.compiledMDP.getActionGroups()[0].shape[0])
+		self.assertLess(performCollapsed.numberOfActionBackups, performVectorized.numberOfActionBackups)
+		self.assertTrue(np.allclose(performCollapsed.qValues, performVectorized.qValues))
+		for state in self.transitionTable.keys():
+			self.assertAlmostEqual(values[state], expectedValues[state])
+			for action, actionProb in expectedPolicy[state].items():
+				self.assertAlmostEqual(policy[state][action], actionProb)
+
+	def tearDown(self):
+		pass
+
+@ddt
+class TestReducedPrecision(unittest.TestCase):
+	def setUp(self): 
+		cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		stateSet5x5 = list(itertools.product(range(5), range(5)))
+		self.goalState = (4,4)
+		compiledTransitions = plannerCode.SetupDeterministicTransitionByStateSet2Agent(stateSet5x5, cardinalActionSet, self.goalState).getCompiledTransitions()
+		self.compiledMDP = plannerCode.SetupRewardTable2AgentWeakStrong(compiledTransitions, [self.goalState], [(2,2)]).getCompiledRewards((1, 2))
+
+	# the float32 solve stays within the reported bounds of the float64 solve, also below float32 rounding tolerances
+	@data((.000001, .95, 2), (.000000001, .95, 2), (.0001, .99, 10))
+	@unpack
+	def test_Float32WithinReportedBounds(self, convergence, gamma, beta):
+		performFloat64 = targetCode.BoltzmannValueIterationVectorized(self.compiledMDP, None, None, convergence, gamma, beta)
+		performFloat64()
+		performFloat32 = targetCode.BoltzmannValueIterationVectorized(self.compiledMDP, None, None, convergence, gamma, beta, dtype=np.float32)
+		valueTable, policyTable = performFloat32()
+
+		self.assertEqual(performFloat32.values.dtype, np.float32)
+		self.assertEqual(performFloat32.qValues.dtype, np.float64)
+		self.assertEqual(performFloat32.runReport['stopReason'], 'converged')
+		self.assertLessEqual(performFloat64.bellmanResidual, gamma*convergence*(1 + 1e-6))
+		float64Policies = performFloat64.getBoltzmannPolicies(performFloat64.qValues)
+		float32Policies = np.array([[policyTable[state][action] for action in self.compiledMDP.actions] for state in self.compiledMDP.states])
+		self.assertLessEqual(np.abs(float32Policies - float64Policies).sum(axis=1).max(), performFloat32.policyErrorBound)
+		# the policies come from float64 Q-values of the returned float32 values
+		expectedQValues = self.compiledMDP.getQValues(performFloat32.values.astype(np.float64), gamma)
+		self.assertTrue(np.array_equal(performFloat32.qValues, expectedQValues))
+		self.assertTrue(np.allclose(float32Policies, targetCode.getBoltzmannPolicies(expectedQValues, beta), rtol=0, atol=1e-12))
+		valueDistance = np.abs(performFloat32.values.astype(np.float64) - performFloat64.values).max()
+		self.assertLessEqual(valueDistance, performFloat32.valueErrorBound + performFloat64.valueErrorBound)
+		for key in ['bellmanResidual', 'valueErrorBound', 'policyErrorBound']:
+			self.assertEqual(performFloat32.runReport[key], getattr(performFloat32, key))
+
+	@data(np.float16, int)
+	def test_OtherTypesAreRejected(self, dtype):
+		with self.assertRaises(ValueError):
+			targetCode.BoltzmannValueIterationVectorized(self.compiledMDP, None, None, .000001, .95, 2, dtype=dtype)
+
+	def test_RoundingFloorStopsTinyTolerances(self):
+		performFloat32 = targetCode.BoltzmannValueIterationVectorized(self.compiledMDP, None, None, 1e-12, .95, 2, dtype=np.float32, 
+			maxIterations=2000)
+		performFloat32()
+		self.assertGreater(performFloat32.convergenceFloor, 1e-12)
+		self.assertTrue(performFloat32.runReport['converged'])
+		self.assertLess(performFloat32.numberOfSweeps, 2000)
+
+	def tearDown(self):
+		pass
+
+@ddt
+class TestBoltzmannPrioritizedSweeping(unittest.TestCase):
+	def setUp(self): 
+		cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		gridWidth = 4
+		gridHeight = 4
+		self.goalState = (3,3)
+		stateSet4x4 = list(itertools.product(range(gridWidth), range(gridHeight)))
+		getTransitionTable = plannerCode.SetupDeterministicTransitionByStateSet2Agent(stateSet4x4,cardinalActionSet, self.goalState)
+		self.transitionTable = getTransitionTable()
+		self.convergence = .000001
+		self.beta = 2
+
+	# stopping at residual <= tolerance bounds the value error by tolerance/(1-gamma)
+	@data(([(0,0)], .95), ([(1,1), (2,2)], .9), ([], .99))
+	@unpack
+	def test_MatchesFullSweeps(self, trapStates, gamma):
+		rewardTable = plannerCode.SetupRewardTable2AgentDistanceCost(self.transitionTable, [self.goalState], trapStates)()
+		performFullSweeps = targetCode.BoltzmannValueIterationVectorized(self.transitionTable, rewardTable, 
+			None, self.convergence*(1-gamma)/10, gamma, self.beta)
+		expectedValues, expectedPolicy = performFullSweeps()
+		performPrioritizedSweeping = targetCode.BoltzmannPrioritizedSweeping(self.transitionTable, rewardTable, 
+			None, self.convergence*(1-gamma)/10, gamma, self.beta)
+		values, policy = performPrioritizedSweeping()
+
+		self.assertLess(performPrioritizedSweeping.numberOfBackups, performFullSweeps.numberOfBackups)
+		for state in self.transitionTable.keys():
+			self.assertAlmostEqual(values[state], expectedValues[state], places=5)
+			for action, actionProb in expectedPolicy[state].items():
+				self.assertAlmostEqual(policy[state][action], actionProb, places=5)
+
+	def tearDown(self):
+		pass
+
+@ddt
+class TestBoltzmannPolicyIteration(unittest.TestCase):
+	def setUp(self): 
+		cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		gridWidth = 4
+		gridHeight = 4
+		self.goalState = (3,3)
+		stateSet4x4 = list(itertools.product(range(gridWidth), range(gridHeight)))
+		getTransitionTable = plannerCode.SetupDeterministicTransitionByStateSet2Agent(stateSet4x4,cardinalActionSet, self.goalState)
+		self.transitionTable = getTransitionTable()
+		self.convergence = .000001
+		self.beta = 2
+
+	# exact evaluation (None) and partial evaluation must both reach the value iteration fixed point
+	@data(([(0,0)], .95, None), ([(0,0)], .95, 5), ([(1,1), (2,2)], .9, None), ([], .99, 20))
+	@unpack
+	def test_MatchesValueIteration(self, trapStates, gamma, evaluationSteps):
+		rewardTable = plannerCode.SetupRewardTable2AgentDistanceCost(self.transitionTable, [self.goalState], trapStates)()
+		performValueIteration = targetCode.BoltzmannValueIterationVectorized(self.transitionTable, rewardTable, 
+			None, self.convergence*(1-gamma)/10, gamma, self.beta)
+		expectedValues, expectedPolicy = performValueIteration()
+		performPolicyIteration = targetCode.BoltzmannPolicyIteration(self.transitionTable, rewardTable, 
+			None, self.convergence*(1-gamma)/10, gamma, self.beta, evaluationSteps)
+		values, policy = performPolicyIteration()
+
+		for state in self.transitionTable.keys():
+			self.assertAlmostEqual(values[state], expectedValues[state], places=5)
+			for action, actionProb in expectedPolicy[state].items():
+				self.assertAlmostEqual(policy[state][action], actionProb, places=5)
+
+	def test_ExactEvaluationStopsAtStablePolicy(self):
+		rewardTable = plannerCode.SetupRewardTable2AgentDistanceCost(self.transitionTable, [self.goalState], [(0,0)])()
+		performPolicyIteration = targetCode.BoltzmannPolicyIteration(self.transitionTable, rewardTable, 
+			None, self.convergence, .95, self.beta)
+		performPolicyIteration()
+		qValues = performPolicyIteration.qValues
+		greedyQValues = qValues[range(len(qValues)), performPolicyIteration.greedyActions]
+		self.assertTrue(np.allclose(greedyQValues, qValues.max(axis=1)))
+		self.assertTrue(np.allclose(performPolicyIteration.values, qValues.max(axis=1)))
+
+	def tearDown(self):
+		pass
+
+@ddt
+class TestIncrementalResolve(unittest.TestCase):
+	def setUp(self): 
+		cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		stateSet5x5 = list(itertools.product(range(5), range(5)))
+		self.goalState = (4,4)
+		self.compiledTransitions = plannerCode.SetupDeterministicTransitionByStateSet2Agent(stateSet5x5, cardinalActionSet, self.goalState).getCompiledTransitions()
+		self.gamma = .95
+		self.convergence = .000001*(1-self.gamma)/10
+		self.beta = 2
+
+	# re-solving from the previous solution and the changed states must match a solve from scratch
+	# a new goal reward changes nearly every value, so it is only required to converge to the same answer
+	@data(([(0,0)], [(0,1)], 10, True), ([(0,0)], [(0,0), (2,3)], 10, True), ([(1,1)], [(1,1)], 20, False))
+	@unpack
+	def test_MatchesFullSolve(self, previousTraps, newTraps, newGoalReward, localChange):
+		previousMDP = plannerCode.SetupRewardTable2AgentDistanceCost(self.compiledTransitions, [self.goalState], previousTraps).getCompiledRewards()
+		newMDP = plannerCode.SetupRewardTable2AgentDistanceCost(self.compiledTransitions, [self.goalState], newTraps).getCompiledRewards(newGoalReward)
+		previousValues, previousPolicy = targetCode.BoltzmannValueIterationVectorized(previousMDP, None, None, self.convergence, self.gamma, self.beta)()
+		expectedValues, expectedPolicy = targetCode.BoltzmannValueIterationVectorized(newMDP, None, None, self.convergence, self.gamma, self.beta)()
+
+		changedStates = targetCode.getChangedStates(previousMDP, newMDP)
+		self.assertGreater(len(changedStates), 0)
+		self.assertLess(len(changedStates), newMDP.numberOfStates)
+		resolveIncrementally = targetCode.BoltzmannPrioritizedSweeping(newMDP, None, dict(previousValues), self.convergence, 
+			self.gamma, self.beta, seedStates = changedStates)
+		values, policy = resolveIncrementally()
+		solveFromScratch = targetCode.BoltzmannPrioritizedSweeping(newMDP, None, None, self.convergence, self.gamma, self.beta)
+		solveFromScratch()
+
+		if localChange:
+			self.assertLess(resolveIncrementally.numberOfBackups, solveFromScratch.numberOfBackups/2)
+		for state in expectedValues.keys():
+			self.assertAlmostEqual(values[state], expectedValues[state], places=5)
+			for action, actionProb in expectedPolicy[state].items():
+				self.assertAlmostEqual(policy[state][action], actionProb, places=5)
+
+	def test_ChangedStates(self):
+		previousMDP = plannerCode.SetupRewardTable2AgentDistanceCost(self.compiledTransitions, [self.goalState], [(0,0)]).getCompiledRewards()
+		newMDP = plannerCode.SetupRewardTable2AgentDistanceCost(self.compiledTransitions, [self.goalState], [(0,1)]).getCompiledRewards()
+		changedStates = set(targetCode.getChangedStates(previousMDP, newMDP))
+		# only states with a successor on the old or the new trap change
+		for state in newMDP.states:
+			nextStates = set(nextState for distribution in newMDP.transitionTable[state].values() for nextState in distribution.keys())
+			touchesTrap = any(nextState != 'terminal' and ((0,0) in nextState or (0,1) in nextState) for nextState in nextStates)
+			onGoal = state != 'terminal' and self.goalState in state
+			self.assertEqual(state in changedStates, touchesTrap and not onGoal)
+		self.assertEqual(targetCode.getChangedStates(newMDP, newMDP), [])
+
+	def tearDown(self):
+		pass
+
+@ddt
+class TestSolverMonitor(unittest.TestCase):
+	def setUp(self): 
+		cardinalActionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		stateSet4x4 = list(itertools.product(range(4), range(4)))
+		self.goalState = (3,3)
+		self.transitionTable = plannerCode.SetupDeterministicTransitionByStateSet2Agent(stateSet4x4, cardinalActionSet, self.goalState)()
+		self.rewardTable = plannerCode.SetupRewardTable2AgentDistanceCost(self.transitionTable, [self.goalState], [(0,0)])()
+		self.gamma = .95
+		self.beta = 2
+		self.optimalValues, optimalPolicy = targetCode.BoltzmannValueIterationVectorized(self.transitionTable, self.rewardTable, 
+			None, 1e-12, self.gamma, self.beta)()
+
+	def getSolver(self, solverName, convergence, **monitorArguments):
+		if solverName == 'dictionary':
+			return(targetCode.BoltzmannValueIteration(self.transitionTable, self.rewardTable, {state:0 for state in self.transitionTable.keys()}, 
+				convergence, self.gamma, self.beta, **monitorArguments))
+		if solverName == 'vectorized':
+			return(targetCode.BoltzmannValueIterationVectorized(self.transitionTable, self.rewardTable, None, convergence, self.gamma, self.beta, 
+				**monitorArguments))
+		if solverName == 'prioritized':
+			return(targetCode.BoltzmannPrioritizedSweeping(self.transitionTable, self.rewardTable, None, convergence, self.gamma, self.beta, 
+				**monitorArguments))
+		return(targetCode.BoltzmannPolicyIteration(self.transitionTable, self.rewardTable, None, convergence, self.gamma, self.beta, 5,
+			**monitorArguments))
+
+	# the reported bound must hold for the values returned, also when the solve is cut short
+	@data(('dictionary', .001), ('vectorized', .001), ('prioritized', .001), ('policyIteration', .001), 
+		('dictionary', 1e-8), ('vectorized', 1e-8), ('prioritized', 1e-8), ('policyIteration', 1e-8))
+	@unpack
+	def test_CallbackAndBound(self, solverName, convergence):
+		sweeps = []
+		solver = self.getSolver(solverName, convergence, sweepCallback = sweeps.append)
+		values, policy = solver()
+		report = solver.runReport
+
+		self.assertTrue(report['converged'])
+		self.assertEqual(report['stopReason'], 'converged')
+		self.assertEqual(len(sweeps), report['sweeps'])
+		self.assertEqual([sweep['sweep'] for sweep in sweeps], list(range(1, len(sweeps) + 1)))
+		self.assertEqual([sweep['maxResidual'] for sweep in sweeps], report['residuals'])
+		self.assertEqual(sum(sweep['statesUpdated'] for sweep in sweeps), report['statesUpdated'])
+		self.assertLessEqual(report['maxResidual'], convergence)
+		error = max(abs(values[state] - self.optimalValues[state]) for state in self.transitionTable.keys())
+		self.assertLessEqual(error, report['valueErrorBound'] + 1e-9)
+
+	@data('dictionary', 'vectorized', 'prioritized', 'policyIteration')
+	def test_Budgets(self, solverName):
+		solver = self.getSolver(solverName, 1e-12, maxIterations = 2)
+		solver()
+		self.assertEqual(solver.runReport['stopReason'], 'maxIterations')
+		self.assertFalse(solver.runReport['converged'])
+		self.assertEqual(solver.runReport['sweeps'], 2)
+
+		solver = self.getSolver(solverName, 1e-12, timeBudget = 0)
+		solver()
+		self.assertEqual(solver.runReport['stopReason'], 'timeBudget')
+		self.assertEqual(solver.runReport['sweeps'], 1)
+
+		solver = self.getSolver(solverName, 1e-12, sweepCallback = lambda sweep: sweep['sweep'] == 3)
+		values, policy = solver()
+		self.assertEqual(solver.runReport['stopReason'], 'callback')
+		self.assertEqual(solver.runReport['sweeps'], 3)
+		error = max(abs(values[state] - self.optimalValues[state]) for state in self.transitionTable.keys())
+		self.assertLessEqual(error, solver.runReport['valueErrorBound'] + 1e-9)
+
+	def tearDown(self):
+		pass
+
+
+if __name__ == '__main__':
+	unittest.main(verbosity=2)
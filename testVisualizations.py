@@ -0,0 +1,87 @@
+import sys
+sys.path.append('../src/')
+
+import unittest
+from ddt import ddt, data, unpack
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from matplotlib.collections import PatchCollection
+from matplotlib.quiver import Quiver
+import visualizations as targetCode
+import itertools
+import os
+import shutil
+import tempfile
+import numpy as np
+
+@ddt
+class TestCollectionRendering(unittest.TestCase):
+	def setUp(self): 
+		self.actionSet = [(-1,0), (0,1), (1,0), (0,-1), (0,0)]
+		self.stateSet = list(itertools.product(range(4), range(3)))
+		self.policy = {state: {action: .2 for action in self.actionSet} for state in self.stateSet}
+		self.outputDirectory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.outputDirectory, ignore_errors=True)
+
+	def getPath(self, fileName):
+		return(os.path.join(self.outputDirectory, fileName))
+
+	def test_PolicyIsOneCollectionAndOneQuiver(self):
+		figure = targetCode.visualizePolicy(self.stateSet, self.policy, (3,2), otherGoals=[(0,2)], trapStates=[(1,1)], savePath=self.getPath('policy.png'))
+		ax = figure.axes[0]
+		patchCollections = [collection for collection in ax.collections if isinstance(collection, PatchCollection)]
+		quivers = [collection for collection in ax.collections if isinstance(collection, Quiver)]
+		self.assertEqual(len(patchCollections), 1)
+		# grid, true goal, other goal and trap cells
+		self.assertEqual(len(patchCollections[0].get_paths()), len(self.stateSet) + 3)
+		self.assertEqual(len(quivers), 1)
+		# the null action has no arrow
+		self.assertEqual(quivers[0].N, len(self.stateSet)*4)
+		self.assertEqual(len(ax.patches), 0)
+		self.assertTrue(os.path.getsize(self.getPath('policy.png')) > 0)
+
+	def test_BarrierArrowsAreRed(self):
+		figure = targetCode.visualizePolicyWithBarrier(self.stateSet, self.policy, (3,2), [((0,0),(0,1))], savePath=self.getPath('barrier.svg'))
+		quivers = [collection for collection in figure.axes[0].collections if isinstance(collection, Quiver)]
+		self.assertEqual([quiver.N for quiver in quivers], [1, len(self.stateSet)*4])
+		self.assertTrue(np.allclose(quivers[0].get_facecolor()[0], matplotlib.colors.to_rgba('red')))
+		with open(self.getPath('barrier.svg')) as svgFile:
+			self.assertIn('<svg', svgFile.read())
+
+	def test_TransitionArrowColors(self):
+		transitionTable = {(0,0): {(1,0): {(1,0): .5, (0,0): .5}}, (1,0): {(1,0): {(1,0): 1.0}}}
+		figure = targetCode.visualizeTransitionTable([(0,0), (1,0)], transitionTable, (1,0), savePath=self.getPath('transition.png'))
+		quivers = [collection for collection in figure.axes[0].collections if isinstance(collection, Quiver)]
+		self.assertEqual(quivers[0].N, 1)
+		self.assertTrue(np.allclose(quivers[0].get_facecolor()[0], matplotlib.colors.to_rgba('b')))
+
+	@data(True, False)
+	def test_ValueHeatmap(self, showValues):
+		valueTable = {state: float(state[0] + 10*state[1]) for state in self.stateSet if state != (2,1)}
+		figure = targetCode.visualizeValueTable(4, 3, (3,2), [(1,1)], valueTable, showValues=showValues, savePath=self.getPath('values.png'))
+		ax = figure.axes[0]
+		valueGrid = ax.images[0].get_array()
+		self.assertEqual(valueGrid.shape, (3, 4))
+		self.assertEqual(valueGrid[2, 1], 21)
+		self.assertTrue(np.ma.is_masked(valueGrid[1, 2]) or np.isnan(valueGrid[1, 2]))
+		self.assertEqual(len(ax.texts), len(valueTable) if showValues else 0)
+
+	def test_BatchExportIsHeadless(self):
+		openFigures = len(plt.get_fignums())
+		conditions = {'goal' + str(goalx): {'states': self.stateSet, 'policy': self.policy, 'trueGoalState': (goalx, 2)} for goalx in range(4)}
+		savedPaths = targetCode.exportVisualizations(targetCode.visualizePolicy, conditions, self.getPath('batch'), ('png', 'svg'))
+		self.assertEqual(len(savedPaths), 8)
+		self.assertEqual(set(os.listdir(self.getPath('batch'))), set(os.path.basename(path) for path in savedPaths))
+		# saved figures are not pyplot figures, so nothing accumulates
+		self.assertEqual(len(plt.get_fignums()), openFigures)
+
+	def test_EnvironmentLabels(self):
+		figure = targetCode.visualizeEnvironmentByState(self.stateSet, [(3,2)], [(1,1)], [(0,0), (0,1)], {(3,2): 'A'}, 
+			savePath=self.getPath('environment.png'))
+		self.assertEqual(sorted(text.get_text() for text in figure.axes[0].texts), ['0', '1', 'A'])
+
+if __name__ == '__main__':
+	unittest.main(verbosity=2)
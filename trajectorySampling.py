@@ -0,0 +1,102 @@
+import numpy as np
+from compiledMDP import CompiledMDP, SetupCompiledMDP
+
+"""
+Batched trajectory sampling - rolls out many trajectories of a (Boltzmann) policy through a joint transition table at once.
+    The policy table and the transition distributions are turned once into cumulative probability tables over integer
+    states/actions, and every step of a batch draws one action and one successor for all its running trajectories with
+    vectorized lookups. Every successor of the transition table is sampled with its probability, so both outcomes of a
+    collision of SetupDeterministicTransitionByStateSet2Agent occur (unlike taking the first successor key).
+    A trajectory stops when it enters one of the stop states or after maxSteps steps.
+Inputs:
+    Constructor
+    transitionTable - nested dictionary {state:{action:{nextState:probability}}} or a CompiledMDP
+    policyTable - dictionary {state:{action:probability}}, e.g. the Boltzmann policy returned by the value iteration solvers
+    stopStates - states that end a trajectory (e.g. states with an agent on the goal), None stops at absorbing states
+        (every action leads back to the state, e.g. 'terminal')
+    maxSteps - largest number of steps of a trajectory
+
+    Callable
+    startStates - list of start states, trajectory i starts from startStates[i % len(startStates)]
+    numberOfTrajectories - total number of trajectories to sample
+    batchSize - number of trajectories advanced in lockstep and yielded together
+    seed - seed of the numpy random generator, the same seed gives the same batches
+Output: generator of batches (stateIndices, actionIndices, lengths)
+    stateIndices - (batch, maxSteps+1) state indices of .mdp.states, -1 after the trajectory stopped
+    actionIndices - (batch, maxSteps) action indices of .mdp.actions, -1 after the trajectory stopped
+    lengths - number of steps of each trajectory (its number of states is lengths+1)
+    getTrajectories turns a batch into lists of state keys
+"""
+
+class SampleTrajectoryBatches(object):
+    def __init__(self, transitionTable, policyTable, stopStates = None, maxSteps = 100):
+        if isinstance(transitionTable, CompiledMDP):
+            self.mdp = transitionTable
+        else:
+            self.mdp = SetupCompiledMDP(transitionTable)()
+        self.maxSteps = maxSteps
+
+        self.actionCumulatives = self.getActionCumulatives(policyTable)
+        self.rowStarts = self.mdp.rowPointer[:-1]
+        self.rowLengths = np.diff(self.mdp.rowPointer)
+        self.entryCumulatives = self.getEntryCumulatives()
+        self.isStopState = self.mdp.getStopStates(stopStates)
+
+    def __call__(self, startStates, numberOfTrajectories, batchSize = 1000, seed = None):
+        randomGenerator = np.random.default_rng(seed)
+        startIndices = np.array([self.mdp.stateIndex[state] for state in startStates])
+        for batchStart in range(0, numberOfTrajectories, batchSize):
+            trajectoryIndices = np.arange(batchStart, min(batchStart + batchSize, numberOfTrajectories))
+            yield(self.sampleBatch(startIndices[trajectoryIndices % len(startIndices)], randomGenerator))
+
+    def sampleBatch(self, startIndices, randomGenerator):
+        batchSize = len(startIndices)
+        stateIndices = np.full((batchSize, self.maxSteps + 1), -1)
+        actionIndices = np.full((batchSize, self.maxSteps), -1)
+        lengths = np.zeros(batchSize, dtype=int)
+        stateIndices[:, 0] = startIndices
+
+        running = np.flatnonzero(~self.isStopState[startIndices])
+        states = startIndices[running]
+        for step in range(self.maxSteps):
+            if len(running) == 0:
+                break
+            actions = self.sampleActions(states, randomGenerator)
+            states = self.sampleNextStates(states*self.mdp.numberOfActions + actions, randomGenerator)
+            actionIndices[running, step] = actions
+            stateIndices[running, step + 1] = states
+            lengths[running] += 1
+
+            stillRunning = ~self.isStopState[states]
+            running = running[stillRunning]
+            states = states[stillRunning]
+        return(stateIndices, actionIndices, lengths)
+
+    def sampleActions(self, states, randomGenerator):
+        # index of the first cumulative probability above a uniform draw (clipped against round off in the last entry)
+        uniformDraws = randomGenerator.random(len(states))
+        actions = (self.actionCumulatives[states] <= uniformDraws[:, None]).sum(axis=1)
+        return(np.minimum(actions, self.mdp.numberOfActions - 1))
+
+    def sampleNextStates(self, rows, randomGenerator):
+        # rows have at most a few successors, so all of a row's cumulative probabilities are compared at once
+        rowLengths = self.rowLengths[rows]
+        offsets = np.arange(self.rowLengths.max())
+        entries = self.rowStarts[rows][:, None] + np.minimum(offsets[None, :], rowLengths[:, None] - 1)
+        uniformDraws = randomGenerator.random(len(rows))
+        chosenOffsets = np.minimum((self.entryCumulatives[entries] <= uniformDraws[:, None]).sum(axis=1), rowLengths - 1)
+        return(self.mdp.nextStateIndices[self.rowStarts[rows] + chosenOffsets])
+
+    def getActionCumulatives(self, policyTable):
+        policies = np.array([[policyTable[state][action] for action in self.mdp.actions] for state in self.mdp.states])
+        return(np.cumsum(policies, axis=1))
+
+    def getEntryCumulatives(self):
+        # cumulative probability of each successor entry within its own (state, action) row
+        cumulatives = np.cumsum(self.mdp.probabilities)
+        rowOffsets = np.concatenate([[0], cumulatives])[self.mdp.rowPointer[:-1]]
+        return(cumulatives - np.repeat(rowOffsets, self.rowLengths))
+
+    def getTrajectories(self, stateIndices, lengths):
+        return([[self.mdp.states[stateIndex] for stateIndex in trajectory[:length+1]]
+            for trajectory, length in zip(stateIndices.tolist(), lengths.tolist())])
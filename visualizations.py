@@ -1,8 +1,16 @@
+import os
 import itertools
 import numpy as np 
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PatchCollection
+from matplotlib.colors import to_rgba
 from matplotlib.patches import Rectangle
 
+gridAdjust = .5
+gridScale = 1.5
+
 def viewDictionaryStructure(d, dictionaryType, indent=0):
     if dictionaryType == "t":
         levels  = ["state", "action", "next state", "probability"]
@@ -20,6 +28,68 @@ def viewDictionaryStructure(d, dictionaryType, indent=0):
         else:
             print('\t' * (indent+1) + str(levels[indent+1])+ ": " + str(value))
 
+"""
+    Figure of a visualization - a pyplot figure shown with plt.show(), or, when the figure is saved, a standalone Figure
+    drawn by the Agg canvas, so batch export never starts an interactive backend and never accumulates pyplot figures.
+    Inputs:
+        figureSize: [width, height] in inches
+        savePath: None to show the figure, otherwise a file path or list of file paths (format from the extension, e.g. .png, .svg)
+"""
+def newFigure(figureSize, savePath):
+    if savePath is None:
+        return(plt.figure(figsize=figureSize))
+    figure = Figure(figsize=figureSize)
+    FigureCanvasAgg(figure)
+    return(figure)
+
+def finishFigure(figure, savePath):
+    if savePath is None:
+        plt.show()
+        return(figure)
+    for path in ([savePath] if isinstance(savePath, str) else savePath):
+        figure.savefig(path)
+    return(figure)
+
+def setupStateAxes(states, savePath):
+    minimumx, minimumy = [min(coord) for coord in zip(*states)]
+    maximumx, maximumy = [max(coord) for coord in zip(*states)]
+    figure = newFigure([max(maximumx-minimumx, 1)*gridScale, max(maximumy-minimumy, 1)*gridScale], savePath)
+    ax = figure.add_subplot(frameon=False, xticks = range(minimumx-1, maximumx+2), yticks = range(minimumy-1, maximumy+2))
+    return(figure, ax)
+
+"""
+    Draws every cell rectangle of a figure as one PatchCollection instead of one patch per cell.
+    Inputs:
+        cellGroups: list of (cells, color, alpha, fill) - cells is a list of (x,y) cells, fill False draws the outline only
+"""
+def addCellCollection(ax, cellGroups):
+    patches, faceColors, edgeColors = [], [], []
+    for cells, color, alpha, fill in cellGroups:
+        for (cellx, celly) in cells:
+            patches.append(Rectangle((cellx-gridAdjust, celly-gridAdjust), 1, 1))
+            faceColors.append(to_rgba(color, alpha) if fill else (0, 0, 0, 0))
+            edgeColors.append(to_rgba(color, alpha))
+    collection = PatchCollection(patches, facecolors=faceColors, edgecolors=edgeColors)
+    ax.add_collection(collection)
+    ax.autoscale_view()
+    return(collection)
+
+"""
+    Draws all arrows of a figure as one quiver (arrow lengths in data units) instead of one plt.arrow per arrow.
+    Inputs:
+        arrows: list of (x, y, dx, dy); zero length arrows (e.g. the null action) are skipped
+        colors: one color for every arrow, or a list with one color per arrow
+"""
+def addArrowQuiver(ax, arrows, colors = 'black'):
+    arrowArray = np.array(arrows, dtype=float).reshape(-1, 4)
+    isDrawn = (arrowArray[:, 2:] != 0).any(axis=1)
+    if not isinstance(colors, str):
+        colors = [color for color, drawn in zip(colors, isDrawn) if drawn]
+    if not isDrawn.any():
+        return(None)
+    x, y, dx, dy = arrowArray[isDrawn].T
+    return(ax.quiver(x, y, dx, dy, angles='xy', scale_units='xy', scale=1, color=colors, width=.004))
+
 """
     Visualizes environment where the input is a set of states to visualize instead of a grid - can take in irregular state spaces.
     Inputs: 
@@ -28,97 +98,46 @@ def viewDictionaryStructure(d, dictionaryType, indent=0):
         trapStates: list of obstacle or trap spaces
         trajectory: list of states an agent travels through
         goalNameDictionary: dictionary where keys are state tuples and values are names of those states. Use if you want to name goals.
+        savePath: None shows the figure, otherwise the file path(s) to save it to (see newFigure)
+    Output: the figure
 """
-def visualizeEnvironmentByState(states, goalStates = [], trapStates = [], trajectory = [], goalNameDictionary = {}):
-    gridAdjust = .5
-    gridScale = 1.5
+def visualizeEnvironmentByState(states, goalStates = [], trapStates = [], trajectory = [], goalNameDictionary = {}, savePath = None):
+    figure, ax = setupStateAxes(states, savePath)
+    addCellCollection(ax, [(states, 'black', 1, False), (goalStates, 'green', .1, True), (trapStates, 'red', .1, True),
+        (trajectory, 'blue', .1, True)])
 
-    minimumx, minimumy = [min(coord) for coord in zip(*states)]
-    maximumx, maximumy = [max(coord) for coord in zip(*states)]
-    
-    plt.rcParams["figure.figsize"] = [(maximumx-minimumx)*gridScale, (maximumy-minimumy)*gridScale]
-    ax = plt.gca(frameon=False, xticks = range(minimumx-1, maximumx+2), yticks = range(minimumy-1, maximumy+2))
-
-    #gridline drawing
-    for (statex, statey) in states:
-        ax.add_patch(Rectangle((statex-gridAdjust, statey-gridAdjust), 1, 1, fill=False, color='black', alpha=1))
-
-    #goal coloring and labeling
+    #goal labeling
     for (goalx,goaly) in goalStates:
-        ax.add_patch(Rectangle((goalx-gridAdjust, goaly-gridAdjust), 1, 1, fill=True, color='green', alpha=.1))
         if (goalx, goaly) in goalNameDictionary.keys():
             ax.text(goalx-.15, goaly-.15, goalNameDictionary[(goalx, goaly)], fontsize = 35)
 
-    for (trapx, trapy) in trapStates:
-        ax.add_patch(Rectangle((trapx-gridAdjust, trapy-gridAdjust), 1, 1, fill=True, color='red', alpha=.1))
-
-    #trajectory path coloring
+    #trajectory step numbers
     for indx, (statex, statey) in enumerate(trajectory):
-        ax.add_patch(Rectangle((statex-gridAdjust, statey-gridAdjust), 1, 1, fill=True, color='blue', alpha=.1))
         ax.text(statex-.1, statey-.1, str(indx), fontsize = 20)
 
-    plt.show()
-
-
+    return(finishFigure(figure, savePath))
 
-def visualizePolicy(states, policy, trueGoalState, otherGoals=[], trapStates=[], arrowScale = .3):
-    #grid height/width
-    gridAdjust = .5
-    gridScale = 1.5
-    
-    minimumx, minimumy = [min(coord) for coord in zip(*states)]
-    maximumx, maximumy = [max(coord) for coord in zip(*states)]
-    
-    plt.rcParams["figure.figsize"] = [(maximumx-minimumx)*gridScale, (maximumy-minimumy)*gridScale]
-    ax = plt.gca(frameon=False, xticks = range(minimumx-1, maximumx+2), yticks = range(minimumy-1, maximumy+2))
-
-    #gridline drawing
-    for (statex, statey) in states:
-        ax.add_patch(Rectangle((statex-gridAdjust, statey-gridAdjust), 1, 1, fill=False, color='black', alpha=1))
 
-    #goal and trap coloring 
-    ax.add_patch(Rectangle((trueGoalState[0]-gridAdjust, trueGoalState[1]-gridAdjust), 1, 1, fill=True, color='green', alpha=.5))
+def getPolicyArrows(policyItems, arrowScale):
+    return([(statex, statey, actionx*actionProb*arrowScale, actiony*actionProb*arrowScale)
+        for (statex, statey), actionDict in policyItems for (actionx, actiony), actionProb in actionDict.items()])
 
-    for (goalx, goaly) in otherGoals:
-        ax.add_patch(Rectangle((goalx-gridAdjust, goaly-gridAdjust), 1, 1, fill=True, color='green', alpha=.1))
-    
-    for (trapx, trapy) in trapStates:
-        ax.add_patch(Rectangle((trapx-gridAdjust, trapy-gridAdjust), 1, 1, fill=True, color='red', alpha=.1))
+def visualizePolicy(states, policy, trueGoalState, otherGoals=[], trapStates=[], arrowScale = .3, savePath = None):
+    figure, ax = setupStateAxes(states, savePath)
+    addCellCollection(ax, [(states, 'black', 1, False), ([trueGoalState], 'green', .5, True), (otherGoals, 'green', .1, True),
+        (trapStates, 'red', .1, True)])
+    addArrowQuiver(ax, getPolicyArrows(policy.items(), arrowScale))
+    return(finishFigure(figure, savePath))
 
-    #labeled values
-    for (statex, statey), actionDict in policy.items():
-        for (optimalActionX, optimalActionY), actionProb in actionDict.items():
-            plt.arrow(statex, statey, optimalActionX*actionProb*arrowScale, optimalActionY*actionProb*arrowScale, head_width=0.05*actionProb, head_length=0.1*actionProb)    
-    plt.show()
-
-def visualizePolicyWithBarrier(states, policy, trueGoalState, barrierList, otherGoals=[], trapStates=[], arrowScale = .3):
-    #grid height/width
-    gridAdjust = .5
-    gridScale = 1.5
-    
-    minimumx, minimumy = [min(coord) for coord in zip(*states)]
-    maximumx, maximumy = [max(coord) for coord in zip(*states)]
-    
-    plt.rcParams["figure.figsize"] = [(maximumx-minimumx)*gridScale, (maximumy-minimumy)*gridScale]
-    ax = plt.gca(frameon=False, xticks = range(minimumx-1, maximumx+2), yticks = range(minimumy-1, maximumy+2))
-
-    #gridline drawing
-    for (statex, statey) in states:
-        ax.add_patch(Rectangle((statex-gridAdjust, statey-gridAdjust), 1, 1, fill=False, color='black', alpha=1))
-
-    #goal and trap coloring 
-    ax.add_patch(Rectangle((trueGoalState[0]-gridAdjust, trueGoalState[1]-gridAdjust), 1, 1, fill=True, color='green', alpha=.5))
-    for (goalx, goaly) in otherGoals:
-        ax.add_patch(Rectangle((goalx-gridAdjust, goaly-gridAdjust), 1, 1, fill=True, color='green', alpha=.1))
-    for (trapx, trapy) in trapStates:
-        ax.add_patch(Rectangle((trapx-gridAdjust, trapy-gridAdjust), 1, 1, fill=True, color='black', alpha=.1))
-    for (statex, statey), (nextStatex, nextStatey) in barrierList:
-        plt.arrow(statex, statey, (nextStatex-statex)*arrowScale, (nextStatey-statey)*arrowScale, head_width=0.05, head_length=0.1, color = 'red')
-    #labeled values
-    for (statex, statey), actionDict in policy.items():
-        for (optimalActionX, optimalActionY), actionProb in actionDict.items():
-            plt.arrow(statex, statey, optimalActionX*actionProb*arrowScale, optimalActionY*actionProb*arrowScale, head_width=0.05*actionProb, head_length=0.1*actionProb)    
-    plt.show()
+def visualizePolicyWithBarrier(states, policy, trueGoalState, barrierList, otherGoals=[], trapStates=[], arrowScale = .3, savePath = None):
+    figure, ax = setupStateAxes(states, savePath)
+    addCellCollection(ax, [(states, 'black', 1, False), ([trueGoalState], 'green', .5, True), (otherGoals, 'green', .1, True),
+        (trapStates, 'black', .1, True)])
+    barrierArrows = [(statex, statey, (nextStatex-statex)*arrowScale, (nextStatey-statey)*arrowScale)
+        for (statex, statey), (nextStatex, nextStatey) in barrierList]
+    addArrowQuiver(ax, barrierArrows, 'red')
+    addArrowQuiver(ax, getPolicyArrows(policy.items(), arrowScale))
+    return(finishFigure(figure, savePath))
 
 
 """
@@ -130,124 +149,119 @@ def visualizePolicyWithBarrier(states, policy, trueGoalState, barrierList, other
         goalStates: list of possible goals 
         trapStates: list of obstacle or trap spaces
         trajectory: list of states an agent travels through
+        savePath: None shows the figure, otherwise the file path(s) to save it to (see newFigure)
+    Output: the figure
 """
-def visualizePolicyOfBeliefByState(states, policy, belief, goalStates = [], trapStates = [], trajectory = [], arrowScale = .3):
-    gridAdjust = .5
-    gridScale = 1.5
-    
-    minimumx, minimumy = [min(coord) for coord in zip(*states)]
-    maximumx, maximumy = [max(coord) for coord in zip(*states)]
-    
-    plt.rcParams["figure.figsize"] = [(maximumx-minimumx)*gridScale, (maximumy-minimumy)*gridScale]
-    ax = plt.gca(frameon=False, xticks = range(minimumx-1, maximumx+2), yticks = range(minimumy-1, maximumy+2))
-
-    #gridline drawing
-    for (statex, statey) in states:
-        ax.add_patch(Rectangle((statex-gridAdjust, statey-gridAdjust), 1, 1, fill=False, color='black', alpha=1))
+def visualizePolicyOfBeliefByState(states, policy, belief, goalStates = [], trapStates = [], trajectory = [], arrowScale = .3, savePath = None):
+    figure, ax = setupStateAxes(states, savePath)
+    addCellCollection(ax, [(states, 'black', 1, False), (goalStates, 'green', .1, True), (trapStates, 'red', .1, True),
+        (trajectory, 'blue', .1, True)])
 
-    #goal and trap coloring 
-    for (goalx,goaly) in goalStates:
-        ax.add_patch(Rectangle((goalx-gridAdjust, goaly-gridAdjust), 1, 1, fill=True, color='green', alpha=.1))
-    for (trapx, trapy) in trapStates:
-        ax.add_patch(Rectangle((trapx-gridAdjust, trapy-gridAdjust), 1, 1, fill=True, color='red', alpha=.1))
-
-    #trajectory path coloring
+    #trajectory step numbers
     for indx, (statex, statey) in enumerate(trajectory):
-        ax.add_patch(Rectangle((statex-gridAdjust, statey-gridAdjust), 1, 1, fill=True, color='blue', alpha=.1))
         ax.text(statex-.1, statey-.1, str(indx), fontsize = 25)
 
-    #labeled values
-    for ((statex, statey), b) in policy.keys():
-        if b == belief:
-            for (actionx, actiony), actionProb in policy[((statex, statey), b)].items():
-                plt.arrow(statex, statey, actionx*actionProb*arrowScale, actiony*actionProb*arrowScale, head_width=0.05*actionProb, head_length=0.1*actionProb)    
-    plt.show()
-
-def visualizeValueTable(gridWidth, gridHeight, goalState, trapStates, valueTable):
-    gridAdjust = .5
-    gridScale = 1.5
-    
-    xs = np.linspace(-gridAdjust, gridWidth-gridAdjust, gridWidth+1)
-    ys = np.linspace(-gridAdjust, gridHeight-gridAdjust, gridHeight+1)
-    
-    plt.rcParams["figure.figsize"] = [gridWidth*gridScale,gridHeight*gridScale]
-    ax = plt.gca(frameon=False, xticks = range(gridWidth), yticks = range(gridHeight))
-
-    #goal and trap coloring 
-    ax.add_patch(Rectangle((goalState[0]-gridAdjust, goalState[1]-gridAdjust), 1, 1, fill=True, color='green', alpha=.1))
-    
-    for (trapx, trapy) in trapStates:
-        ax.add_patch(Rectangle((trapx-gridAdjust, trapy-gridAdjust), 1, 1, fill=True, color='red', alpha=.1))
-    
-    # grid lines
-    for x in xs:
-        plt.plot([x, x], [ys[0], ys[-1]], color = "black")
-    for y in ys:
-        plt.plot([xs[0], xs[-1]], [y, y], color = "black")
+    beliefPolicyItems = [(position, actionDict) for (position, b), actionDict in policy.items() if b == belief]
+    addArrowQuiver(ax, getPolicyArrows(beliefPolicyItems, arrowScale))
+    return(finishFigure(figure, savePath))
 
-    #labeled values
+
+"""
+    Visualizes a single agent value table as an imshow heatmap over the grid, goals and traps shaded on top.
+    Inputs:
+        gridWidth, gridHeight: size of the grid
+        goalState, otherGoals, trapStates: cells to shade
+        valueTable: dictionary {(x,y): value}, cells without a value are left blank
+        showValues: False skips writing the rounded value in every cell (one text per cell is the slow part on large grids)
+        savePath: None shows the figure, otherwise the file path(s) to save it to (see newFigure)
+    Output: the figure
+"""
+def visualizeValueTable(gridWidth, gridHeight, goalState, trapStates, valueTable, showValues = True, savePath = None):
+    return(visualizeValueHeatmap(gridWidth, gridHeight, [([goalState], 'green', .1, True), (trapStates, 'red', .1, True)],
+        valueTable, showValues, savePath))
+
+def visualizeValueTableMultipleGoals(gridWidth, gridHeight, goalState, otherGoals, trapStates, valueTable, showValues = True, savePath = None):
+    return(visualizeValueHeatmap(gridWidth, gridHeight, [([goalState], 'green', .5, True), (otherGoals, 'green', .1, True),
+        (trapStates, 'black', .1, True)], valueTable, showValues, savePath))
+
+def visualizeValueHeatmap(gridWidth, gridHeight, cellGroups, valueTable, showValues = True, savePath = None, colorMap = 'viridis'):
+    figure = newFigure([gridWidth*gridScale, gridHeight*gridScale], savePath)
+    ax = figure.add_subplot(frameon=False, xticks = range(gridWidth), yticks = range(gridHeight))
+    drawValueHeatmap(figure, ax, gridWidth, gridHeight, cellGroups, valueTable, showValues, colorMap)
+    return(finishFigure(figure, savePath))
+
+def drawValueHeatmap(figure, ax, gridWidth, gridHeight, cellGroups, valueTable, showValues, colorMap):
+    valueGrid = np.full((gridHeight, gridWidth), np.nan)
     for (statex, statey), val in valueTable.items():
-        plt.text(statex-.2, statey, str(round(val, 3)))    
-
-    plt.show()
-
-def visualizeValueTableMultipleGoals(gridWidth, gridHeight, goalState, otherGoals, trapStates, valueTable):
-    gridAdjust = .5
-    gridScale = 1.5
-    
-    xs = np.linspace(-gridAdjust, gridWidth-gridAdjust, gridWidth+1)
-    ys = np.linspace(-gridAdjust, gridHeight-gridAdjust, gridHeight+1)
-    
-    plt.rcParams["figure.figsize"] = [gridWidth*gridScale,gridHeight*gridScale]
-    ax = plt.gca(frameon=False, xticks = range(gridWidth), yticks = range(gridHeight))
-
-    #goal and trap coloring 
-    ax.add_patch(Rectangle((goalState[0]-gridAdjust, goalState[1]-gridAdjust), 1, 1, fill=True, color='green', alpha=.5))
-
-    for (goalx, goaly) in otherGoals:
-        ax.add_patch(Rectangle((goalx-gridAdjust, goaly-gridAdjust), 1, 1, fill=True, color='green', alpha=.1))
-
-    
-    for (trapx, trapy) in trapStates:
-        ax.add_patch(Rectangle((trapx-gridAdjust, trapy-gridAdjust), 1, 1, fill=True, color='black', alpha=.1))
-    
+        valueGrid[statey, statex] = val
+    image = ax.imshow(valueGrid, origin='lower', extent=(-gridAdjust, gridWidth-gridAdjust, -gridAdjust, gridHeight-gridAdjust),
+        cmap=colorMap, alpha=.6, interpolation='nearest')
+    figure.colorbar(image, ax=ax)
+
     # grid lines
-    for x in xs:
-        plt.plot([x, x], [ys[0], ys[-1]], color = "black")
-    for y in ys:
-        plt.plot([xs[0], xs[-1]], [y, y], color = "black")
+    ax.vlines(np.linspace(-gridAdjust, gridWidth-gridAdjust, gridWidth+1), -gridAdjust, gridHeight-gridAdjust, color = "black")
+    ax.hlines(np.linspace(-gridAdjust, gridHeight-gridAdjust, gridHeight+1), -gridAdjust, gridWidth-gridAdjust, color = "black")
+    addCellCollection(ax, cellGroups)
 
     #labeled values
-    for (statex, statey), val in valueTable.items():
-        plt.text(statex-.2, statey, str(round(val, 3)))    
+    if showValues:
+        for (statex, statey), val in valueTable.items():
+            ax.text(statex-.2, statey, str(round(val, 3)))    
 
-    plt.show()
 
+"""
+    Visualizes where each agent spends its time - one heatmap per agent of its expected (discounted) visits per cell,
+    e.g. the getAgentCellOccupancies of occupancyMeasure.GetOccupancyMeasure.
+    Inputs:
+        gridWidth, gridHeight: size of the grid
+        agentOccupancies: list with one dictionary {(x,y): expected visits} per agent
+        goalStates, trapStates: cells to shade
+        showValues: True writes the rounded visits in every cell
+        savePath: None shows the figure, otherwise the file path(s) to save it to (see newFigure)
+    Output: the figure
+"""
+def visualizeAgentOccupancies(gridWidth, gridHeight, agentOccupancies, goalStates = [], trapStates = [], showValues = False, 
+        savePath = None, colorMap = 'magma'):
+    figure = newFigure([len(agentOccupancies)*gridWidth*gridScale, gridHeight*gridScale], savePath)
+    for agent, cellOccupancies in enumerate(agentOccupancies):
+        ax = figure.add_subplot(1, len(agentOccupancies), agent+1, frameon=False, xticks = range(gridWidth), yticks = range(gridHeight))
+        ax.set_title('agent ' + str(agent+1))
+        drawValueHeatmap(figure, ax, gridWidth, gridHeight, [(goalStates, 'green', .5, False), (trapStates, 'red', .5, False)],
+            cellOccupancies, showValues, colorMap)
+    return(finishFigure(figure, savePath))
 
-def visualizeTransitionTable(states, transitionTable, actionOfInterest, arrowScale = .5):
 
-    colorDict = {(1,0): 'b', (0,1): 'g', (-1,0): 'r', (0,-1): 'm', (0,0): 'c'}
+def visualizeTransitionTable(states, transitionTable, actionOfInterest, arrowScale = .5, savePath = None):
 
-    #grid height/width
-    gridAdjust = .5
-    gridScale = 1.5
-    
-    minimumx, minimumy = [min(coord) for coord in zip(*states)]
-    maximumx, maximumy = [max(coord) for coord in zip(*states)]
-    
-    plt.rcParams["figure.figsize"] = [(maximumx-minimumx)*gridScale, (maximumy-minimumy)*gridScale]
-    ax = plt.gca(frameon=False, xticks = range(minimumx-1, maximumx+2), yticks = range(minimumy-1, maximumy+2))
+    colorDict = {(1,0): 'b', (0,1): 'g', (-1,0): 'r', (0,-1): 'm', (0,0): 'c'}
 
-    #gridline drawing
-    for (statex, statey) in states:
-        ax.add_patch(Rectangle((statex-gridAdjust, statey-gridAdjust), 1, 1, fill=False, color='black', alpha=1))
+    figure, ax = setupStateAxes(states, savePath)
+    addCellCollection(ax, [(states, 'black', 1, False)])
 
-    #labeled values
+    arrows, arrowColors = [], []
     for (statex, statey), actionDict in transitionTable.items():
         for (nextStatex, nextStatey), actionProb in actionDict[actionOfInterest].items():
-            arrowColor = colorDict[(nextStatex-statex, nextStatey-statey)]
-            plt.arrow(statex, statey, (nextStatex-statex)*actionProb*arrowScale, (nextStatey-statey)*actionProb*arrowScale, 
-                head_width=0.05*actionProb, 
-                head_length=0.1*actionProb, 
-                color = arrowColor)    
-    plt.show()
\ No newline at end of file
+            arrows.append((statex, statey, (nextStatex-statex)*actionProb*arrowScale, (nextStatey-statey)*actionProb*arrowScale))
+            arrowColors.append(colorDict[(nextStatex-statex, nextStatey-statey)])
+    addArrowQuiver(ax, arrows, arrowColors)
+    return(finishFigure(figure, savePath))
+
+
+"""
+    Batch export - renders one visualization per condition straight to files, without an interactive backend.
+    Every figure is drawn once and saved in every requested format.
+    Inputs:
+        visualizationFunction: one of the visualize functions above
+        conditions: dictionary {file name: dictionary of keyword arguments of visualizationFunction}
+        outputDirectory: directory for the files (created if needed)
+        fileFormats: file extensions to save, e.g. ('png', 'svg')
+    Output: list of the saved file paths
+"""
+def exportVisualizations(visualizationFunction, conditions, outputDirectory, fileFormats = ('png',)):
+    os.makedirs(outputDirectory, exist_ok=True)
+    savedPaths = []
+    for name, arguments in conditions.items():
+        paths = [os.path.join(outputDirectory, name + '.' + fileFormat) for fileFormat in fileFormats]
+        visualizationFunction(**arguments, savePath = paths)
+        savedPaths.extend(paths)
+    return(savedPaths)